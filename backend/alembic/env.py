@@ -10,7 +10,7 @@ from app.config import settings
 from app.database import Base
 
 # Импортируем все модели (чтобы Alembic их увидел)
-from app.models import category, place, user_request
+from app.models import category, place, user_request, category_usage, request_stats_bucket
 
 # Конфигурация Alembic
 config = context.config
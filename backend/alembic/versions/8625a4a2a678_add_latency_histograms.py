@@ -0,0 +1,57 @@
+"""Add latency histograms to request_stats_buckets
+
+Revision ID: 8625a4a2a678
+Revises: ae70f7b2c0cc
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8625a4a2a678'
+down_revision: Union[str, None] = 'ae70f7b2c0cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Параметры корзин app/services/latency_histogram.py
+RELATIVE_ACCURACY = 0.02
+MIN_VALUE_MS = 0.01
+
+
+def upgrade() -> None:
+    op.add_column('request_stats_buckets', sa.Column('latency_histograms', sa.JSON(), nullable=True))
+
+    # Гистограммы общего времени запроса по уже накопленной истории
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    for granularity in ('hour', 'day'):
+        bucket = f"date_trunc('{granularity}', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+        op.execute(f"""
+            UPDATE request_stats_buckets b
+            SET latency_histograms = json_build_object('total', json_build_object(
+                'bins', t.bins, 'count', t.cnt, 'sum', t.total, 'min', t.min_ms, 'max', t.max_ms
+            ))
+            FROM (
+                SELECT bucket_start, json_object_agg(bin, bin_count) AS bins,
+                       sum(bin_count) AS cnt, sum(bin_sum) AS total,
+                       min(bin_min) AS min_ms, max(bin_max) AS max_ms
+                FROM (
+                    SELECT {bucket} AS bucket_start,
+                           ceil(ln(greatest(execution_time_ms, {MIN_VALUE_MS})) / ln({gamma}))::int AS bin,
+                           count(*) AS bin_count, sum(execution_time_ms) AS bin_sum,
+                           min(execution_time_ms) AS bin_min, max(execution_time_ms) AS bin_max
+                    FROM user_requests
+                    WHERE created_at IS NOT NULL AND execution_time_ms IS NOT NULL
+                    GROUP BY 1, 2
+                ) bins
+                GROUP BY bucket_start
+            ) t
+            WHERE b.granularity = '{granularity}' AND b.bucket_start = t.bucket_start
+        """)
+
+
+def downgrade() -> None:
+    op.drop_column('request_stats_buckets', 'latency_histograms')
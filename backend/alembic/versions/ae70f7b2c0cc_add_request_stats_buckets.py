@@ -0,0 +1,82 @@
+"""Add request_stats_buckets rollup
+
+Revision ID: ae70f7b2c0cc
+Revises: c00cb337f8db
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ae70f7b2c0cc'
+down_revision: Union[str, None] = 'c00cb337f8db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Размер скетча популярных значений в корзине (settings.STATS_TOP_CAPACITY)
+TOP_CAPACITY = 50
+
+
+def upgrade() -> None:
+    op.create_table('request_stats_buckets',
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('requests_count', sa.BigInteger(), nullable=False),
+    sa.Column('places_sum', sa.Float(), nullable=False),
+    sa.Column('places_count', sa.BigInteger(), nullable=False),
+    sa.Column('distance_sum', sa.Float(), nullable=False),
+    sa.Column('distance_count', sa.BigInteger(), nullable=False),
+    sa.Column('time_sum', sa.Float(), nullable=False),
+    sa.Column('time_count', sa.BigInteger(), nullable=False),
+    sa.Column('execution_sum', sa.Float(), nullable=False),
+    sa.Column('execution_count', sa.BigInteger(), nullable=False),
+    sa.Column('top_interests', sa.JSON(), nullable=True),
+    sa.Column('top_locations', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start')
+    )
+
+    # Заполняем корзины по уже накопленной истории запросов (в UTC)
+    for granularity in ('hour', 'day'):
+        bucket = f"date_trunc('{granularity}', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+        op.execute(f"""
+            INSERT INTO request_stats_buckets (
+                granularity, bucket_start, requests_count,
+                places_sum, places_count, distance_sum, distance_count,
+                time_sum, time_count, execution_sum, execution_count
+            )
+            SELECT '{granularity}', {bucket}, count(*),
+                   coalesce(sum(total_places), 0), count(total_places),
+                   coalesce(sum(total_distance_km), 0), count(total_distance_km),
+                   coalesce(sum(total_time_minutes), 0), count(total_time_minutes),
+                   coalesce(sum(execution_time_ms), 0), count(execution_time_ms)
+            FROM user_requests
+            WHERE created_at IS NOT NULL
+            GROUP BY {bucket}
+        """)
+        for column, source in (('top_interests', 'user_interests'), ('top_locations', 'user_address')):
+            op.execute(f"""
+                UPDATE request_stats_buckets b
+                SET {column} = t.sketch
+                FROM (
+                    SELECT bucket_start, json_object_agg(item, json_build_array(cnt, 0)) AS sketch
+                    FROM (
+                        SELECT {bucket} AS bucket_start, {source} AS item, count(*) AS cnt,
+                               row_number() OVER (PARTITION BY {bucket} ORDER BY count(*) DESC) AS rn
+                        FROM user_requests
+                        WHERE created_at IS NOT NULL AND {source} IS NOT NULL
+                        GROUP BY {bucket}, {source}
+                    ) ranked
+                    WHERE rn <= {TOP_CAPACITY}
+                    GROUP BY bucket_start
+                ) t
+                WHERE b.granularity = '{granularity}' AND b.bucket_start = t.bucket_start
+            """)
+
+
+def downgrade() -> None:
+    op.drop_table('request_stats_buckets')
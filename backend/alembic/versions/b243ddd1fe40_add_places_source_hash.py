@@ -0,0 +1,28 @@
+"""Add source_hash and updated_at index to places
+
+Revision ID: b243ddd1fe40
+Revises: de5c39d25b67
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b243ddd1fe40'
+down_revision: Union[str, None] = 'de5c39d25b67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('places', sa.Column('source_hash', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_places_updated_at'), 'places', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_places_updated_at'), table_name='places')
+    op.drop_column('places', 'source_hash')
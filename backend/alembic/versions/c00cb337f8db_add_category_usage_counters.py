@@ -0,0 +1,40 @@
+"""Add category_usage counters
+
+Revision ID: c00cb337f8db
+Revises: 0de6eb1b9148
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c00cb337f8db'
+down_revision: Union[str, None] = '0de6eb1b9148'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('category_usage',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('usage_count', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('category_id')
+    )
+    # Заполняем счётчики по уже накопленной истории запросов
+    op.execute("""
+        INSERT INTO category_usage (category_id, usage_count)
+        SELECT elem::int, count(DISTINCT ur.id)
+        FROM user_requests ur,
+             json_array_elements_text(ur.selected_categories) AS elem
+        WHERE json_typeof(ur.selected_categories) = 'array'
+        GROUP BY elem::int
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('category_usage')
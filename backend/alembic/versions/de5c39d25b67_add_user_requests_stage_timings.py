@@ -0,0 +1,26 @@
+"""Add stage_timings to user_requests
+
+Revision ID: de5c39d25b67
+Revises: 8625a4a2a678
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de5c39d25b67'
+down_revision: Union[str, None] = '8625a4a2a678'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_requests', sa.Column('stage_timings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_requests', 'stage_timings')
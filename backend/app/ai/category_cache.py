@@ -0,0 +1,129 @@
+"""
+Кэш выбора категорий по интересам пользователя
+
+Первый вызов LLM только сопоставляет текст интересов с id категорий,
+поэтому одинаковые (после нормализации) интересы при неизменной таблице
+категорий дают одинаковый ответ и могут не ходить в LLM.
+"""
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.metrics import observe_cache
+
+
+STOP_WORDS = {
+    # русские
+    "и", "в", "во", "на", "с", "со", "к", "по", "о", "об", "от", "до", "за",
+    "из", "у", "для", "а", "но", "или", "же", "ли", "бы", "то", "это",
+    "как", "что", "мне", "меня", "я", "мы", "хочу", "хотим", "люблю", "нравится",
+    "очень", "также", "еще", "ещё", "всё", "все", "чтобы",
+    # английские
+    "a", "an", "the", "and", "or", "of", "in", "on", "to", "for", "with",
+    "i", "we", "me", "my", "like", "love", "want", "some", "also",
+}
+
+# Отрицание меняет смысл интереса: "не парки" и "парки" - разные запросы
+NEGATIONS = {"не", "без", "кроме", "no", "not", "without", "except"}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_interests(text: str) -> str:
+    """
+    Привести интересы к канонической форме:
+    нижний регистр, без пунктуации и стоп-слов, уникальные слова по алфавиту.
+    Отрицание склеивается со следующим словом ("не_парки"), чтобы
+    противоположные запросы не получали один ключ.
+    """
+    tokens = _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+    words = set()
+    negation = None
+    for token in tokens:
+        if token in NEGATIONS:
+            negation = token
+        elif token not in STOP_WORDS:
+            words.add(f"{negation}_{token}" if negation else token)
+            negation = None
+    return " ".join(sorted(words))
+
+
+def categories_fingerprint(category_names: Dict[int, str], category_times: Dict[int, int]) -> str:
+    """Хэш текущей таблицы категорий (id, название, время посещения)"""
+    rows = [
+        f"{cat_id}:{category_names[cat_id]}:{category_times.get(cat_id)}"
+        for cat_id in sorted(category_names)
+    ]
+    return hashlib.sha1("|".join(rows).encode("utf-8")).hexdigest()
+
+
+class CategorySelectionCache:
+    """LRU-кэш с ограничением по размеру и TTL записей"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, List[int]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        user_interests: str,
+        category_names: Dict[int, str],
+        category_times: Dict[int, int]
+    ) -> Tuple[str, str]:
+        return normalize_interests(user_interests), categories_fingerprint(category_names, category_times)
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[int]]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            observe_cache("category_selection", False)
+            return None
+
+        expires_at, category_ids = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            observe_cache("category_selection", False)
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        observe_cache("category_selection", True)
+        return list(category_ids)
+
+    def set(self, key: Tuple[str, str], category_ids: List[int]) -> None:
+        if self.max_size <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl_seconds, list(category_ids))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+category_cache = CategorySelectionCache(
+    max_size=settings.CATEGORY_CACHE_SIZE,
+    ttl_seconds=settings.CATEGORY_CACHE_TTL_SECONDS,
+)
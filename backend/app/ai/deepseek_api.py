@@ -1,34 +1,23 @@
-import requests
+from typing import AsyncIterator, Optional
 
+from app.ai.llm_client import llm_client
 
-async def ask_openrouter(question: str, api_key: str) -> str:
 
-    url = "https://openrouter.ai/api/v1/chat/completions"
+async def ask_openrouter(question: str, api_key: str, timeout: Optional[float] = None, response_format: Optional[dict] = None) -> str:
+    """
+    Задать вопрос модели через общий асинхронный клиент
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-        "HTTP-Referer": "https://github.com/ai-tourist-assistant",
-        "X-Title": "Tourist Assistant"
-    }
+    Raises:
+        LLMError: при таймауте, HTTP ошибке или неразборчивом ответе
+    """
+    return await llm_client.chat(question, api_key, timeout=timeout, response_format=response_format)
 
-    payload = {
-        "model": "deepseek/deepseek-chat",
-        "messages": [
-            {"role": "user", "content": question}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 1000
-    }
 
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+def stream_openrouter(question: str, api_key: str, timeout: Optional[float] = None, response_format: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Задать вопрос модели и получать ответ по кускам (stream=true)
 
-        if response.status_code == 200:
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
-        else:
-            return f"Ошибка API: {response.status_code} - {response.text}"
-
-    except Exception as e:
-        return f"Ошибка: {str(e)}"
+    Raises:
+        LLMError: при таймауте, HTTP ошибке или неразборчивом ответе
+    """
+    return llm_client.stream_chat(question, api_key, timeout=timeout, response_format=response_format)
@@ -0,0 +1,143 @@
+"""
+Инкрементальный разбор JSON массива из потока LLM
+
+Ответ модели приходит кусками по несколько символов. Парсер
+отслеживает глубину вложенности и строки и отдаёт каждый элемент
+верхнеуровневого массива (объект или id места) сразу, как только он
+завершён, не дожидаясь конца ответа. Текст до массива (пояснения,
+```json) пропускается.
+
+Если задан key, массивом считается только значение этого ключа
+корневого объекта ({"category_ids": [...], "route": [...]} - элементы
+route при любом порядке ключей) или корневой массив, если ответ -
+голый массив.
+"""
+import json
+from typing import Any, List, Optional
+
+
+class JSONArrayStreamParser:
+    """Элементы массива [{...}, 12, ...] по мере поступления текста"""
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []
+        self._scalar: List[str] = []
+        self.errors = 0
+        # Разбор текста до массива: вложенность, строки и последний ключ корневого объекта
+        self._outer_depth = 0
+        self._outer_string: Optional[List[str]] = None
+        self._outer_escape = False
+        self._last_key: Optional[str] = None
+        self._expect_value = False
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Добавить кусок текста и вернуть элементы массива, завершённые в нём"""
+        completed = []
+        for char in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                self._started = self._is_array_start(char)
+                continue
+
+            if self._depth > 0:
+                self._buffer.append(char)
+            elif self._in_string or char not in " \t\r\n,{[]":
+                # Число, строка или литерал на верхнем уровне массива
+                self._scalar.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Закрылся сам массив
+                    self._flush_scalar(completed)
+                    self._finished = True
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    item = self._decode("".join(self._buffer))
+                    self._buffer = []
+                    if item is not None:
+                        completed.append(item)
+            elif char == "," and self._depth == 0:
+                self._flush_scalar(completed)
+        return completed
+
+    def _is_array_start(self, char: str) -> bool:
+        """Учесть символ до начала массива; True, если с него начинается нужный массив"""
+        if self.key is None:
+            return char == "["
+
+        if self._outer_string is not None:
+            if self._outer_escape:
+                self._outer_escape = False
+            elif char == "\\":
+                self._outer_escape = True
+            elif char == '"':
+                self._last_key = "".join(self._outer_string)
+                self._outer_string = None
+            else:
+                self._outer_string.append(char)
+            return False
+
+        if self._outer_depth == 0:
+            # Вне JSON (пояснения, ```json) кавычки не считаются строками
+            if char == "[":
+                return True
+            if char == "{":
+                self._outer_depth = 1
+            return False
+
+        if char == '"':
+            self._outer_string = []
+        elif char == ":":
+            self._expect_value = self._outer_depth == 1 and self._last_key == self.key
+            return False
+        elif char == "[" and self._expect_value:
+            return True
+        elif char in "{[":
+            self._outer_depth += 1
+        elif char in "}]":
+            self._outer_depth -= 1
+        if not char.isspace():
+            self._expect_value = False
+        return False
+
+    def _flush_scalar(self, completed: List[Any]) -> None:
+        if not self._scalar:
+            return
+        item = self._decode("".join(self._scalar))
+        self._scalar = []
+        if item is not None:
+            completed.append(item)
+
+    def _decode(self, text: str):
+        try:
+            return json.loads(text)
+        except ValueError:
+            self.errors += 1
+            return None
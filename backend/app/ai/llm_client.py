@@ -0,0 +1,278 @@
+"""
+Асинхронный клиент LLM (OpenRouter)
+
+Один общий пул keep-alive соединений на всё время жизни процесса,
+ограничение числа одновременных запросов и дедлайн на каждый вызов.
+Ошибки поднимаются исключениями, а не возвращаются строкой в ответе.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import LLM_REQUEST_DURATION, LLM_REQUESTS, observe_llm_usage
+
+
+class LLMError(Exception):
+    """Базовая ошибка обращения к LLM"""
+
+
+class LLMTimeoutError(LLMError):
+    """Вызов не уложился в дедлайн"""
+
+
+class LLMHTTPError(LLMError):
+    """API вернул HTTP статус, отличный от 200"""
+
+    def __init__(self, status_code: int, body: str):
+        self.status_code = status_code
+        self.body = body
+        super().__init__(f"LLM API вернул {status_code}: {body[:500]}")
+
+
+class LLMResponseError(LLMError):
+    """Ответ API не удалось разобрать"""
+
+
+class LLMClient:
+    """Клиент chat/completions с общим пулом соединений"""
+
+    def __init__(
+        self,
+        api_url: str,
+        model: str,
+        max_concurrency: int,
+        timeout_seconds: float,
+        max_connections: int,
+    ):
+        self.api_url = api_url
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Создать общий httpx клиент при первом обращении"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={
+                    "Content-Type": "application/json",
+                    "HTTP-Referer": "https://github.com/ai-tourist-assistant",
+                    "X-Title": "Tourist Assistant",
+                },
+            )
+        return self._client
+
+    async def chat(
+        self,
+        prompt: str,
+        api_key: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+        response_format: Optional[dict] = None,
+    ) -> str:
+        """
+        Отправить один user-prompt и вернуть текст ответа
+
+        Args:
+            prompt: Текст запроса
+            api_key: Ключ OpenRouter
+            temperature: Температура генерации
+            max_tokens: Лимит токенов ответа
+            timeout: Дедлайн вызова в секундах, включая ожидание слота
+            response_format: Подсказка формата ответа (JSON schema), если задана
+
+        Returns:
+            str: Содержимое первого choice
+
+        Raises:
+            LLMTimeoutError, LLMHTTPError, LLMResponseError
+        """
+        deadline = timeout if timeout is not None else self.timeout_seconds
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        if response_format:
+            payload["response_format"] = response_format
+
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            content = await asyncio.wait_for(self._post(payload, api_key), timeout=deadline)
+            outcome = "ok"
+            return content
+        except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+            outcome = "timeout"
+            raise LLMTimeoutError(f"LLM не ответила за {deadline} с") from e
+        except LLMHTTPError:
+            outcome = "http_error"
+            raise
+        except LLMResponseError:
+            outcome = "bad_response"
+            raise
+        finally:
+            LLM_REQUESTS.labels(outcome=outcome).inc()
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - started)
+
+    async def _post(self, payload: dict, api_key: str) -> str:
+        async with self._semaphore:
+            try:
+                response = await self._get_client().post(
+                    self.api_url,
+                    json=payload,
+                    headers={"Authorization": f"Bearer {api_key}"},
+                )
+            except httpx.TimeoutException:
+                raise
+            except httpx.HTTPError as e:
+                raise LLMError(f"Ошибка соединения с LLM API: {e}") from e
+
+        if response.status_code != 200:
+            raise LLMHTTPError(response.status_code, response.text)
+
+        try:
+            data = response.json()
+            observe_llm_usage(data.get("usage"))
+            return data["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMResponseError(f"Неожиданный формат ответа LLM: {e}") from e
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        api_key: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+        response_format: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Отправить user-prompt с stream=true и отдавать куски текста ответа
+
+        Дедлайн общий на весь вызов: ожидание слота, заголовки и все куски.
+
+        Raises:
+            LLMTimeoutError, LLMHTTPError, LLMResponseError
+        """
+        deadline = timeout if timeout is not None else self.timeout_seconds
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+        if response_format:
+            payload["response_format"] = response_format
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline
+
+        def remaining() -> float:
+            left = deadline_at - loop.time()
+            if left <= 0:
+                raise asyncio.TimeoutError
+            return left
+
+        started = time.perf_counter()
+        outcome = "error"
+        response = None
+        acquired = False
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=remaining())
+            acquired = True
+            client = self._get_client()
+            request = client.build_request(
+                "POST",
+                self.api_url,
+                json=payload,
+                headers={"Authorization": f"Bearer {api_key}"},
+            )
+            try:
+                response = await asyncio.wait_for(client.send(request, stream=True), timeout=remaining())
+            except httpx.TimeoutException:
+                raise
+            except httpx.HTTPError as e:
+                raise LLMError(f"Ошибка соединения с LLM API: {e}") from e
+
+            if response.status_code != 200:
+                body = await asyncio.wait_for(response.aread(), timeout=remaining())
+                raise LLMHTTPError(response.status_code, body.decode("utf-8", errors="replace"))
+
+            lines = response.aiter_lines()
+            while True:
+                try:
+                    line = await asyncio.wait_for(lines.__anext__(), timeout=remaining())
+                except StopAsyncIteration:
+                    break
+                # Строки-комментарии (": OPENROUTER PROCESSING") и пустые пропускаем
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError as e:
+                    raise LLMResponseError(f"Неожиданный формат потока LLM: {e}") from e
+                if chunk.get("error"):
+                    raise LLMResponseError(f"Ошибка в потоке LLM: {chunk['error']}")
+                observe_llm_usage(chunk.get("usage"))
+                try:
+                    delta = chunk["choices"][0].get("delta", {}).get("content")
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    delta = None
+                if delta:
+                    yield delta
+            outcome = "ok"
+        except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+            outcome = "timeout"
+            raise LLMTimeoutError(f"LLM не ответила за {deadline} с") from e
+        except LLMHTTPError:
+            outcome = "http_error"
+            raise
+        except LLMResponseError:
+            outcome = "bad_response"
+            raise
+        except (GeneratorExit, asyncio.CancelledError):
+            # Клиент закрыл поток раньше конца ответа
+            outcome = "cancelled"
+            raise
+        finally:
+            if response is not None:
+                await response.aclose()
+            if acquired:
+                self._semaphore.release()
+            LLM_REQUESTS.labels(outcome=outcome).inc()
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - started)
+
+    async def close(self) -> None:
+        """Закрыть пул соединений (при остановке приложения)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_client = LLMClient(
+    api_url=settings.AI_API_URL,
+    model=settings.AI_MODEL,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+)
@@ -0,0 +1,43 @@
+"""
+Prompt Budget - Оценка размера prompt в токенах
+
+Точный токенизатор модели за OpenRouter недоступен, поэтому число
+токенов оценивается по символам: латиница, цифры и разметка - около
+4 символов на токен, кириллица - около 2.5. Оценки хватает, чтобы
+держать prompt в бюджете и видеть его размер в метаданных ответа.
+"""
+import math
+from typing import List
+
+ASCII_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 2.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов строки"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN + other_chars / OTHER_CHARS_PER_TOKEN)
+
+
+def fit_rows(fixed_text: str, rows: List[str], budget_tokens: int, min_rows: int = 1) -> int:
+    """
+    Сколько первых строк ранжированного списка помещается в бюджет
+
+    Args:
+        fixed_text: Неизменная часть prompt (инструкции, пользователь)
+        rows: Строки кандидатов, лучшие первыми
+        budget_tokens: Бюджет на весь prompt
+        min_rows: Столько строк остаётся, даже если бюджет превышен
+
+    Returns:
+        int: Число строк, которые нужно оставить
+    """
+    used = estimate_tokens(fixed_text)
+    kept = 0
+    for row in rows:
+        used += estimate_tokens(row) + 1  # перевод строки
+        if used > budget_tokens and kept >= min_rows:
+            break
+        kept += 1
+    return kept
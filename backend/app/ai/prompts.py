@@ -9,7 +9,7 @@ def build_categories_prompt(user_interests, category_names: dict, category_times
     prompt +=  '\n# INSTRUCTIONS FOR FORMING A RESPONSE: \n' \
                f'1. Create a list of categories based on the {user_interests}. \n' \
                '2. Choose no more than 5 categories. \n' \
-               '3. The response must be in the JSON format of a list of category IDs for example: [1, 2, 3] \n' \
+               '3. The response must be a JSON object with the list of category IDs, for example: {"category_ids": [1, 2, 3]} \n' \
                
     return prompt
 
@@ -18,7 +18,10 @@ def build_route_prompt(places, available_time_hours, user_location):
     prompt = "You are an AI assistant that creates personalized walking routes in Niznhy Novrogod, Russia.\n"
     prompt += "Here are the available places to include in the route:\n"
     for place in places:
-        prompt += f"- {place['title']}, address: {place['address']}, average visit duration: {place['avg_visit_duration']} min\n"
+        prompt += f"- {place['title']}, address: {place['address']}, average visit duration: {place['avg_visit_duration']} min"
+        if "distance_km" in place:
+            prompt += f", distance from user: {place['distance_km']} km"
+        prompt += "\n"
     prompt += f"User location: {user_location}\n"
     prompt += f"Available time for the route: {available_time_hours} hours.\n"
     prompt += "Create a walking route including 3-4 places, considering visit durations and travel times between them. Use yandex.Maps data to plan your route and plan your travel time."
@@ -27,7 +30,7 @@ def build_route_prompt(places, available_time_hours, user_location):
                 '2. Include 3-4 places in the route, combining categories. Mention possible coffee shops for stops along the way (coffee shops are not included in the dataset, you can suggest them generally based on the logic of the route). \n' \
                 '3. Consider the average visit time from the dataset and realistic travel time between points (5-15 minutes). \n' \
                 '4. The response structure should be clear:    \n' \
-                '5. The response must be a JSON array of route places, each object containing fields:\n' \
+                '5. The response must be a JSON object {"route": [...]} with the array of route places, each place object containing fields:\n' \
                 '- title (string): name of the place\n' \
                 '- address (string): the most accurate address of the place: street and house. it`s really important\n' \
                 '- coordinates (object): with "latitude" and "longitude" as floats\n' \
@@ -40,3 +43,76 @@ def build_route_prompt(places, available_time_hours, user_location):
                 'Create a route and give a response in the required format.'\
 
     return prompt
+
+
+def build_single_shot_prompt(user_interests, category_names: dict, category_times: dict, places, available_time_hours, user_location):
+    prompt = "You are an AI assistant that creates personalized walking routes in Niznhy Novrogod, Russia.\n"
+    prompt += f"User interests: {user_interests}\n"
+    prompt += "Categories (id: name, average visit time):\n"
+    for cat_id, cat_name in category_names.items():
+        prompt += f"- {cat_id}: {cat_name}, {category_times.get(cat_id, 30)} min\n"
+    prompt += "Candidate places near the user (id | title | category id | address | distance from user, km):\n"
+    for place in places:
+        prompt += f"- {place['id']} | {place['title']} | {place['category_id']} | {place['address']} | {place.get('distance_km', '')}\n"
+    prompt += f"User location: {user_location}\n"
+    prompt += f"Available time for the route: {available_time_hours} hours.\n"
+    prompt +=  '\n# INSTRUCTIONS FOR FORMING A RESPONSE: \n' \
+                '1. Select no more than 5 category ids that match the user interests. \n' \
+                '2. Create a walking route of 3-4 candidate places from the selected categories, logically moving from the starting point, ' \
+                'so that visits and walking (5-15 minutes between points) fit into the available time. \n' \
+                '3. Use only places from the candidate list and copy their id, title and address exactly. \n' \
+                '4. The response must be one JSON object, the "route" key first: \n' \
+                '{"route": [{"id": int, "title": string, "address": string, "category": {"id": int, "name": string}, ' \
+                '"description": string, "visit_duration": int, "reasoning": string}], "category_ids": [int]} \n' \
+                'Provide the response strictly as JSON matching this format.'
+
+    return prompt
+
+
+# Компактные prompt: неизменные инструкции идут первыми, кандидаты -
+# короткими строками "id|название|категория|мин|км", ответ - только id
+COMPACT_ROUTE_INSTRUCTIONS = (
+    "You plan walking routes in Nizhny Novgorod, Russia.\n"
+    "Places: id|title|category id|visit min|km from user, best candidates first.\n"
+    "Pick 3-4 places and order them as a walking route from the user so that visits "
+    "plus walking (5-15 min between points) fit into the available time, combining categories.\n"
+)
+COMPACT_ROUTE_ANSWER = "Answer with JSON only: place ids in visiting order, e.g. {\"route\": [12, 5, 40]}\n"
+COMPACT_SINGLE_SHOT_ANSWER = (
+    "First select up to 5 category ids matching the user interests, then use only places of those categories.\n"
+    "Answer with JSON only, route first: {\"route\": [12, 5, 40], \"category_ids\": [1, 3]}\n"
+)
+
+
+def format_candidate_row(place) -> str:
+    return f"{place['id']}|{place['title']}|{place.get('category_id') or 0}|{place['avg_visit_duration']}|{place.get('distance_km', '')}"
+
+
+def format_category_row(cat_id, cat_name, visit_time) -> str:
+    return f"{cat_id}|{cat_name}|{visit_time}"
+
+
+def build_compact_route_prompt(rows, available_time_hours, user_location, user_interests=None, category_rows=None):
+    """Компактный prompt маршрута; с category_rows - режим single_shot (категории и маршрут)"""
+    prompt = COMPACT_ROUTE_INSTRUCTIONS
+    prompt += COMPACT_SINGLE_SHOT_ANSWER if category_rows is not None else COMPACT_ROUTE_ANSWER
+    if category_rows is not None:
+        prompt += f"User interests: {user_interests}\n"
+        prompt += "Categories: id|name|visit min\n" + "\n".join(category_rows) + "\n"
+    prompt += f"Time: {available_time_hours} h. User: {user_location['latitude']:.5f},{user_location['longitude']:.5f}\n"
+    prompt += "Places:\n" + "\n".join(rows)
+    return prompt
+
+
+def build_reasoning_prompt(places, user_interests):
+    prompt = "You are an AI assistant that explains personalized walking routes in Niznhy Novrogod, Russia.\n"
+    prompt += f"User interests: {user_interests}\n"
+    prompt += "The route has already been planned and visits these places in order:\n"
+    for place in places:
+        prompt += f"- id {place['id']}: {place['title']} ({place['category']['name']}), address: {place['address']}\n"
+    prompt +=  '\n# INSTRUCTIONS FOR FORMING A RESPONSE: \n' \
+                '1. For every place write one or two sentences in Russian explaining why it suits the user. \n' \
+                '2. Do not add, remove or reorder places. \n' \
+                '3. The response must be a JSON object {"reasons": [...]} with objects with fields "id" (int) and "reasoning" (string), for example: {"reasons": [{"id": 1, "reasoning": "..."}]} \n'
+
+    return prompt
@@ -0,0 +1,197 @@
+"""
+Structured Output - JSON ответы LLM по схеме
+
+Каждому prompt соответствует pydantic модель ответа из
+app/schemas/route.py. Её JSON schema уходит в запрос как
+response_format, а ответ проверяется той же моделью. Невалидный ответ
+сначала чинится локально (```json, текст вокруг JSON, висячие запятые,
+оборванный конец), и только если это не помогло, LLM спрашивается
+ещё один раз - с текстом ошибки. Исходы разбора идут в метрику
+llm_structured_output_total.
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.config import settings
+from app.ai.deepseek_api import ask_openrouter
+from app.ai.llm_client import LLMResponseError
+from app.schemas.route import CategoriesAnswer, ReasoningAnswer, RouteIdsAnswer, RoutePlacesAnswer
+from app.services.metrics import LLM_STRUCTURED_OUTPUT
+from app.utils.timing import span
+
+RETRY_INSTRUCTIONS = (
+    "\n\nYour previous answer could not be used: {error}\n"
+    "Answer again with valid JSON only, strictly in the required format."
+)
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class AnswerSchema:
+    """Ожидаемый ответ на prompt"""
+    name: str  # метка в метриках и имя схемы в response_format
+    model: Type[BaseModel]
+    list_key: str  # ответ голым массивом считается значением этого поля
+
+    def response_format(self) -> Optional[dict]:
+        """Подсказка формата для запроса к API по настройке LLM_RESPONSE_FORMAT"""
+        if settings.LLM_RESPONSE_FORMAT == "json_schema":
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": self.name, "schema": self.model.model_json_schema()},
+            }
+        if settings.LLM_RESPONSE_FORMAT == "json_object":
+            return {"type": "json_object"}
+        return None
+
+    def parse(self, text: str) -> Tuple[BaseModel, bool]:
+        """
+        Разобрать и проверить ответ
+
+        Returns:
+            Tuple[BaseModel, bool]: ответ и признак того, что JSON пришлось чинить
+
+        Raises:
+            ValueError: ответ не чинится или не соответствует схеме
+        """
+        repaired = False
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = json.loads(repair_json(text))
+            repaired = True
+        if isinstance(data, list):
+            data = {self.list_key: data}
+        try:
+            return self.model.model_validate(data), repaired
+        except ValidationError as e:
+            first = e.errors()[0]
+            location = ".".join(str(part) for part in first["loc"])
+            raise ValueError(f"ответ не соответствует схеме {self.name}: {location}: {first['msg']}") from None
+
+
+CATEGORIES_ANSWER = AnswerSchema("categories", CategoriesAnswer, "category_ids")
+ROUTE_PLACES_ANSWER = AnswerSchema("route", RoutePlacesAnswer, "route")
+ROUTE_IDS_ANSWER = AnswerSchema("route", RouteIdsAnswer, "route")
+REASONING_ANSWER = AnswerSchema("reasoning", ReasoningAnswer, "reasons")
+
+
+def _closers(stack: List[str]) -> str:
+    return "".join(reversed(stack))
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ",":
+        del out[end - 1:]
+
+
+def repair_json(text: str) -> str:
+    """
+    Локальная починка JSON из ответа LLM
+
+    Убирает ```json и текст до и после JSON, висячие запятые перед
+    закрывающей скобкой. Оборванный ответ закрывается: сначала как есть,
+    затем по последнему целиком полученному элементу.
+
+    Raises:
+        ValueError: JSON не удалось восстановить
+    """
+    text = _FENCE.sub("", text)
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        raise ValueError("в ответе нет JSON")
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    safe: Optional[Tuple[int, List[str]]] = None  # конец последнего целого элемента
+    for char in text[min(starts):]:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not stack or char != stack[-1]:
+                break
+            _drop_trailing_comma(out)
+            stack.pop()
+            out.append(char)
+            if not stack:
+                return "".join(out)
+            safe = (len(out), list(stack))
+            continue
+        elif char == ",":
+            safe = (len(out), list(stack))
+        out.append(char)
+
+    # Ответ оборван
+    candidates = ["".join(out) + ('"' if in_string else "") + _closers(stack)]
+    if safe is not None:
+        candidates.append("".join(out[:safe[0]]).rstrip().rstrip(",") + _closers(safe[1]))
+    for candidate in candidates:
+        try:
+            json.loads(candidate)
+            return candidate
+        except ValueError:
+            continue
+    raise ValueError("не удалось восстановить JSON ответа")
+
+
+def observe_outcome(schema: AnswerSchema, result: str) -> None:
+    """result: valid | repaired | retried | failed"""
+    LLM_STRUCTURED_OUTPUT.labels(prompt=schema.name, result=result).inc()
+
+
+def retry_prompt(prompt: str, error: Exception) -> str:
+    """Prompt повторного запроса с текстом ошибки разбора"""
+    return prompt + RETRY_INSTRUCTIONS.format(error=str(error)[:300])
+
+
+async def ask_structured(prompt: str, schema: AnswerSchema, stage: str) -> BaseModel:
+    """
+    Задать вопрос и получить проверенный ответ: починка, затем не больше одного повтора
+
+    Args:
+        prompt: Текст запроса
+        schema: Ожидаемый ответ
+        stage: Имя стадии для таймингов запроса (повтор - stage + "_retry")
+
+    Raises:
+        LLMError: ошибка вызова LLM
+        LLMResponseError: ответ невалиден и после повтора
+    """
+    with span(stage):
+        text = await ask_openrouter(prompt, settings.AI_API_KEY, response_format=schema.response_format())
+    try:
+        answer, repaired = schema.parse(text)
+        observe_outcome(schema, "repaired" if repaired else "valid")
+        return answer
+    except ValueError as e:
+        error = e
+
+    with span(f"{stage}_retry"):
+        text = await ask_openrouter(retry_prompt(prompt, error), settings.AI_API_KEY, response_format=schema.response_format())
+    try:
+        answer, _ = schema.parse(text)
+    except ValueError as e:
+        observe_outcome(schema, "failed")
+        raise LLMResponseError(f"LLM вернула невалидный JSON ({schema.name}) и после повтора: {e}") from e
+    observe_outcome(schema, "retried")
+    return answer
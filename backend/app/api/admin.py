@@ -0,0 +1,84 @@
+"""
+Admin API endpoint
+Служебные операции: обновление каталога в памяти
+"""
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+from app.config import settings
+from app.schemas.catalog import CatalogChangeSet
+from app.services.catalog import catalog
+
+router = APIRouter()
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Проверка токена администратора
+
+    Без настроенного ADMIN_API_TOKEN доступ закрыт, если явно не
+    включён ADMIN_API_OPEN (только для локальной разработки)
+    """
+    if settings.ADMIN_API_TOKEN:
+        if not secrets.compare_digest((x_admin_token or "").encode(), settings.ADMIN_API_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif not settings.ADMIN_API_OPEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled: set ADMIN_API_TOKEN")
+
+
+@router.get("/admin/catalog", dependencies=[Depends(require_admin)])
+async def get_catalog_info():
+    """
+    Информация о текущем снимке каталога
+
+    Returns:
+        dict: Количество мест и категорий, версия и время загрузки
+    """
+    snapshot = await catalog.get()
+    return snapshot.info()
+
+
+@router.post("/admin/catalog/refresh", dependencies=[Depends(require_admin)])
+async def refresh_catalog(force: bool = True):
+    """
+    Обновить снимок каталога
+
+    Args:
+        force: Перечитать каталог даже при неизменной версии
+
+    Returns:
+        dict: Признак обновления и информация о снимке
+    """
+    if force:
+        # Обычно вызывается сразу после загрузки данных - реплика может отставать
+        await catalog.reload(use_primary=True)
+        refreshed = True
+    else:
+        refreshed = await catalog.refresh_if_changed()
+
+    return {
+        "refreshed": refreshed,
+        "catalog": catalog.snapshot.info()
+    }
+
+
+@router.post("/admin/catalog/changes", dependencies=[Depends(require_admin)])
+async def apply_catalog_changes(changes: CatalogChangeSet):
+    """
+    Обновить снимок каталога по набору изменений синхронизации
+
+    Из БД читаются только перечисленные места. Остальные воркеры
+    подхватят те же изменения при периодической проверке версии.
+
+    Args:
+        changes: Набор изменений из load_data.py --sync
+
+    Returns:
+        dict: Размер набора изменений и информация о снимке
+    """
+    snapshot = await catalog.apply_changes(changes)
+    return {
+        "applied": changes.summary(),
+        "catalog": snapshot.info()
+    }
+
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database import get_db
+from app.database import get_read_db
 from app.models.category import Category
 from app.models.place import Place
 
@@ -10,7 +10,7 @@ router = APIRouter()
 
 
 @router.get("/categories")
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     """
     Получить список всех категорий мест из базы данных
     
@@ -48,7 +48,7 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/categories/{category_id}")
-async def get_category_by_id(category_id: int, db: AsyncSession = Depends(get_db)):
+async def get_category_by_id(category_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Получить информацию о конкретной категории
     
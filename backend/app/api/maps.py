@@ -7,6 +7,7 @@ from pydantic import BaseModel
 from typing import Optional
 import httpx
 from app.config import settings
+from app.services.geocoder import geocoder, GeocoderError
 
 router = APIRouter()
 
@@ -65,49 +66,21 @@ async def geocode_address(request: GeocodeRequest):
     if not settings.YANDEX_GEOCODER_API_KEY:
         raise HTTPException(status_code=500, detail="Geocoder API key not configured")
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://geocode-maps.yandex.ru/1.x/",
-                params={
-                    "apikey": settings.YANDEX_GEOCODER_API_KEY,
-                    "geocode": f"Нижний Новгород, {request.address}",  # Добавляем город для точности
-                    "format": "json",
-                    "results": 1
-                },
-                timeout=10.0
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Парсим ответ
-            geo_objects = data.get("response", {}).get("GeoObjectCollection", {}).get("featureMember", [])
-            
-            if not geo_objects:
-                raise HTTPException(status_code=404, detail="Адрес не найден")
-            
-            # Берём первый результат
-            geo_object = geo_objects[0]["GeoObject"]
-            point = geo_object["Point"]["pos"]
-            formatted_address = geo_object.get("metaDataProperty", {}).get("GeocoderMetaData", {}).get("text", "")
-            
-            # Координаты в формате "долгота широта"
-            lon, lat = map(float, point.split())
-            
-            return {
-                "address": request.address,
-                "latitude": lat,
-                "longitude": lon,
-                "formatted_address": formatted_address
-            }
-            
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Geocoding API error: {str(e)}")
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Connection error: {str(e)}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Geocoding error: {str(e)}")
+    try:
+        # Добавляем город для точности; повторные адреса берутся из кэша
+        result = await geocoder.geocode(f"Нижний Новгород, {request.address}")
+    except GeocoderError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Адрес не найден")
+
+    return {
+        "address": request.address,
+        "latitude": result["latitude"],
+        "longitude": result["longitude"],
+        "formatted_address": result["formatted_address"]
+    }
         
 
 @router.post("/maps/suggestions")
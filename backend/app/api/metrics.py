@@ -0,0 +1,55 @@
+"""
+Metrics API endpoint
+Метрики в формате Prometheus и middleware для HTTP запросов
+"""
+import time
+
+from fastapi import APIRouter, Response
+
+from app.services.metrics import HTTP_IN_PROGRESS, HTTP_REQUEST_DURATION, HTTP_REQUESTS, render_latest
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Текстовый формат Prometheus (со всех воркеров при PROMETHEUS_MULTIPROC_DIR)"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware: число и длительность HTTP запросов
+
+    Метка route - шаблон пути (/api/places/nearby), а не фактический
+    путь, чтобы число временных рядов не росло с каждым запросом.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method=method, route=route_path, status=str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method=method, route=route_path).observe(time.perf_counter() - started)
@@ -0,0 +1,85 @@
+"""
+Places API endpoint
+Поиск мест рядом с точкой по пространственному индексу каталога
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from app.services.catalog import catalog
+
+router = APIRouter()
+
+
+def _place_item(place: dict, distance_km: Optional[float] = None) -> dict:
+    item = {
+        "id": place["id"],
+        "title": place["title"],
+        "address": place["address"],
+        "category": {"id": place["category_id"], "name": place["category"]},
+        "coordinates": {"latitude": place["latitude"], "longitude": place["longitude"]},
+        "avg_visit_duration": place["avg_visit_duration"],
+    }
+    if distance_km is not None:
+        item["distance_km"] = round(distance_km, 3)
+    return item
+
+
+@router.get("/places/nearby")
+async def get_places_nearby(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=200),
+    limit: int = Query(20, ge=1, le=500),
+    category_id: Optional[List[int]] = Query(None),
+):
+    """
+    Ближайшие места к точке
+
+    Args:
+        latitude, longitude: Точка поиска
+        radius_km: Если указан - все места в радиусе (не больше limit), иначе limit ближайших
+        limit: Максимальное количество мест
+        category_id: Фильтр по категориям (можно несколько)
+
+    Returns:
+        dict: Места по возрастанию расстояния
+    """
+    snapshot = await catalog.get()
+    index = snapshot.spatial_index
+
+    if radius_km is not None:
+        hits = index.radius(latitude, longitude, radius_km, category_id)[:limit]
+    else:
+        hits = index.nearest(latitude, longitude, limit, category_id)
+
+    places = [_place_item(snapshot.places_by_id[place_id], distance) for place_id, distance in hits]
+    return {
+        "places": places,
+        "total": len(places)
+    }
+
+
+@router.get("/places/bbox")
+async def get_places_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(500, ge=1, le=5000),
+    category_id: Optional[List[int]] = Query(None),
+):
+    """
+    Места внутри видимой области карты
+
+    Returns:
+        dict: Места в прямоугольнике координат
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+
+    snapshot = await catalog.get()
+    place_ids = snapshot.spatial_index.bbox(min_lat, min_lon, max_lat, max_lon, category_id)[:limit]
+    places = [_place_item(snapshot.places_by_id[place_id]) for place_id in place_ids]
+    return {
+        "places": places,
+        "total": len(places)
+    }
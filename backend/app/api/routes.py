@@ -1,85 +1,395 @@
-from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from app.schemas.route import RouteRequest, RouteResponse
-from app.database import get_db
-from app.models.place import Place
 from app.config import settings
-from app.ai.deepseek_api import ask_openrouter
-from app.ai.prompts import build_categories_prompt, build_route_prompt
-from app.ai.get_from_db import get_categories_from_db, get_places_from_db
-from app.ai.parsers import build_route_response_from_parsed, clean_ai_response, load_category_map, parse_categories_response, parse_route_response, update_coords_with_yandex_geocoder
-import time
+from app.ai.deepseek_api import ask_openrouter, stream_openrouter
+from app.ai.llm_client import LLMError, LLMResponseError, LLMTimeoutError
+from app.ai.category_cache import category_cache
+from app.ai.prompts import build_categories_prompt, build_reasoning_prompt
+from app.ai.parsers import build_route_response_from_parsed
+from app.ai.structured import CATEGORIES_ANSWER, REASONING_ANSWER, ask_structured, observe_outcome, retry_prompt
+from app.services.catalog import CatalogSnapshot, catalog
+from app.services.candidates import select_candidates
+from app.services.llm_route import RouteCollector, RoutePrompt, build_route_llm_prompt
+from app.services.logging_service import log_route_request
+from app.services.route_planner import plan_route, plan_to_parsed_response
+from app.services.metrics import LLM_PROMPT_TOKENS_ESTIMATED, ROUTE_TIME_TO_FIRST_PLACE
+from app.utils.timing import RequestTimer, span, start_request_timer
+from contextlib import aclosing
+from typing import List, Optional, Tuple
+import json
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
+async def add_llm_reasoning(parsed_response: dict, user_interests: str) -> None:
+    """
+    Дополнить локальный план пояснениями от LLM
+
+    Порядок мест не меняется; при ошибке LLM маршрут возвращается без пояснений
+    """
+    places = parsed_response["route"]["places"]
+    if not places:
+        return
+    try:
+        answer = await ask_structured(build_reasoning_prompt(places, user_interests), REASONING_ANSWER, "reasoning_llm")
+    except LLMError as e:
+        logger.warning("Не удалось получить пояснения к маршруту: %s", e)
+        return
+    reasons = {item.id: item.reasoning for item in answer.reasons}
+    for place in places:
+        place["reasoning"] = reasons.get(place["id"])
+
+
+def known_categories(snapshot: CatalogSnapshot, category_ids: List[int]) -> List[int]:
+    """Только категории каталога: выдуманный LLM id не должен попасть в кэш"""
+    return [cat_id for cat_id in category_ids if cat_id in snapshot.category_names]
+
+
+def category_cache_key(route_request: RouteRequest, snapshot: CatalogSnapshot):
+    return category_cache.make_key(route_request.user_interests, snapshot.category_names, snapshot.category_times)
+
+
+async def select_route_categories(route_request: RouteRequest, snapshot: CatalogSnapshot) -> List[int]:
+    """Категории по интересам пользователя (из кэша или от LLM)"""
+    category_names, category_times = snapshot.category_names, snapshot.category_times
+
+    # Одинаковые интересы при той же таблице категорий не требуют LLM
+    cache_key = category_cache_key(route_request, snapshot)
+    selected_cat_ids = category_cache.get(cache_key)
+
+    if selected_cat_ids is None:
+        prompt1 = build_categories_prompt(route_request.user_interests, category_names, category_times)
+        answer = await ask_structured(prompt1, CATEGORIES_ANSWER, "categories_llm")
+        selected_cat_ids = known_categories(snapshot, answer.category_ids)
+        if selected_cat_ids:
+            category_cache.set(cache_key, selected_cat_ids)
+
+    if not selected_cat_ids:
+        selected_cat_ids = list(category_names.keys())
+    return selected_cat_ids
+
+
+def find_route_candidates(
+    route_request: RouteRequest,
+    snapshot: CatalogSnapshot,
+    selected_cat_ids: List[int],
+    top_k: Optional[int] = None
+) -> List[dict]:
+    """Только места выбранных категорий (пустой список - все) в радиусе поиска, лучшие top-K"""
+    with span("candidates"):
+        places = select_candidates(
+            snapshot.spatial_index,
+            snapshot.places_by_id,
+            selected_cat_ids,
+            route_request.user_location.latitude,
+            route_request.user_location.longitude,
+            route_request.available_time_hours,
+            top_k=top_k,
+        )
+    if not places:
+        raise HTTPException(status_code=404, detail="Рядом с указанным адресом не найдено подходящих мест")
+    return places
+
+
+def build_prompt(route_request: RouteRequest, snapshot: CatalogSnapshot, places: List[dict], pipeline: str) -> RoutePrompt:
+    """Prompt маршрута для LLM; оценка его размера идёт в метрики"""
+    prompt = build_route_llm_prompt(
+        snapshot,
+        places,
+        route_request.user_interests,
+        route_request.available_time_hours,
+        route_request.user_location.latitude,
+        route_request.user_location.longitude,
+        pipeline=pipeline,
+    )
+    LLM_PROMPT_TOKENS_ESTIMATED.labels(prompt_format=prompt.prompt_format, pipeline=pipeline).observe(prompt.estimated_tokens)
+    return prompt
+
+
+def single_shot_candidates(route_request: RouteRequest, snapshot: CatalogSnapshot) -> Tuple[Optional[List[int]], List[dict]]:
+    """
+    Кандидаты для режима single_shot без отдельного вызова LLM
+
+    Если категории для этих интересов уже в кэше, кандидаты отбираются
+    по ним; иначе - по всем категориям (с чередованием категорий) и
+    категории выбирает та же LLM, что строит маршрут.
+
+    Returns:
+        Tuple[Optional[List[int]], List[dict]]: категории из кэша (или None) и кандидаты
+    """
+    cached_cat_ids = category_cache.get(category_cache_key(route_request, snapshot))
+    if cached_cat_ids:
+        return cached_cat_ids, find_route_candidates(route_request, snapshot, cached_cat_ids)
+    return None, find_route_candidates(route_request, snapshot, [], top_k=settings.SINGLE_SHOT_CANDIDATES_TOP_K)
+
+
+def remember_single_shot_categories(route_request: RouteRequest, snapshot: CatalogSnapshot, category_ids: List[int]) -> List[int]:
+    """Сохранить категории из ответа single_shot в кэш выбора категорий"""
+    category_ids = known_categories(snapshot, category_ids)
+    if category_ids:
+        category_cache.set(category_cache_key(route_request, snapshot), category_ids)
+    return category_ids
+
+
+async def plan_locally(route_request: RouteRequest, snapshot: CatalogSnapshot, places: List[dict], planner: str) -> dict:
+    """Локальный планировщик: реальные координаты, без LLM и геокодера"""
+    with span("planner"):
+        plan = plan_route(
+            places,
+            route_request.user_location.latitude,
+            route_request.user_location.longitude,
+            route_request.available_time_hours,
+            distances=snapshot.distances,
+        )
+    parsed_response = plan_to_parsed_response(plan)
+    if planner == "hybrid":
+        await add_llm_reasoning(parsed_response, route_request.user_interests)
+    return parsed_response
+
+
+async def complete_route_answer(collector: RouteCollector) -> List[dict]:
+    """
+    Проверить ответ с маршрутом целиком
+
+    Если ответ не прошёл схему и мест из него не получено, LLM
+    спрашивается ещё один раз с текстом ошибки.
+
+    Returns:
+        List[dict]: места, принятые на этом шаге
+
+    Raises:
+        LLMResponseError: ответ невалиден и после повтора
+    """
+    schema = collector.prompt.answer_schema
+    try:
+        with span("parse"):
+            accepted = collector.finish()
+        observe_outcome(schema, "repaired" if collector.repaired else "valid")
+        return accepted
+    except ValueError as e:
+        error = e
+
+    logger.warning("Невалидный ответ LLM с маршрутом, повторный запрос: %s", error)
+    with span("route_llm_retry"):
+        route_text = await ask_openrouter(retry_prompt(collector.prompt.text, error), settings.AI_API_KEY, response_format=schema.response_format())
+    collector.restart()
+    try:
+        with span("parse"):
+            accepted = collector.feed(route_text)
+            accepted += collector.finish()
+    except ValueError as e:
+        observe_outcome(schema, "failed")
+        raise LLMResponseError(f"LLM вернула невалидный маршрут и после повтора: {e}") from e
+    observe_outcome(schema, "retried")
+    return accepted
+
+
+def finish_route(
+    route_request: RouteRequest,
+    request: Request,
+    timer: RequestTimer,
+    parsed_response: dict,
+    filtered_places_count: int,
+    planner: str,
+    coordinate_sources: dict,
+    prompt: Optional[RoutePrompt] = None
+) -> RouteResponse:
+    """Собрать ответ, поставить запрос в очередь аналитики и приложить тайминги"""
+    request_id = str(uuid.uuid4())
+    with span("response"):
+        exec_time_ms = int(timer.elapsed_ms())
+        route_response_dict = build_route_response_from_parsed(parsed_response, route_request, request_id, exec_time_ms, filtered_places_count, planner, coordinate_sources, prompt.pipeline if prompt else None)
+        route_response = RouteResponse.model_validate(route_response_dict)
+        if prompt is not None:
+            route_response.metadata.prompt_format = prompt.prompt_format
+            route_response.metadata.prompt_tokens = prompt.estimated_tokens
+    logger.debug("Built route response: %s", route_response)
+
+    # Логируем запрос/ответ (запись в БД выполняется в фоне)
+    client_ip = request.client.host if request.client else None
+    user_agent = request.headers.get("user-agent")
+    stage_timings = timer.as_dict()
+    log_route_request(route_request, route_response, request_id, exec_time_ms, client_ip, user_agent, stage_timings)
+    timer.add("logging", stage_timings["logging"])
+
+    if settings.EXPOSE_TIMINGS:
+        route_response.metadata.timings = timer.as_dict()
+    return route_response
+
+
+def error_status(error: Exception) -> Tuple[int, str]:
+    """HTTP статус и текст ошибки генерации маршрута"""
+    if isinstance(error, HTTPException):
+        return error.status_code, str(error.detail)
+    if isinstance(error, LLMTimeoutError):
+        return 504, str(error)
+    if isinstance(error, LLMError):
+        return 502, str(error)
+    return 500, str(error)
+
+
 @router.post("/route/generate", response_model=RouteResponse)
 async def generate_route(
     route_request: RouteRequest,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    response: Response
 ):
-    start_time = time.time()
-    request_id = f"req_{str(time.time_ns())[-8:]}"
+    timer = start_request_timer()
 
     try:
-        # Запрос категорий по интересам пользователя
-        category_names, category_times = await get_categories_from_db(db)
+        # Каталог берётся из снимка в памяти, без запросов к БД
+        with span("catalog"):
+            snapshot = await catalog.get()
 
-        print(f"category_names keys: {list(category_names.keys())} // type: {type(category_names)}")
-        print(f"category_times keys: {list(category_times.keys())} // type: {type(category_times)}")
+        planner = route_request.planner or settings.ROUTE_PLANNER
+        pipeline = (route_request.pipeline or settings.ROUTE_PIPELINE) if planner == "llm" else None
 
-        prompt1 = build_categories_prompt(route_request.user_interests, category_names, category_times)
-        categories_text = await ask_openrouter(prompt1, settings.AI_API_KEY)
-        cleaned_categories_text = clean_ai_response(categories_text)
-        print(f"parse_categories_response input: {repr(cleaned_categories_text)}")
-        if not cleaned_categories_text.strip():
-            raise ValueError("Пустой ответ для парсинга категорий")
-
-       
-        selected_cat_ids = parse_categories_response(cleaned_categories_text)
-        if not selected_cat_ids:
-            selected_cat_ids = list(category_names.keys())
-
-        places = await get_places_from_db(db)   
-
-        # Формируем prompt для генерации маршрута
-        prompt2 = build_route_prompt(places, route_request.available_time_hours, {
-            "latitude": route_request.user_location.latitude,
-            "longitude": route_request.user_location.longitude,
-        })
-
-        # Запрашиваем маршрут у нейросети
-        route_text = await ask_openrouter(prompt2, settings.AI_API_KEY)
-        cleaned_route_text = clean_ai_response(route_text)
-        print("AI response:", cleaned_route_text)
-
-        # Парсим ответ в структуру для frontend
-        category_map = await load_category_map(db)
-
-        result = await db.execute(select(Place))  
-        db_places_list = result.scalars().all()
-        db_places = {place.title.lower(): place.id for place in db_places_list}
-        parsed_response = parse_route_response(cleaned_route_text, category_map, db_places)
-        parsed_response = await update_coords_with_yandex_geocoder(settings.YANDEX_GEOCODER_API_KEY, parsed_response)
-        request_id = str(uuid.uuid4())
-        exec_time_ms = int((time.time() - start_time) * 1000)      
-        route_response_dict = build_route_response_from_parsed(parsed_response, route_request, request_id, exec_time_ms )
-        route_response = RouteResponse.parse_obj(route_response_dict)
-        print(f"\n\nBilded route responce: {route_response}\n\n")
-        
-
-        # Логируем запрос/ответ
-        client_ip = request.client.host if request.client else None
-        user_agent = request.headers.get("user-agent")
-        from app.services.logging_service import log_route_request
-        await log_route_request(db, route_request, route_response, request_id, exec_time_ms, client_ip, user_agent)
+        prompt = None
+        if pipeline == "single_shot":
+            # Категории и маршрут одним вызовом LLM
+            selected_cat_ids, places = single_shot_candidates(route_request, snapshot)
+        else:
+            selected_cat_ids = await select_route_categories(route_request, snapshot)
+            places = find_route_candidates(route_request, snapshot, selected_cat_ids)
+
+        if planner == "llm":
+            prompt = build_prompt(route_request, snapshot, places, pipeline)
+            # Запрашиваем маршрут у нейросети
+            with span("route_llm"):
+                route_text = await ask_openrouter(prompt.text, settings.AI_API_KEY, response_format=prompt.answer_schema.response_format())
+            logger.debug("AI response: %s", route_text)
+
+            # Разбираем ответ; координаты из каталога, геокодер только для несопоставленных мест
+            collector = RouteCollector(prompt, snapshot)
+            with span("parse"):
+                collector.feed(route_text)
+            await complete_route_answer(collector)
+            if pipeline == "single_shot" and selected_cat_ids is None:
+                remember_single_shot_categories(route_request, snapshot, collector.category_ids)
+            with span("geocoding"):
+                coordinate_sources = await collector.resolve_remaining()
+            parsed_response = collector.parsed_response()
+        else:
+            parsed_response = await plan_locally(route_request, snapshot, places, planner)
+            coordinate_sources = {"catalog": len(parsed_response["route"]["places"])}
 
+        route_response = finish_route(route_request, request, timer, parsed_response, len(places), planner, coordinate_sources, prompt)
+        if settings.EXPOSE_TIMINGS:
+            response.headers["Server-Timing"] = timer.server_timing()
         return route_response
 
+    except HTTPException:
+        raise
+    except LLMError as e:
+        status_code, detail = error_status(e)
+        raise HTTPException(status_code=status_code, detail=detail)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Ошибка генерации маршрута")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def sse_event(event: str, data) -> str:
+    """Одно событие Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def categories_event(snapshot: CatalogSnapshot, category_ids: List[int]) -> str:
+    return sse_event("categories", {
+        "selected_categories": category_ids,
+        "names": [snapshot.category_names.get(cat_id) for cat_id in category_ids]
+    })
+
+
+async def route_events(route_request: RouteRequest, request: Request):
+    """
+    События потоковой генерации маршрута
+
+    categories -> place (каждое место, как только оно разобрано) ->
+    route (координаты, итоги и метаданные) или error. В режиме
+    single_shot без категорий в кэше событие categories идёт после мест.
+    """
+    timer = start_request_timer()
+    planner = route_request.planner or settings.ROUTE_PLANNER
+
+    def first_place_seen() -> None:
+        if "time_to_first_place" not in timer.stages:
+            ROUTE_TIME_TO_FIRST_PLACE.labels(planner=planner).observe(timer.mark("time_to_first_place") / 1000)
+
+    try:
+        with span("catalog"):
+            snapshot = await catalog.get()
+
+        pipeline = (route_request.pipeline or settings.ROUTE_PIPELINE) if planner == "llm" else None
+        if pipeline == "single_shot":
+            # Категории придут в том же ответе LLM, что и маршрут
+            selected_cat_ids, places = single_shot_candidates(route_request, snapshot)
+        else:
+            selected_cat_ids = await select_route_categories(route_request, snapshot)
+            places = find_route_candidates(route_request, snapshot, selected_cat_ids)
+        if selected_cat_ids is not None:
+            yield categories_event(snapshot, selected_cat_ids)
+
+        prompt = None
+        if planner == "llm":
+            prompt = build_prompt(route_request, snapshot, places, pipeline)
+            collector = RouteCollector(prompt, snapshot)
+
+            with span("route_llm"):
+                stream = stream_openrouter(prompt.text, settings.AI_API_KEY, response_format=prompt.answer_schema.response_format())
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        # feed() добавляет в collector.places все места, законченные в этом куске
+                        start = len(collector.places)
+                        for offset, place in enumerate(collector.feed(chunk)):
+                            first_place_seen()
+                            yield sse_event("place", {"index": start + offset, "place": place})
+
+            # Если поток не разобрался по частям, места берутся из ответа целиком
+            # (или из повторного ответа, если первый не прошёл схему)
+            for place in await complete_route_answer(collector):
+                first_place_seen()
+                yield sse_event("place", {"index": collector.places.index(place), "place": place})
+            if pipeline == "single_shot" and selected_cat_ids is None:
+                yield categories_event(snapshot, remember_single_shot_categories(route_request, snapshot, collector.category_ids))
+
+            with span("geocoding"):
+                coordinate_sources = await collector.resolve_remaining()
+            parsed_response = collector.parsed_response()
+        else:
+            parsed_response = await plan_locally(route_request, snapshot, places, planner)
+            coordinate_sources = {"catalog": len(parsed_response["route"]["places"])}
+            for index, place in enumerate(parsed_response["route"]["places"]):
+                first_place_seen()
+                yield sse_event("place", {"index": index, "place": place})
+
+        route_response = finish_route(route_request, request, timer, parsed_response, len(places), planner, coordinate_sources, prompt)
+        yield sse_event("route", route_response.model_dump())
+
+    except Exception as e:
+        status_code, detail = error_status(e)
+        if status_code == 500:
+            logger.exception("Ошибка потоковой генерации маршрута")
+        yield sse_event("error", {"status_code": status_code, "detail": detail})
+
+
+@router.post("/route/generate/stream")
+async def generate_route_stream(
+    route_request: RouteRequest,
+    request: Request
+):
+    """
+    Потоковая генерация маршрута (text/event-stream)
+
+    Первое место приходит, как только LLM допишет его объект в JSON массиве,
+    а не после всего ответа и геокодирования.
+    """
+    return StreamingResponse(
+        route_events(route_request, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -2,123 +2,181 @@
 Stats API endpoint
 Статистика использования сервиса
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app.models.user_request import UserRequest
+from app.database import get_read_db
 from app.models.category import Category
-from typing import Dict, List
-from datetime import datetime, timedelta
+from app.models.category_usage import CategoryUsage
+from app.ai.category_cache import category_cache
+from app.services.geocoder import geocoder
+from app.services.analytics_sink import analytics_sink
+from app.services.stats_rollup import as_utc, read_window
+from app.services.latency_histogram import latency_recorder
+from typing import Literal, Optional
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 
 
 @router.get("/stats")
-async def get_stats(db: AsyncSession = Depends(get_db)):
+async def get_stats(
+    date_from: Optional[datetime] = Query(None, alias="from", description="Начало окна (ISO 8601, UTC по умолчанию)"),
+    date_to: Optional[datetime] = Query(None, alias="to", description="Конец окна, не включительно"),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
     Получить общую статистику использования сервиса
     
+    Читает только часовые/дневные корзины request_stats_buckets.
+    Без from/to статистика считается за всё время.
+    
     Returns:
         dict: Статистика запросов, популярных категорий, средних значений
     """
-    # Общее количество запросов
-    total_requests_result = await db.execute(
-        select(func.count()).select_from(UserRequest)
-    )
-    total_requests = total_requests_result.scalar()
+    date_from = as_utc(date_from) if date_from else None
+    date_to = as_utc(date_to) if date_to else None
+    if date_from and date_to and date_from >= date_to:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+
+    # Запросы за окно (или за всё время)
+    window = await read_window(db, date_from, date_to)
     
     # Запросы за последние 24 часа
-    yesterday = datetime.utcnow() - timedelta(days=1)
-    recent_requests_result = await db.execute(
-        select(func.count()).select_from(UserRequest)
-        .where(UserRequest.created_at >= yesterday)
-    )
-    recent_requests = recent_requests_result.scalar()
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    recent = await read_window(db, yesterday, None)
     
     # Средние значения
-    avg_result = await db.execute(
-        select(
-            func.avg(UserRequest.total_places).label('avg_places'),
-            func.avg(UserRequest.total_distance_km).label('avg_distance'),
-            func.avg(UserRequest.total_time_minutes).label('avg_time'),
-            func.avg(UserRequest.execution_time_ms).label('avg_execution')
-        )
-    )
-    avg_data = avg_result.first()
+    avg_places = window.average("places")
+    avg_distance = window.average("distance")
+    avg_time = window.average("time")
+    avg_execution = window.average("execution")
     
-    # Популярные запросы (топ интересов)
-    interests_result = await db.execute(
-        select(UserRequest.user_interests, func.count().label('count'))
-        .group_by(UserRequest.user_interests)
-        .order_by(func.count().desc())
-        .limit(10)
-    )
+    # Популярные запросы (топ интересов) и локации - из скетчей корзин
     popular_interests = [
-        {"interests": row[0], "count": row[1]} 
-        for row in interests_result
+        {"interests": interests, "count": count}
+        for interests, count in window.interests.top(10)
     ]
-    
-    # Популярные локации
-    locations_result = await db.execute(
-        select(UserRequest.user_address, func.count().label('count'))
-        .group_by(UserRequest.user_address)
-        .order_by(func.count().desc())
-        .limit(10)
-    )
     popular_locations = [
-        {"address": row[0], "count": row[1]} 
-        for row in locations_result
+        {"address": address, "count": count}
+        for address, count in window.locations.top(10)
     ]
     
     return {
-        "total_requests": total_requests or 0,
-        "recent_requests_24h": recent_requests or 0,
+        "total_requests": window.requests_count,
+        "recent_requests_24h": recent.requests_count,
+        "window": {
+            "from": date_from.isoformat() if date_from else None,
+            "to": date_to.isoformat() if date_to else None
+        },
         "averages": {
-            "places_per_route": round(avg_data[0], 1) if avg_data[0] else 0,
-            "distance_km": round(avg_data[1], 2) if avg_data[1] else 0,
-            "time_minutes": round(avg_data[2], 1) if avg_data[2] else 0,
-            "execution_time_ms": round(avg_data[3], 1) if avg_data[3] else 0
+            "places_per_route": round(avg_places, 1) if avg_places else 0,
+            "distance_km": round(avg_distance, 2) if avg_distance else 0,
+            "time_minutes": round(avg_time, 1) if avg_time else 0,
+            "execution_time_ms": round(avg_execution, 1) if avg_execution else 0
         },
         "popular_interests": popular_interests,
         "popular_locations": popular_locations
     }
 
 
+@router.get("/stats/latency")
+async def get_latency_stats(
+    date_from: Optional[datetime] = Query(None, alias="from", description="Начало окна (ISO 8601, UTC по умолчанию)"),
+    date_to: Optional[datetime] = Query(None, alias="to", description="Конец окна, не включительно"),
+    stage: Optional[str] = Query(None, description="Стадия пайплайна (total - запрос целиком)"),
+    scope: Literal["window", "process"] = Query("window", description="window - корзины в БД, process - текущий воркер с момента старта"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Перцентили задержек генерации маршрута
+    
+    Считаются по сливаемым гистограммам (точность ±2%): из часовых/дневных
+    корзин за окно или из памяти текущего воркера.
+    
+    Returns:
+        dict: count, mean, min, max, p50/p90/p95/p99 по стадиям
+    """
+    if scope == "process":
+        return {
+            "scope": scope,
+            "stages": latency_recorder.summary(stage)
+        }
+
+    date_from = as_utc(date_from) if date_from else None
+    date_to = as_utc(date_to) if date_to else None
+    if date_from and date_to and date_from >= date_to:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+
+    window = await read_window(db, date_from, date_to)
+    return {
+        "scope": scope,
+        "window": {
+            "from": date_from.isoformat() if date_from else None,
+            "to": date_to.isoformat() if date_to else None
+        },
+        "stages": {
+            name: histogram.summary()
+            for name, histogram in sorted(window.latency.items())
+            if stage is None or name == stage
+        }
+    }
+
+
 @router.get("/stats/categories")
-async def get_category_stats(db: AsyncSession = Depends(get_db)):
+async def get_category_stats(db: AsyncSession = Depends(get_read_db)):
     """
     Статистика по популярности категорий
     
     Returns:
         dict: Список категорий с количеством использований
     """
-    # Получаем все категории
-    categories_result = await db.execute(select(Category))
-    categories = {cat.id: cat.name for cat in categories_result.scalars().all()}
-    
-    # Подсчитываем использование каждой категории
-    category_stats = []
-    
-    for cat_id, cat_name in categories.items():
-        # Считаем сколько раз категория встречалась в маршрутах
-        count_result = await db.execute(
-            select(func.count())
-            .select_from(UserRequest)
-            .where(UserRequest.selected_categories.contains([cat_id]))
+    # Один запрос: категории со счётчиками, которые ведёт запись аналитики
+    result = await db.execute(
+        select(
+            Category.id,
+            Category.name,
+            func.coalesce(CategoryUsage.usage_count, 0).label('usage_count')
         )
-        count = count_result.scalar()
-        
-        category_stats.append({
+        .outerjoin(CategoryUsage, CategoryUsage.category_id == Category.id)
+        .order_by(func.coalesce(CategoryUsage.usage_count, 0).desc(), Category.id)
+    )
+    
+    category_stats = [
+        {
             "category_id": cat_id,
             "category_name": cat_name,
-            "usage_count": count or 0
-        })
-    
-    # Сортируем по популярности
-    category_stats.sort(key=lambda x: x['usage_count'], reverse=True)
+            "usage_count": usage_count
+        }
+        for cat_id, cat_name, usage_count in result
+    ]
     
     return {
         "categories": category_stats,
         "total_categories": len(category_stats)
     }
+
+
+@router.get("/stats/cache")
+async def get_cache_stats():
+    """
+    Статистика кэшей, экономящих внешние обращения
+
+    Returns:
+        dict: Попадания, промахи и размер кэшей выбора категорий и геокодера
+    """
+    return {
+        "category_selection": category_cache.stats(),
+        "geocoder": geocoder.stats()
+    }
+
+
+@router.get("/stats/sink")
+async def get_sink_stats():
+    """
+    Состояние фоновой записи запросов в аналитику
+
+    Returns:
+        dict: Размер очереди, записанные, отброшенные и неудачные записи
+    """
+    return analytics_sink.stats()
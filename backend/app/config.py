@@ -2,7 +2,7 @@
 Конфигурация приложения
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal
 
 class Settings(BaseSettings):
     # Основные настройки
@@ -12,13 +12,59 @@ class Settings(BaseSettings):
     
     # База данных
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10  # постоянных соединений на процесс
+    DB_MAX_OVERFLOW: int = 10  # сверх пула при пиковой нагрузке
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # ожидание свободного соединения
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 - не пересоздавать соединения
+    DB_POOL_PRE_PING: bool = True  # проверять соединение перед выдачей из пула
+    DB_ECHO: bool = False  # логировать SQL
+    DATABASE_READ_URL: str = ""  # реплика для чтения (статистика, категории, каталог); пусто - всё через DATABASE_URL
+    DB_REPLICA_MAX_LAG_SECONDS: float = 30.0  # при большем отставании чтение идёт в основную БД
+    DB_REPLICA_CHECK_SECONDS: float = 10.0  # как часто проверять отставание и доступность реплики
     
     # API ключи
     AI_API_KEY: str = ""
     YANDEX_MAPS_API_KEY: str = ""
     YANDEX_GEOCODER_API_KEY: str = ""
     YANDEX_SUGGEST_API_URL: str = ""
-    
+
+    # LLM
+    AI_API_URL: str = "https://openrouter.ai/api/v1/chat/completions"
+    AI_MODEL: str = "deepseek/deepseek-chat"
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_RESPONSE_FORMAT: str = "json_schema"  # json_schema | json_object | off - подсказка формата ответа для API
+
+    # Кэш выбора категорий
+    CATEGORY_CACHE_SIZE: int = 1024
+    CATEGORY_CACHE_TTL_SECONDS: int = 3600
+
+    # Каталог мест в памяти
+    CATALOG_VERSION_CHECK_SECONDS: int = 300  # 0 - только ручное обновление
+    ADMIN_API_TOKEN: str = ""
+    ADMIN_API_OPEN: bool = False  # admin API без токена; только для локальной разработки
+    SPATIAL_INDEX_CELL_KM: float = 1.0
+    DISTANCE_CACHE_SIZE: int = 256
+
+    # Геокодер
+    GEOCODER_MAX_CONCURRENCY: int = 8
+    GEOCODER_TIMEOUT_SECONDS: float = 10.0
+    GEOCODER_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    GEOCODER_NEGATIVE_TTL_SECONDS: int = 24 * 3600
+    GEOCODER_CACHE_PATH: str = "geocode_cache.json"
+    GEOCODER_CACHE_SAVE_SECONDS: int = 60  # 0 - сохранять кэш только при остановке
+
+    # Аналитика (фоновая запись user_requests)
+    ANALYTICS_QUEUE_SIZE: int = 10000
+    ANALYTICS_BATCH_SIZE: int = 200
+    ANALYTICS_FLUSH_INTERVAL_SECONDS: float = 2.0
+    STATS_TOP_CAPACITY: int = 50  # размер скетча популярных интересов/адресов в корзине
+
+    # Логирование и замеры
+    LOG_LEVEL: str = "INFO"
+    EXPOSE_TIMINGS: bool = True  # заголовок Server-Timing и metadata.timings в ответе
+
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
     
@@ -27,6 +73,12 @@ class Settings(BaseSettings):
     WALKING_SPEED_KMH: float = 4.5
     MIN_PLACES_IN_ROUTE: int = 1
     MAX_PLACES_IN_ROUTE: int = 5
+    ROUTE_CANDIDATES_TOP_K: int = 30
+    ROUTE_PIPELINE: Literal["two_step", "single_shot"] = "two_step"  # single_shot - категории и маршрут одним вызовом LLM
+    SINGLE_SHOT_CANDIDATES_TOP_K: int = 40
+    ROUTE_PROMPT_FORMAT: str = "compact"  # compact (строки id|..., ответ - id мест) | verbose
+    PROMPT_TOKEN_BUDGET: int = 1200  # оценка токенов prompt маршрута; лишние кандидаты отбрасываются
+    ROUTE_PLANNER: Literal["llm", "local", "hybrid"] = "llm"
     
     class Config:
         env_file = ".env"
@@ -1,19 +1,61 @@
 ﻿"""
 Подключение к PostgreSQL
+
+Каждый запрос получает собственную AsyncSession из async_session: сессия
+не делится между конкурентными задачами asyncio и закрывается (соединение
+возвращается в пул) по завершении запроса. Размеры пула задаются
+настройками DB_POOL_*.
+
+Если задан DATABASE_READ_URL, тяжёлые чтения (get_read_db, read_session)
+идут в реплику, пока она доступна и отстаёт не больше
+DB_REPLICA_MAX_LAG_SECONDS; иначе - в основную БД. Запись всегда идёт
+в основную БД.
 """
-import greenlet
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, async_scoped_session
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Optional
 from app.config import settings
 
-# Создание async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True if settings.ENVIRONMENT == "development" else False,
-    future=True
+logger = logging.getLogger(__name__)
+
+REPLICA_CHECK_TIMEOUT_SECONDS = 2.0
+
+# Отставание в секундах; 0 для основной БД и для реплики, которая проиграла всё полученное
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
 )
 
+# Ошибки соединения, после которых реплика считается недоступной
+CONNECTION_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+
+def build_engine(url: str, **kwargs) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        future=True,
+        **kwargs
+    )
+
+
+# Создание async engine
+engine = build_engine(settings.DATABASE_URL)
+
 # Создание async session factory
 async_session = async_sessionmaker(
     engine, 
@@ -21,25 +63,124 @@ async_session = async_sessionmaker(
     expire_on_commit=False
 )
 
-async_scoped_session = async_scoped_session(
-    async_session,
-    scopefunc=greenlet.getcurrent,
-)
+# Реплика только для чтения (необязательна)
+replica_engine = build_engine(
+    settings.DATABASE_READ_URL,
+    connect_args={"timeout": REPLICA_CHECK_TIMEOUT_SECONDS},
+) if settings.DATABASE_READ_URL else None
+replica_session = async_sessionmaker(
+    replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if replica_engine is not None else None
 
 # Base класс для моделей
 Base = declarative_base()
 
 
+class ReplicaHealth:
+    """
+    Состояние реплики для чтения
+
+    Доступность и отставание проверяются не чаще раза в
+    DB_REPLICA_CHECK_SECONDS; ошибка соединения в запросе сразу
+    переводит чтение на основную БД до следующей проверки.
+    """
+
+    def __init__(self):
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= settings.DB_REPLICA_CHECK_SECONDS
+
+    async def is_usable(self) -> bool:
+        if replica_engine is None:
+            return False
+        if self._is_stale():
+            async with self._lock:
+                if self._is_stale():
+                    self.healthy = await self._check()
+                    self._checked_at = time.monotonic()
+        return self.healthy
+
+    async def _check(self) -> bool:
+        # app.services импортирует app.database, поэтому метрики импортируются здесь
+        from app.services.metrics import DB_REPLICA_LAG
+
+        try:
+            # Таймаут на всю проверку вместе с подключением: недоступная реплика
+            # не должна держать блокировку, которую ждут запросы на чтение
+            self.lag = await asyncio.wait_for(self._fetch_lag(), REPLICA_CHECK_TIMEOUT_SECONDS)
+        except Exception as e:
+            if self.healthy or self._checked_at is None:
+                logger.warning("Реплика для чтения недоступна, чтение из основной БД: %s", e)
+            return False
+
+        DB_REPLICA_LAG.set(self.lag)
+        if self.lag > settings.DB_REPLICA_MAX_LAG_SECONDS:
+            if self.healthy or self._checked_at is None:
+                logger.warning("Реплика отстаёт на %.1f с, чтение из основной БД", self.lag)
+            return False
+        return True
+
+    async def _fetch_lag(self) -> float:
+        async with replica_engine.connect() as connection:
+            result = await connection.execute(REPLICA_LAG_QUERY)
+            return float(result.scalar() or 0)
+
+    def mark_failed(self) -> None:
+        self.healthy = False
+        self._checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth()
+
+
 # Dependency для получения сессии БД
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency для получения async сессии базы данных
+
+    Новая сессия на каждый запрос; при выходе незавершённая транзакция
+    откатывается, а соединение возвращается в пул.
     
     Yields:
         AsyncSession: Async сессия SQLAlchemy
     """
-    async with async_scoped_session() as session:
+    async with async_session() as session:
+        yield session
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    Сессия только для чтения: реплика, если она пригодна, иначе основная БД
+
+    Данные реплики могут отставать на DB_REPLICA_MAX_LAG_SECONDS.
+    """
+    from app.services.metrics import DB_READ_SESSIONS
+
+    use_replica = await replica_health.is_usable()
+    DB_READ_SESSIONS.labels(target="replica" if use_replica else "primary").inc()
+    factory = replica_session if use_replica else async_session
+    async with factory() as session:
         try:
             yield session
-        finally:
-            await session.close()
+        except CONNECTION_ERRORS:
+            if use_replica:
+                replica_health.mark_failed()
+            raise
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency для сессии только для чтения (статистика, справочники)
+
+    Yields:
+        AsyncSession: Сессия реплики или основной БД
+    """
+    async with read_session() as session:
+        yield session
@@ -1,13 +1,66 @@
-﻿from fastapi import FastAPI
+﻿import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Импортируем роутер
-from app.api import health, categories, routes, maps, stats
+from app.api import health, categories, routes, maps, stats, admin, places, metrics
+from app.ai.llm_client import llm_client
+from app.config import settings
+from app.database import engine
+from app.services.catalog import catalog
+from app.services.geocoder import geocoder
+from app.services.analytics_sink import analytics_sink
+from app.services.metrics import instrument_pool, mark_process_dead
+
+logging.basicConfig(
+    level=settings.LOG_LEVEL.upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка общих ресурсов приложения"""
+    instrument_pool(engine)
+    geocoder.load_cache()
+    try:
+        await catalog.reload()
+    except Exception as e:
+        # Каталог будет загружен при первом запросе
+        logger.warning("Не удалось загрузить каталог при старте: %s", e)
+
+    analytics_sink.start()
+
+    catalog_watcher = None
+    if settings.CATALOG_VERSION_CHECK_SECONDS > 0:
+        catalog_watcher = asyncio.create_task(catalog.watch(settings.CATALOG_VERSION_CHECK_SECONDS))
+
+    geocoder_saver = None
+    if settings.GEOCODER_CACHE_SAVE_SECONDS > 0:
+        geocoder_saver = asyncio.create_task(geocoder.autosave(settings.GEOCODER_CACHE_SAVE_SECONDS))
+
+    yield
+
+    for task in (catalog_watcher, geocoder_saver):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await analytics_sink.stop()
+    await llm_client.close()
+    await geocoder.close()
+    geocoder.save_cache()
+    mark_process_dead()
+
 
 app = FastAPI(
     title="AI Tourist Assistant API",
     description="API для генерации туристических маршрутов",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -18,6 +71,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.PrometheusMiddleware)
 
 # Подключаем роуты
 app.include_router(health.router, prefix="/api", tags=["Health"])
@@ -25,6 +79,9 @@ app.include_router(categories.router, prefix="/api", tags=["Categories"])
 app.include_router(routes.router, prefix="/api", tags=["Routes"])
 app.include_router(maps.router, prefix="/api", tags=["Maps"])
 app.include_router(stats.router, prefix="/api", tags=["Stats"])
+app.include_router(places.router, prefix="/api", tags=["Places"])
+app.include_router(admin.router, prefix="/api", tags=["Admin"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 
 @app.get("/")
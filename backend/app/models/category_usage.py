@@ -0,0 +1,21 @@
+﻿"""
+SQLAlchemy модель CategoryUsage - счётчики использования категорий
+"""
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class CategoryUsage(Base):
+    """
+    Сколько маршрутов включали категорию
+
+    Обновляется инкрементально при записи пачек user_requests,
+    чтобы /api/stats/categories не сканировал всю историю запросов
+    """
+    
+    __tablename__ = "category_usage"
+    
+    category_id = Column(Integer, primary_key=True)
+    usage_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
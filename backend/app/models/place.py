@@ -19,8 +19,9 @@ class Place(Base):
     category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"))
     url = Column(String(500))
     is_active = Column(Boolean, default=True)
+    source_hash = Column(String(32))  # хэш строки датасета для инкрементальной синхронизации
     created_at = Column(TIMESTAMP, server_default=func.now())
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), index=True)
     
     # Relationships
     category = relationship("Category", backref="places")
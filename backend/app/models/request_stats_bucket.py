@@ -0,0 +1,41 @@
+﻿"""
+SQLAlchemy модель RequestStatsBucket - агрегаты запросов по часам и дням
+"""
+from sqlalchemy import Column, String, BigInteger, Float, DateTime, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class RequestStatsBucket(Base):
+    """
+    Предагрегированная статистика запросов за час или день
+
+    Обновляется инкрементально при записи пачек user_requests;
+    /api/stats читает только корзины, а не всю историю запросов
+    """
+    
+    __tablename__ = "request_stats_buckets"
+    
+    granularity = Column(String(8), primary_key=True)  # hour | day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    
+    requests_count = Column(BigInteger, nullable=False, default=0)
+    
+    # Суммы и количества ненулевых значений для средних
+    places_sum = Column(Float, nullable=False, default=0)
+    places_count = Column(BigInteger, nullable=False, default=0)
+    distance_sum = Column(Float, nullable=False, default=0)
+    distance_count = Column(BigInteger, nullable=False, default=0)
+    time_sum = Column(Float, nullable=False, default=0)
+    time_count = Column(BigInteger, nullable=False, default=0)
+    execution_sum = Column(Float, nullable=False, default=0)
+    execution_count = Column(BigInteger, nullable=False, default=0)
+    
+    # Скетчи Space-Saving: значение -> [счётчик, погрешность]
+    top_interests = Column(JSON, nullable=True)
+    top_locations = Column(JSON, nullable=True)
+    
+    # Гистограммы задержек: стадия -> {bins, count, sum, min, max}
+    latency_histograms = Column(JSON, nullable=True)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
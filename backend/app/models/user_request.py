@@ -32,6 +32,7 @@ class UserRequest(Base):
     execution_time_ms = Column(Integer, nullable=True)
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
+    stage_timings = Column(JSON, nullable=True)  # Время стадий, мс
     
     # Временные метки
     created_at = Column(DateTime(timezone=True), server_default=func.now())
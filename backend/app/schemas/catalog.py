@@ -0,0 +1,22 @@
+"""
+Pydantic схемы для каталога мест
+"""
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class CatalogChangeSet(BaseModel):
+    """Изменения мест после синхронизации каталога"""
+    inserted: List[int] = Field(default_factory=list, description="id добавленных мест")
+    updated: List[int] = Field(default_factory=list, description="id изменённых или снова активных мест")
+    deleted: List[int] = Field(default_factory=list, description="id мест, помеченных неактивными")
+
+    @property
+    def place_ids(self) -> List[int]:
+        return self.inserted + self.updated + self.deleted
+
+    def is_empty(self) -> bool:
+        return not (self.inserted or self.updated or self.deleted)
+
+    def summary(self) -> dict:
+        return {"inserted": len(self.inserted), "updated": len(self.updated), "deleted": len(self.deleted)}
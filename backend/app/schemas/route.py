@@ -2,7 +2,7 @@
 Pydantic схемы для маршрутов
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 
 class UserLocation(BaseModel):
@@ -17,6 +17,14 @@ class RouteRequest(BaseModel):
     user_interests: str = Field(..., description="Интересы пользователя", min_length=1)
     available_time_hours: int = Field(..., description="Доступное время (часы)", ge=1, le=8)
     user_location: UserLocation
+    planner: Optional[Literal["llm", "local", "hybrid"]] = Field(
+        None,
+        description="Способ построения маршрута: llm, local (локальный планировщик) или hybrid (локальный план + пояснения от LLM)"
+    )
+    pipeline: Optional[Literal["two_step", "single_shot"]] = Field(
+        None,
+        description="Для planner=llm: two_step (категории, затем маршрут) или single_shot (один вызов LLM)"
+    )
 
 
 class PlaceCoordinates(BaseModel):
@@ -62,9 +70,68 @@ class RouteMetadata(BaseModel):
     filtered_places_count: int
     request_id: str
     execution_time_ms: int
+    planner: Optional[str] = None
+    pipeline: Optional[str] = None
+    prompt_format: Optional[str] = None
+    prompt_tokens: Optional[int] = Field(None, description="Оценка размера prompt маршрута в токенах")
+    coordinate_sources: Optional[Dict[str, int]] = Field(
+        None,
+        description="Сколько координат взято из каталога, нечёткого сопоставления, геокодера и ответа LLM"
+    )
+    timings: Optional[Dict[str, float]] = Field(
+        None,
+        description="Время стадий обработки запроса в миллисекундах"
+    )
 
 
 class RouteResponse(BaseModel):
     """Ответ с маршрутом"""
     route: RouteData
     metadata: RouteMetadata
+
+
+class LLMPlaceCategory(BaseModel):
+    """Категория места в ответе LLM"""
+    id: Optional[int] = None
+    name: str = ""
+
+
+class LLMRoutePlace(BaseModel):
+    """Место в ответе LLM на подробный prompt маршрута"""
+    id: Optional[int] = None
+    title: str = Field(..., min_length=1)
+    address: str = ""
+    coordinates: Optional[PlaceCoordinates] = None
+    category: Optional[LLMPlaceCategory] = None
+    description: str = ""
+    visit_duration: int = 30
+    distance_from_user: Optional[float] = None
+    reasoning: Optional[str] = None
+
+
+class CategoriesAnswer(BaseModel):
+    """Ответ LLM с выбранными категориями"""
+    category_ids: List[int]
+
+
+class RoutePlacesAnswer(BaseModel):
+    """Ответ LLM с местами маршрута (подробный prompt)"""
+    route: List[LLMRoutePlace]
+    category_ids: Optional[List[int]] = None
+
+
+class RouteIdsAnswer(BaseModel):
+    """Ответ LLM с id мест маршрута (компактный prompt)"""
+    route: List[int]
+    category_ids: Optional[List[int]] = None
+
+
+class PlaceReasoning(BaseModel):
+    """Пояснение к месту маршрута"""
+    id: int
+    reasoning: str
+
+
+class ReasoningAnswer(BaseModel):
+    """Ответ LLM с пояснениями к готовому маршруту"""
+    reasons: List[PlaceReasoning]
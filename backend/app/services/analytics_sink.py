@@ -0,0 +1,184 @@
+"""
+Analytics Sink - Фоновая пакетная запись запросов пользователей
+
+Обработчик запроса только кладёт компактную запись в ограниченную
+очередь в памяти; фоновая задача забирает записи пачками и пишет их
+одним многострочным INSERT по достижении размера пачки или по таймеру.
+При переполнении очереди записи отбрасываются (со счётчиком), чтобы
+аналитика никогда не тормозила выдачу маршрута. Пачка, которую не
+удалось записать, повторяется один раз и только потом теряется. При
+остановке приложения очередь дописывается до конца.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import List, Optional
+
+from sqlalchemy import insert, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.user_request import UserRequest
+from app.models.category_usage import CategoryUsage
+from app.services.stats_rollup import apply_batch as apply_stats_rollup
+from app.services.metrics import ANALYTICS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+# Лимит параметров одного запроса asyncpg; на запись user_requests - по параметру на столбец
+MAX_BIND_PARAMETERS = 32767
+MAX_BATCH_SIZE = MAX_BIND_PARAMETERS // len(UserRequest.__table__.columns)
+RETRY_DELAY_SECONDS = 1.0
+
+
+class AnalyticsSink:
+    """Очередь записей user_requests с фоновым пакетным писателем"""
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval_seconds: float):
+        self.max_queue_size = max_queue_size
+        if batch_size > MAX_BATCH_SIZE:
+            logger.warning("ANALYTICS_BATCH_SIZE=%d превышает лимит параметров запроса, используется %d", batch_size, MAX_BATCH_SIZE)
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        return self._queue
+
+    def enqueue(self, record: dict) -> bool:
+        """Поставить запись в очередь; False, если очередь переполнена"""
+        if self._stopping:
+            self.dropped += 1
+            ANALYTICS_DROPPED.inc()
+            return False
+        try:
+            self._get_queue().put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            ANALYTICS_DROPPED.inc()
+            return False
+        self.enqueued += 1
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить писателя, дописав всё, что осталось в очереди"""
+        self._stopping = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _next_batch(self) -> List[dict]:
+        """Собрать пачку: ждать до batch_size записей, но не дольше flush_interval"""
+        queue = self._get_queue()
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            if self._stopping:
+                break
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=min(timeout, 0.5)))
+            except asyncio.TimeoutError:
+                continue
+        return batch
+
+    async def _run(self) -> None:
+        queue = self._get_queue()
+        while not (self._stopping and queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self.flush(batch)
+
+    async def flush(self, batch: List[dict]) -> None:
+        """Записать пачку одной транзакцией; при ошибке - ещё одна попытка"""
+        start = time.perf_counter()
+        try:
+            await self._write(batch)
+        except Exception as e:
+            logger.warning("Не удалось записать %d запросов в аналитику, повтор: %s", len(batch), e)
+            self.retried += 1
+            await asyncio.sleep(RETRY_DELAY_SECONDS)
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error("Запросы аналитики потеряны (%d) после повтора: %s", len(batch), e)
+                return
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _write(self, batch: List[dict]) -> None:
+        async with async_session() as session:
+            await self.write_batch(session, batch)
+            await session.commit()
+
+    async def write_batch(self, session: AsyncSession, batch: List[dict]) -> None:
+        await session.execute(insert(UserRequest).values(batch))
+        await self._update_category_usage(session, batch)
+        await apply_stats_rollup(session, batch)
+
+    async def _update_category_usage(self, session: AsyncSession, batch: List[dict]) -> None:
+        """Прибавить использования категорий из пачки к счётчикам category_usage"""
+        counts = Counter()
+        for record in batch:
+            counts.update(set(record.get("selected_categories") or []))
+        if not counts:
+            return
+
+        stmt = pg_insert(CategoryUsage).values([
+            {"category_id": category_id, "usage_count": count}
+            for category_id, count in sorted(counts.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CategoryUsage.category_id],
+            set_={
+                "usage_count": CategoryUsage.usage_count + stmt.excluded.usage_count,
+                "updated_at": func.now(),
+            }
+        )
+        await session.execute(stmt)
+
+    def stats(self) -> dict:
+        return {
+            "queue_size": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retried_batches": self.retried,
+            "batches": self.batches,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+analytics_sink = AnalyticsSink(
+    max_queue_size=settings.ANALYTICS_QUEUE_SIZE,
+    batch_size=settings.ANALYTICS_BATCH_SIZE,
+    flush_interval_seconds=settings.ANALYTICS_FLUSH_INTERVAL_SECONDS,
+)
@@ -0,0 +1,67 @@
+"""
+Candidates Service - Отбор мест-кандидатов для маршрута
+
+Между выбором категорий и построением промпта оставляем только места
+выбранных категорий в радиусе поиска от пользователя, укладывающиеся
+во время маршрута, и обрезаем список до top-K лучших.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from app.config import settings
+from app.services.spatial_index import SpatialIndex
+from app.utils.geo import walking_minutes
+
+
+def select_candidates(
+    spatial_index: SpatialIndex,
+    places_by_id: Dict[int, dict],
+    selected_cat_ids: Iterable[int],
+    latitude: float,
+    longitude: float,
+    available_time_hours: int,
+    radius_km: float = None,
+    top_k: int = None,
+) -> List[dict]:
+    """
+    Отобрать и ранжировать места-кандидаты
+
+    Место проходит фильтр, если его категория выбрана, оно ближе radius_km
+    и посещение вместе с дорогой туда и обратно укладывается в доступное время.
+    Ранжирование - по доле бюджета времени, которую съедает место
+    (дорога + посещение), с чередованием категорий, чтобы top-K
+    не состоял из одной ближайшей категории.
+
+    Returns:
+        List[dict]: Копии словарей мест с полем distance_km
+    """
+    radius_km = settings.MAX_SEARCH_RADIUS_KM if radius_km is None else radius_km
+    top_k = settings.ROUTE_CANDIDATES_TOP_K if top_k is None else top_k
+    budget_minutes = available_time_hours * 60
+    category_ids = list(selected_cat_ids) or None
+
+    by_category: Dict[int, List[tuple]] = defaultdict(list)
+    for place_id, distance in spatial_index.radius(latitude, longitude, radius_km, category_ids):
+        place = places_by_id[place_id]
+        cost = 2 * walking_minutes(distance, settings.WALKING_SPEED_KMH) + place["avg_visit_duration"]
+        if cost > budget_minutes:
+            continue
+        by_category[place.get("category_id")].append((cost, distance, place))
+
+    for ranked in by_category.values():
+        ranked.sort(key=lambda item: item[0])
+
+    # Чередуем категории: лучший из каждой, затем второй из каждой и т.д.
+    queues = sorted(by_category.values(), key=lambda ranked: ranked[0][0])
+    candidates = []
+    position = 0
+    while len(candidates) < top_k and queues:
+        queues = [ranked for ranked in queues if position < len(ranked)]
+        for ranked in queues:
+            if len(candidates) >= top_k:
+                break
+            _, distance, place = ranked[position]
+            candidates.append({**place, "distance_km": round(distance, 2)})
+        position += 1
+
+    return candidates
@@ -0,0 +1,284 @@
+"""
+Catalog Service - Снимок каталога мест в памяти процесса
+
+Каталог меняется только при загрузке данных (load_data.py), поэтому
+места, категории, индекс названий и карта категорий читаются из БД один
+раз при старте и затем обновляются по команде администратора или при
+изменении версии (количество строк и max(updated_at)) в таблицах.
+Если изменились только места, снимок обновляется по набору изменений:
+из БД читаются лишь изменённые строки, а индексы перестраиваются
+по спискам в памяти.
+
+Полная загрузка и проверка версии читают из реплики (read_session),
+если она настроена; снимок может отставать от основной БД не больше
+чем на DB_REPLICA_MAX_LAG_SECONDS. Набор изменений от load_data.py
+применяется по основной БД - реплика могла ещё не получить эти строки.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session, read_session
+from app.models.category import Category
+from app.models.place import Place
+from app.ai.parsers import build_category_map
+from app.schemas.catalog import CatalogChangeSet
+from app.services.spatial_index import SpatialIndex, build_spatial_index
+from app.services.distance_matrix import DistanceMatrixService
+from app.services.title_matcher import TitleMatcher
+
+logger = logging.getLogger(__name__)
+
+CatalogVersion = Tuple[int, Optional[datetime], int, Optional[datetime]]
+
+
+@dataclass
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога"""
+    places: List[dict]
+    places_by_id: Dict[int, dict]
+    category_names: Dict[int, str]
+    category_times: Dict[int, int]
+    category_map: Dict[str, Dict]
+    title_index: Dict[str, int]
+    title_matcher: TitleMatcher
+    spatial_index: SpatialIndex
+    distances: DistanceMatrixService
+    version: CatalogVersion
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+
+    def info(self) -> dict:
+        places_count, places_updated, categories_count, categories_updated = self.version
+        return {
+            "places": places_count,
+            "active_places": len(self.places),
+            "categories": categories_count,
+            "places_updated_at": places_updated.isoformat() if places_updated else None,
+            "categories_updated_at": categories_updated.isoformat() if categories_updated else None,
+            "loaded_at": self.loaded_at.isoformat() + "Z",
+        }
+
+
+async def fetch_catalog_version(session: AsyncSession) -> CatalogVersion:
+    """Дешёвая проверка версии каталога без чтения строк"""
+    places_result = await session.execute(
+        select(func.count(Place.id), func.max(Place.updated_at))
+    )
+    places_count, places_updated = places_result.one()
+    categories_result = await session.execute(
+        select(func.count(Category.id), func.max(Category.updated_at))
+    )
+    categories_count, categories_updated = categories_result.one()
+    return places_count, places_updated, categories_count, categories_updated
+
+
+def is_version_behind(version: CatalogVersion, current: CatalogVersion) -> bool:
+    """Версия старше снимка: реплика ещё не получила изменения, уже прочитанные из основной БД"""
+    return any(
+        new is not None and old is not None and new < old
+        for new, old in ((version[1], current[1]), (version[3], current[3]))
+    )
+
+
+def place_to_dict(place: Place, category_names: Dict[int, str], category_times: Dict[int, int]) -> dict:
+    return {
+        "id": place.id,
+        "title": place.title,
+        "address": place.address,
+        "category_id": place.category_id,
+        "category": category_names.get(place.category_id, ""),
+        "avg_visit_duration": category_times.get(place.category_id) or 30,
+        "description": place.description,
+        "description_clean": place.description_clean,
+        "latitude": float(place.latitude),
+        "longitude": float(place.longitude),
+    }
+
+
+def assemble_snapshot(
+    places_by_id: Dict[int, dict],
+    category_names: Dict[int, str],
+    category_times: Dict[int, int],
+    title_index: Dict[str, int],
+    version: CatalogVersion,
+) -> CatalogSnapshot:
+    """Построить индексы по активным местам (в порядке id)"""
+    places = [places_by_id[place_id] for place_id in sorted(places_by_id)]
+    return CatalogSnapshot(
+        places=places,
+        places_by_id={place["id"]: place for place in places},
+        category_names=category_names,
+        category_times=category_times,
+        category_map=build_category_map(category_names),
+        title_index=title_index,
+        title_matcher=TitleMatcher(places),
+        spatial_index=build_spatial_index(places, settings.SPATIAL_INDEX_CELL_KM),
+        distances=DistanceMatrixService(places, settings.DISTANCE_CACHE_SIZE),
+        version=version,
+    )
+
+
+async def build_snapshot(session: AsyncSession) -> CatalogSnapshot:
+    """Прочитать каталог целиком и построить индексы"""
+    version = await fetch_catalog_version(session)
+
+    categories_result = await session.execute(select(Category).order_by(Category.id))
+    categories = categories_result.scalars().all()
+    category_names = {category.id: category.name for category in categories}
+    category_times = {category.id: category.avg_visit_duration for category in categories}
+
+    places_result = await session.execute(select(Place).order_by(Place.id))
+    places_by_id = {}
+    title_index = {}
+    for place in places_result.scalars().all():
+        title_index[place.title.lower()] = place.id
+        if place.is_active:
+            places_by_id[place.id] = place_to_dict(place, category_names, category_times)
+
+    return assemble_snapshot(places_by_id, category_names, category_times, title_index, version)
+
+
+async def patch_snapshot(
+    session: AsyncSession,
+    snapshot: CatalogSnapshot,
+    changes: CatalogChangeSet,
+    version: CatalogVersion,
+) -> CatalogSnapshot:
+    """
+    Новый снимок: текущий плюс изменённые места из БД
+
+    Строки мест из набора изменений читаются заново: активные
+    добавляются или заменяются, неактивные и удалённые убираются.
+    """
+    place_ids = list(set(changes.place_ids))
+    places_result = await session.execute(select(Place).where(Place.id.in_(place_ids)))
+    rows = {place.id: place for place in places_result.scalars().all()}
+
+    places_by_id = dict(snapshot.places_by_id)
+    title_index = dict(snapshot.title_index)
+    for place_id in place_ids:
+        old = places_by_id.pop(place_id, None)
+        if old is not None and title_index.get(old["title"].lower()) == place_id:
+            del title_index[old["title"].lower()]
+        place = rows.get(place_id)
+        if place is None:
+            continue
+        title_index[place.title.lower()] = place.id
+        if place.is_active:
+            places_by_id[place.id] = place_to_dict(place, snapshot.category_names, snapshot.category_times)
+
+    return assemble_snapshot(places_by_id, snapshot.category_names, snapshot.category_times, title_index, version)
+
+
+async def fetch_changes_since(session: AsyncSession, since: datetime) -> CatalogChangeSet:
+    """Места, изменённые начиная с момента since (по updated_at)"""
+    result = await session.execute(select(Place.id, Place.is_active).where(Place.updated_at >= since))
+    changes = CatalogChangeSet()
+    for place_id, is_active in result.all():
+        (changes.updated if is_active else changes.deleted).append(place_id)
+    return changes
+
+
+class Catalog:
+    """Держатель текущего снимка каталога для процесса"""
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    async def get(self) -> CatalogSnapshot:
+        """Текущий снимок; загружается при первом обращении, если не был загружен при старте"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            # Пока ждали блокировку, каталог мог загрузить другой запрос
+            if self._snapshot is not None:
+                return self._snapshot
+            return await self._load()
+
+    async def reload(self, use_primary: bool = False) -> CatalogSnapshot:
+        """
+        Полностью перечитать каталог из БД
+
+        Args:
+            use_primary: Читать из основной БД, а не из реплики
+        """
+        async with self._lock:
+            return await self._load(use_primary)
+
+    async def _load(self, use_primary: bool = False) -> CatalogSnapshot:
+        """Прочитать каталог и заменить снимок; вызывается под self._lock"""
+        async with (async_session() if use_primary else read_session()) as session:
+            snapshot = await build_snapshot(session)
+        self._snapshot = snapshot
+        logger.info("Каталог загружен: %d мест, %d категорий", len(snapshot.places), len(snapshot.category_names))
+        return snapshot
+
+    async def apply_changes(self, changes: CatalogChangeSet) -> CatalogSnapshot:
+        """
+        Обновить снимок по набору изменений мест
+
+        Каталог перечитывается целиком, если снимка ещё нет, изменились
+        категории или изменений больше, чем мест в снимке.
+        """
+        async with self._lock:
+            current = self._snapshot
+            if current is None:
+                return await self._load()
+            async with async_session() as session:
+                version = await fetch_catalog_version(session)
+                if version[2:] != current.version[2:] or len(changes.place_ids) > len(current.places):
+                    snapshot = await build_snapshot(session)
+                else:
+                    snapshot = await patch_snapshot(session, current, changes, version)
+            self._snapshot = snapshot
+            logger.info(
+                "Каталог обновлён по изменениям %s: %d мест",
+                changes.summary(), len(snapshot.places)
+            )
+            return snapshot
+
+    async def refresh_if_changed(self) -> bool:
+        """
+        Обновить каталог, если версия в БД отличается от снимка
+
+        Если изменились только места и ни одно не удалено физически,
+        читаются лишь строки с updated_at не раньше версии снимка.
+        """
+        current = self._snapshot
+        changes = None
+        async with read_session() as session:
+            version = await fetch_catalog_version(session)
+            if current is not None and (version == current.version or is_version_behind(version, current.version)):
+                return False
+            places_only = current is not None and version[2:] == current.version[2:]
+            if places_only and current.version[1] is not None and version[0] >= current.version[0]:
+                changes = await fetch_changes_since(session, current.version[1])
+        if changes is None or changes.is_empty():
+            await self.reload()
+        else:
+            await self.apply_changes(changes)
+        return True
+
+    async def watch(self, interval_seconds: float) -> None:
+        """Фоновая периодическая проверка версии каталога"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.refresh_if_changed()
+            except Exception as e:
+                logger.warning("Не удалось проверить версию каталога: %s", e)
+
+
+catalog = Catalog()
@@ -0,0 +1,457 @@
+"""
+Catalog Loader Service - Пакетная загрузка каталога мест
+
+Файл датасета разбирается целиком векторными операциями pandas:
+координаты из "POINT (lon lat)" и очистка HTML - регулярными
+выражениями по столбцу, без цикла по строкам. Места пишутся пачками
+INSERT ... ON CONFLICT (id) DO UPDATE: один запрос на пачку вместо
+SELECT на каждую строку. Строка обновляется, только если данные
+изменились, поэтому повторная загрузка того же файла ничего не меняет
+и не сдвигает версию каталога.
+
+Датасет приходит кусками (app.services.catalog_sources): следующий
+кусок читается и готовится в отдельном потоке, пока текущий пишется в
+БД, поэтому память ограничена парой кусков, а не размером файла.
+
+Инкрементальная синхронизация (sync_catalog) сравнивает хэш полей
+каждой строки датасета с source_hash в БД и пишет только новые и
+изменённые места; места, пропавшие из датасета, помечаются
+is_active = false. Результат - набор изменений CatalogChangeSet,
+по которому работающий API обновляет снимок каталога без полного
+перечитывания.
+"""
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import literal_column, or_, select, true, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.models.category import Category
+from app.models.place import Place
+from app.schemas.catalog import CatalogChangeSet
+
+# Маппинг category_id из датасета на наши категории
+CATEGORY_MAPPING = {
+    1: 1,   # Памятники и скульптуры
+    2: 2,   # Парки и скверы
+    3: 3,   # Тактильные макеты
+    4: 4,   # Набережные
+    5: 5,   # Архитектура и достопримечательности
+    6: 6,   # Культурные центры и досуг
+    7: 7,   # Музеи
+    8: 8,   # Театры и филармонии
+    10: 9,  # Стрит-арт и мозаики (category_id 10 в датасете → 9 в нашей БД)
+}
+
+CATEGORIES = [
+    {"id": 1, "name": "Памятники и скульптуры", "description": "Памятники историческим личностям и скульптуры", "avg_visit_duration": 15},
+    {"id": 2, "name": "Парки и скверы", "description": "Парки, скверы, сады для прогулок и отдыха", "avg_visit_duration": 45},
+    {"id": 3, "name": "Тактильные макеты", "description": "Тактильные макеты достопримечательностей для людей с ОВЗ", "avg_visit_duration": 10},
+    {"id": 4, "name": "Набережные", "description": "Набережные рек Волги и Оки", "avg_visit_duration": 30},
+    {"id": 5, "name": "Архитектура и достопримечательности", "description": "Исторические здания, архитектурные памятники", "avg_visit_duration": 20},
+    {"id": 6, "name": "Культурные центры и досуг", "description": "Дворцы культуры, планетарии, кинотеатры", "avg_visit_duration": 60},
+    {"id": 7, "name": "Музеи", "description": "Музеи, галереи, выставочные центры", "avg_visit_duration": 60},
+    {"id": 8, "name": "Театры и филармонии", "description": "Театры, филармонии, концертные залы", "avg_visit_duration": 120},
+    {"id": 9, "name": "Стрит-арт и мозаики", "description": "Уличное искусство, граффити, советские мозаики", "avg_visit_duration": 10},
+]
+
+SOURCE_COLUMNS = ["id", "title", "address", "coordinate", "description", "category_id", "url"]
+PLACE_COLUMNS = ["id", "title", "address", "latitude", "longitude", "description", "description_clean", "category_id", "url", "source_hash"]
+UPDATABLE_COLUMNS = [column for column in PLACE_COLUMNS if column != "id"]
+
+# Поля строки датасета, изменение которых меняет место
+HASH_COLUMNS = ["title", "address", "latitude", "longitude", "description", "category_id"]
+
+# Синхронизация не пометит неактивными больше этой доли мест (вероятно, файл неполный)
+MAX_DELETE_RATIO = 0.5
+
+# Ограничения длины столбцов таблицы places
+TITLE_MAX_LENGTH = 255
+URL_MAX_LENGTH = 500
+DESCRIPTION_MAX_LENGTH = 1000
+
+# Лимит параметров одного запроса asyncpg. INSERT мест берёт на строку столбцы
+# PLACE_COLUMNS и is_active (значение по умолчанию модели) - 11 параметров, плюс
+# несколько на сам запрос: 1000 строк - около 11 000 параметров, а пачка больше
+# MAX_PLACES_PER_INSERT урезается
+MAX_BIND_PARAMETERS = 32767
+PARAMETERS_PER_PLACE = len(PLACE_COLUMNS) + 1
+MAX_PLACES_PER_INSERT = (MAX_BIND_PARAMETERS - PARAMETERS_PER_PLACE) // PARAMETERS_PER_PLACE
+DEFAULT_BATCH_SIZE = 1000
+
+_POINT = r"POINT\s*\(\s*(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)\s*\)"
+_HTML_TAG = r"<[^>]+>"
+
+
+@dataclass
+class LoadStats:
+    """Итоги загрузки"""
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    skipped: Dict[str, int] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)  # секунды по стадиям (разбор идёт параллельно записи)
+    elapsed: float = 0.0  # общее время, с
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    @property
+    def rows_per_second(self) -> float:
+        seconds = self.elapsed or sum(self.timings.values())
+        return self.read / seconds if seconds > 0 else 0.0
+
+    def add_timing(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def progress_line(self, fraction: Optional[float], elapsed: float) -> str:
+        """Строка прогресса с оценкой оставшегося времени по доле прочитанного файла"""
+        rate = self.read / elapsed if elapsed > 0 else 0.0
+        line = f"⏳ {self.read:,} строк, {rate:,.0f} строк/с"
+        if fraction:
+            line = f"⏳ {fraction:.0%}: {self.read:,} строк, {rate:,.0f} строк/с, осталось ~{elapsed * (1 - fraction) / fraction:.0f} с"
+        return line
+
+    def report(self) -> str:
+        lines = [
+            f"📊 Прочитано записей: {self.read}",
+            f"✅ Добавлено: {self.inserted}, обновлено: {self.updated}, без изменений: {self.unchanged}",
+        ]
+        if self.deleted:
+            lines.append(f"🗑️  Помечено неактивными: {self.deleted}")
+        if self.skipped:
+            reasons = ", ".join(f"{reason}: {count}" for reason, count in self.skipped.items())
+            lines.append(f"⚠️  Пропущено: {sum(self.skipped.values())} ({reasons})")
+        stages = ", ".join(f"{stage} {seconds:.2f} с" for stage, seconds in self.timings.items())
+        lines.append(f"⏱️  {stages}; всего {self.elapsed:.2f} с, {self.rows_per_second:,.0f} строк/с")
+        return "\n".join(lines)
+
+
+def _text(column: pd.Series) -> pd.Series:
+    """Столбец строк, пропуски - пустая строка"""
+    return column.fillna("").astype(str)
+
+
+def clean_html_column(column: pd.Series) -> pd.Series:
+    """Удалить HTML теги и схлопнуть пробелы во всём столбце"""
+    return (
+        _text(column)
+        .str.replace(_HTML_TAG, "", regex=True)
+        .str.split()
+        .str.join(" ")
+        .str.slice(0, DESCRIPTION_MAX_LENGTH)
+    )
+
+
+def prepare_places(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Привести датасет к строкам таблицы places
+
+    Args:
+        df: Датасет со столбцами id, title, address, coordinate, description, category_id, url
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, int]]: строки для записи и число пропущенных по причинам
+    """
+    skipped: Dict[str, int] = {}
+    df = df.reindex(columns=SOURCE_COLUMNS)
+
+    def drop(frame: pd.DataFrame, mask: pd.Series, reason: str) -> pd.DataFrame:
+        count = int(mask.sum())
+        if count:
+            skipped[reason] = skipped.get(reason, 0) + count
+        return frame[~mask]
+
+    points = _text(df["coordinate"]).str.extract(_POINT)
+    parsed = pd.DataFrame({
+        "id": pd.to_numeric(df["id"], errors="coerce"),
+        "latitude": pd.to_numeric(points[1], errors="coerce"),
+        "longitude": pd.to_numeric(points[0], errors="coerce"),
+        "category_id": pd.to_numeric(df["category_id"], errors="coerce").map(CATEGORY_MAPPING),
+    })
+    parsed = drop(parsed, parsed["id"].isna(), "нет id")
+    parsed = drop(parsed, parsed["latitude"].isna() | parsed["longitude"].isna(), "нет координат")
+    parsed = drop(parsed, parsed["category_id"].isna(), "неизвестная категория")
+    df = df.loc[parsed.index]
+
+    description = _text(df["description"]).str.slice(0, DESCRIPTION_MAX_LENGTH)
+    url = df["url"].astype(object).where(df["url"].notna(), None)
+    places = pd.DataFrame({
+        "id": parsed["id"].astype("int64"),
+        "title": _text(df["title"]).str.slice(0, TITLE_MAX_LENGTH),
+        "address": _text(df["address"]),
+        "latitude": parsed["latitude"],
+        "longitude": parsed["longitude"],
+        "description": description,
+        "description_clean": clean_html_column(description),
+        "category_id": parsed["category_id"].astype("int64"),
+        "url": url.map(lambda value: str(value)[:URL_MAX_LENGTH] if value is not None else None),
+    })
+    places["source_hash"] = source_hashes(places)
+
+    # Один id дважды в пачке ON CONFLICT не обновит; побеждает первая строка файла
+    duplicated = places["id"].duplicated(keep="first")
+    if duplicated.any():
+        skipped["повтор id"] = int(duplicated.sum())
+        places = places[~duplicated]
+    return places, skipped
+
+
+def source_hashes(places: pd.DataFrame) -> pd.Series:
+    """Хэш полей HASH_COLUMNS каждой строки; координаты - с точностью столбцов БД"""
+    joined = places["title"].str.cat([
+        places["address"],
+        places["latitude"].map("{:.8f}".format),
+        places["longitude"].map("{:.8f}".format),
+        places["description"],
+        places["category_id"].astype(str),
+    ], sep="\x1f")
+    return pd.Series([hashlib.md5(text.encode()).hexdigest() for text in joined], index=places.index, dtype=object)
+
+
+def frame_to_rows(places: pd.DataFrame) -> List[dict]:
+    """Строки DataFrame в словари с типами Python для драйвера БД"""
+    return places[PLACE_COLUMNS].to_dict("records")
+
+
+def places_upsert(rows: List[dict]):
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE для пачки мест
+
+    Обновляются только строки, где что-то изменилось или место было
+    неактивно; RETURNING возвращает id и признак вставки (xmax = 0 у
+    новой строки).
+    """
+    stmt = insert(Place.__table__).values(rows)
+    excluded = stmt.excluded
+    table = Place.__table__
+    changed = or_(
+        table.c.is_active.is_not(true()),
+        *(table.c[column].is_distinct_from(excluded[column]) for column in UPDATABLE_COLUMNS),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={**{column: excluded[column] for column in UPDATABLE_COLUMNS}, "is_active": True, "updated_at": func.now()},
+        where=changed,
+    ).returning(table.c.id, literal_column("xmax = 0").label("inserted"))
+
+
+async def upsert_categories(session: AsyncSession) -> int:
+    """Добавить недостающие категории одним запросом; существующие не меняются"""
+    stmt = insert(Category.__table__).values(CATEGORIES).on_conflict_do_nothing(index_elements=["id"])
+    result = await session.execute(stmt.returning(Category.__table__.c.id))
+    return len(result.all())
+
+
+async def upsert_places(session: AsyncSession, places: pd.DataFrame, stats: LoadStats, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    """Записать места пачками в одной транзакции сессии"""
+    batch_size = min(batch_size, MAX_PLACES_PER_INSERT)
+    rows = frame_to_rows(places)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        returned = (await session.execute(places_upsert(batch))).all()
+        inserted = sum(1 for row in returned if row.inserted)
+        stats.inserted += inserted
+        stats.updated += len(returned) - inserted
+        stats.unchanged += len(batch) - len(returned)
+
+
+def drop_seen(places: pd.DataFrame, seen_ids: Set[int], skipped: Dict[str, int]) -> pd.DataFrame:
+    """Убрать места с id из предыдущих кусков и запомнить id этого куска"""
+    ids = places["id"].tolist()
+    repeated = np.fromiter((place_id in seen_ids for place_id in ids), dtype=bool, count=len(ids))
+    seen_ids.update(ids)
+    if repeated.any():
+        skipped["повтор id"] = skipped.get("повтор id", 0) + int(repeated.sum())
+        places = places[~repeated]
+    return places
+
+
+async def prepared_chunks(
+    chunks: Iterable[pd.DataFrame],
+    stats: LoadStats,
+    seen_ids: Optional[Set[int]] = None,
+) -> AsyncIterator[pd.DataFrame]:
+    """
+    Подготовленные куски датасета
+
+    Следующий кусок читается и разбирается в отдельном потоке, пока
+    вызывающий код пишет текущий: в памяти не больше двух кусков.
+    Id, повторяющийся в разных кусках, как и внутри куска, берётся по
+    первой строке файла; seen_ids собирает id всех прочитанных мест.
+    """
+    iterator = iter(chunks)
+    seen_ids = set() if seen_ids is None else seen_ids
+
+    def next_prepared():
+        started = time.perf_counter()
+        frame = next(iterator, None)
+        if frame is None:
+            return None
+        places, skipped = prepare_places(frame)
+        places = drop_seen(places, seen_ids, skipped)
+        return places, len(frame), skipped, time.perf_counter() - started
+
+    pending = asyncio.ensure_future(asyncio.to_thread(next_prepared))
+    try:
+        while True:
+            result = await pending
+            if result is None:
+                return
+            pending = asyncio.ensure_future(asyncio.to_thread(next_prepared))
+            places, read, skipped, seconds = result
+            stats.read += read
+            for reason, count in skipped.items():
+                stats.skipped[reason] = stats.skipped.get(reason, 0) + count
+            stats.add_timing("чтение и разбор", seconds)
+            yield places
+    finally:
+        pending.cancel()
+
+
+async def load_catalog(
+    session: AsyncSession,
+    chunks: Iterable[pd.DataFrame],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[LoadStats], None]] = None,
+) -> LoadStats:
+    """
+    Загрузить категории и места датасета
+
+    Всё пишется в одной транзакции: при ошибке каталог остаётся прежним.
+
+    Args:
+        session: Сессия БД
+        chunks: Куски датасета (DataFrame)
+        batch_size: Строк в одном INSERT
+        progress: Вызывается после записи каждого куска
+    """
+    stats = LoadStats()
+    started = time.perf_counter()
+
+    await upsert_categories(session)
+    async for places in prepared_chunks(chunks, stats):
+        write_started = time.perf_counter()
+        await upsert_places(session, places, stats, batch_size)
+        stats.add_timing("запись", time.perf_counter() - write_started)
+        if progress is not None:
+            progress(stats)
+    await session.commit()
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+async def fetch_stored_places(session: AsyncSession) -> pd.DataFrame:
+    """id, хэш и активность всех мест в БД одним запросом"""
+    result = await session.execute(select(Place.id, Place.source_hash, Place.is_active))
+    return pd.DataFrame(result.all(), columns=["id", "stored_hash", "is_active"])
+
+
+def diff_places(places: pd.DataFrame, stored: pd.DataFrame) -> Tuple[pd.DataFrame, CatalogChangeSet]:
+    """
+    Сравнить кусок датасета с БД
+
+    Returns:
+        Tuple[pd.DataFrame, CatalogChangeSet]: новые и изменённые строки для записи и их id
+    """
+    merged = places[["id", "source_hash"]].merge(stored, on="id", how="left", indicator=True)
+    new = (merged["_merge"] == "left_only").to_numpy()
+    # Неактивное место, снова появившееся в датасете, тоже считается изменённым
+    changed = ~new & ((merged["source_hash"] != merged["stored_hash"]) | merged["is_active"].ne(True)).to_numpy()
+    changes = CatalogChangeSet(
+        inserted=merged.loc[new, "id"].astype(int).tolist(),
+        updated=merged.loc[changed, "id"].astype(int).tolist(),
+    )
+    return places[new | changed], changes
+
+
+def missing_places(stored: pd.DataFrame, seen_ids: Set[int]) -> List[int]:
+    """Активные места БД, которых не было в датасете"""
+    active = stored[stored["is_active"].eq(True)]
+    return [place_id for place_id in active["id"].astype(int).tolist() if place_id not in seen_ids]
+
+
+async def deactivate_places(session: AsyncSession, place_ids: List[int], batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    """Пометить места неактивными (мягкое удаление)"""
+    batch_size = min(batch_size, MAX_BIND_PARAMETERS - 2)
+    table = Place.__table__
+    for start in range(0, len(place_ids), batch_size):
+        await session.execute(
+            update(table)
+            .where(table.c.id.in_(place_ids[start:start + batch_size]))
+            .values(is_active=False, updated_at=func.now())
+        )
+
+
+async def sync_catalog(
+    session: AsyncSession,
+    chunks: Iterable[pd.DataFrame],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    delete_missing: bool = True,
+    max_delete_ratio: float = MAX_DELETE_RATIO,
+    progress: Optional[Callable[[LoadStats], None]] = None,
+) -> Tuple[LoadStats, CatalogChangeSet]:
+    """
+    Инкрементальная синхронизация каталога с датасетом
+
+    Хэши мест из БД и id прочитанных строк держатся в памяти целиком:
+    их размер зависит от размера каталога, а не файла.
+
+    Args:
+        session: Сессия БД
+        chunks: Куски датасета (DataFrame)
+        batch_size: Строк в одном INSERT
+        delete_missing: Помечать неактивными места, которых нет в датасете
+        max_delete_ratio: Предельная доля активных мест, которую можно пометить неактивными
+        progress: Вызывается после записи каждого куска
+
+    Returns:
+        Tuple[LoadStats, CatalogChangeSet]: итоги и набор изменений
+
+    Raises:
+        ValueError: из каталога пропало бы больше max_delete_ratio активных мест
+            (транзакция не фиксируется)
+    """
+    stats = LoadStats()
+    changes = CatalogChangeSet()
+    started = time.perf_counter()
+
+    stored = await fetch_stored_places(session)
+    seen_ids: Set[int] = set()
+    await upsert_categories(session)
+    async for places in prepared_chunks(chunks, stats, seen_ids):
+        write_started = time.perf_counter()
+        to_write, chunk_changes = diff_places(places, stored)
+        changes.inserted += chunk_changes.inserted
+        changes.updated += chunk_changes.updated
+        await upsert_places(session, to_write, stats, batch_size)
+        stats.unchanged += len(places) - len(to_write)
+        stats.add_timing("запись", time.perf_counter() - write_started)
+        if progress is not None:
+            progress(stats)
+
+    if delete_missing:
+        changes.deleted = missing_places(stored, seen_ids)
+    active_count = int(stored["is_active"].eq(True).sum())
+    if active_count and len(changes.deleted) > max_delete_ratio * active_count:
+        raise ValueError(
+            f"Синхронизация пометила бы неактивными {len(changes.deleted)} из {active_count} мест; "
+            "проверьте файл или разрешите массовое удаление"
+        )
+    await deactivate_places(session, changes.deleted, batch_size)
+    await session.commit()
+
+    stats.deleted = len(changes.deleted)
+    stats.elapsed = time.perf_counter() - started
+    return stats, changes
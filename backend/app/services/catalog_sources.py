@@ -0,0 +1,153 @@
+"""
+Catalog Sources - Чтение файлов датасета кусками
+
+CSV читается через pandas chunksize, XLSX - openpyxl в режиме
+read_only (строки листа по одной, без загрузки всей книги), GeoJSON
+FeatureCollection - потоковым разбором массива features блоками по
+1 МБ. В памяти держится один кусок строк, независимо от размера файла.
+Доля прочитанного (по байтам или по строкам листа) нужна для
+прогресса и оценки оставшегося времени.
+"""
+import codecs
+import json
+import os
+import re
+from typing import Iterator, List, Optional
+
+import pandas as pd
+from openpyxl import load_workbook
+
+DEFAULT_CHUNK_SIZE = 10000
+GEOJSON_BLOCK_SIZE = 1 << 20
+
+_FEATURES = re.compile(r'"features"\s*:\s*\[')
+
+
+def feature_to_row(feature: dict) -> dict:
+    """Feature GeoJSON в строку датасета: properties и координаты точки как POINT (lon lat)"""
+    row = dict(feature.get("properties") or {})
+    if feature.get("id") is not None:
+        row.setdefault("id", feature["id"])
+    geometry = feature.get("geometry") or {}
+    coordinates = geometry.get("coordinates") or []
+    if geometry.get("type") == "Point" and len(coordinates) >= 2:
+        row["coordinate"] = f"POINT ({coordinates[0]} {coordinates[1]})"
+    return row
+
+
+def iter_geojson_features(stream, block_size: int = GEOJSON_BLOCK_SIZE) -> Iterator[dict]:
+    """
+    Объекты массива features из бинарного потока GeoJSON
+
+    Каждый объект разбирается json.JSONDecoder.raw_decode, как только
+    он целиком оказался в буфере; прочитанная часть буфера отбрасывается.
+
+    Raises:
+        ValueError: нет массива features или файл оборван
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    started = False
+    while True:
+        block = stream.read(block_size)
+        buffer = buffer[position:] + text_decoder.decode(block, final=not block)
+        position = 0
+        if not started:
+            match = _FEATURES.search(buffer)
+            if match is None:
+                if not block:
+                    raise ValueError("В GeoJSON нет массива features")
+                # Хвост оставляется, чтобы не разрезать ключ "features" между блоками
+                buffer = buffer[-32:]
+                continue
+            started = True
+            position = match.end()
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                feature, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not block:
+                    raise ValueError("GeoJSON оборван или повреждён")
+                break  # объект не дочитан
+            yield feature
+
+        if not block:
+            raise ValueError("GeoJSON оборван: массив features не закрыт")
+
+
+class CatalogSource:
+    """Файл датасета (CSV, XLSX или GeoJSON), читаемый кусками DataFrame"""
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.extension = os.path.splitext(path)[1].lower()
+        if self.extension not in (".csv", ".xlsx", ".geojson", ".json"):
+            raise ValueError(f"Неподдерживаемый формат файла: {self.extension or path}")
+        self._progress: Optional[float] = None
+
+    def progress(self) -> Optional[float]:
+        """Доля прочитанного файла от 0 до 1 (None, если размер неизвестен)"""
+        return self._progress
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        if self.extension == ".csv":
+            return self._csv_chunks()
+        if self.extension == ".xlsx":
+            return self._xlsx_chunks()
+        return self._geojson_chunks()
+
+    def _csv_chunks(self) -> Iterator[pd.DataFrame]:
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as stream:
+            for frame in pd.read_csv(stream, chunksize=self.chunk_size, encoding="utf-8-sig"):
+                self._progress = stream.tell() / size if size else None
+                yield frame
+        self._progress = 1.0
+
+    def _xlsx_chunks(self) -> Iterator[pd.DataFrame]:
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+            width = len(header)
+            # max_row берётся из размеров листа, если они записаны в файле
+            total = (sheet.max_row or 0) - 1
+            batch: List[tuple] = []
+            read = 0
+            for row in rows:
+                batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                if len(batch) >= self.chunk_size:
+                    read += len(batch)
+                    self._progress = min(read / total, 1.0) if total > 0 else None
+                    yield pd.DataFrame.from_records(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame.from_records(batch, columns=header)
+            self._progress = 1.0
+        finally:
+            workbook.close()
+
+    def _geojson_chunks(self) -> Iterator[pd.DataFrame]:
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as stream:
+            batch: List[dict] = []
+            for feature in iter_geojson_features(stream):
+                batch.append(feature_to_row(feature))
+                if len(batch) >= self.chunk_size:
+                    self._progress = stream.tell() / size if size else None
+                    yield pd.DataFrame(batch)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch)
+        self._progress = 1.0
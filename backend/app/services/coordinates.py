@@ -0,0 +1,67 @@
+"""
+Coordinates Service - Определение координат мест маршрута
+
+Координаты мест каталога уже лежат в таблице places, поэтому внешний
+геокодер нужен только для мест, которые не удалось сопоставить с
+каталогом ни по id, ни по похожему названию.
+"""
+from typing import Dict, List, Optional
+
+from app.services.catalog import CatalogSnapshot
+from app.services.geocoder import geocoder
+
+
+def match_catalog_place(title: str, address: str, snapshot: CatalogSnapshot) -> Optional[dict]:
+    """Найти активное место каталога с похожим названием (адрес уточняет выбор)"""
+    place_id = snapshot.title_matcher.match_id(title, address)
+    return snapshot.places_by_id.get(place_id)
+
+
+def _apply_catalog_place(place: dict, catalog_place: dict) -> None:
+    place["id"] = catalog_place["id"]
+    place["coordinates"] = {
+        "latitude": catalog_place["latitude"],
+        "longitude": catalog_place["longitude"],
+    }
+    if catalog_place.get("category_id"):
+        place["category"] = {"id": catalog_place["category_id"], "name": catalog_place["category"]}
+
+
+def resolve_from_catalog(place: dict, snapshot: CatalogSnapshot) -> Optional[str]:
+    """
+    Координаты места из каталога: по id, затем по похожему названию
+
+    Returns:
+        Optional[str]: "catalog", "fuzzy" или None, если место не найдено
+    """
+    catalog_place = snapshot.places_by_id.get(place.get("id"))
+    if catalog_place is not None:
+        _apply_catalog_place(place, catalog_place)
+        return "catalog"
+
+    catalog_place = match_catalog_place(place.get("title", ""), place.get("address", ""), snapshot)
+    if catalog_place is not None:
+        _apply_catalog_place(place, catalog_place)
+        return "fuzzy"
+    return None
+
+
+async def geocode_places(places: List[dict]) -> Dict[str, int]:
+    """
+    Координаты мест, не найденных в каталоге, через геокодер
+
+    Returns:
+        Dict[str, int]: Сколько координат дал геокодер и сколько осталось из ответа LLM
+    """
+    sources = {"geocoder": 0, "llm": 0}
+    if not places:
+        return sources
+    queries = [f"{place.get('title', '')}, {place.get('address', '')}" for place in places]
+    for place, result in zip(places, await geocoder.geocode_many(queries)):
+        if result is not None:
+            place["coordinates"] = {"latitude": result["latitude"], "longitude": result["longitude"]}
+            sources["geocoder"] += 1
+        else:
+            sources["llm"] += 1
+    return sources
+
@@ -0,0 +1,118 @@
+"""
+Distance Matrix Service - Векторный расчёт расстояний по каталогу
+
+Координаты каталога хранятся в массивах float32; вектор расстояний от
+пользователя и матрица между местами считаются одним проходом NumPy.
+Координаты каталога статичны, поэтому матрицы между местами кэшируются
+(LRU по набору id).
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.metrics import observe_cache
+from app.utils.geo import haversine_km_array, haversine_km_matrix
+
+
+class DistanceMatrixService:
+    """Расстояния между пользователем и местами каталога"""
+
+    def __init__(self, places: List[dict], cache_size: int = 256):
+        self.ids = np.array([place["id"] for place in places], dtype=np.int64)
+        self.latitudes = np.array([place["latitude"] for place in places], dtype=np.float32)
+        self.longitudes = np.array([place["longitude"] for place in places], dtype=np.float32)
+        self.positions: Dict[int, int] = {place_id: pos for pos, place_id in enumerate(self.ids.tolist())}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[int, ...], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _positions(self, place_ids: Sequence[int]) -> np.ndarray:
+        return np.fromiter((self.positions[place_id] for place_id in place_ids), dtype=np.int64, count=len(place_ids))
+
+    def from_point(self, latitude: float, longitude: float, place_ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Расстояния от точки до мест (всего каталога, если place_ids не указаны)"""
+        if place_ids is None:
+            lats, lons = self.latitudes, self.longitudes
+        else:
+            positions = self._positions(place_ids)
+            lats, lons = self.latitudes[positions], self.longitudes[positions]
+        return haversine_km_array(latitude, longitude, lats.astype(np.float64), lons.astype(np.float64))
+
+    def between(self, place_ids: Sequence[int]) -> np.ndarray:
+        """Матрица расстояний между местами в порядке place_ids (из кэша, если есть)"""
+        key = tuple(sorted(set(place_ids)))
+        matrix = self._cache.get(key)
+        if matrix is None:
+            self.misses += 1
+            observe_cache("distance_matrix", False)
+            positions = self._positions(key)
+            lats = self.latitudes[positions].astype(np.float64)
+            lons = self.longitudes[positions].astype(np.float64)
+            matrix = haversine_km_matrix(lats, lons, lats, lons)
+            self._cache[key] = matrix
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            observe_cache("distance_matrix", True)
+            self._cache.move_to_end(key)
+
+        index = {place_id: pos for pos, place_id in enumerate(key)}
+        order = np.fromiter((index[place_id] for place_id in place_ids), dtype=np.int64, count=len(place_ids))
+        return matrix[np.ix_(order, order)]
+
+    def route_matrix(self, latitude: float, longitude: float, place_ids: Sequence[int]) -> np.ndarray:
+        """
+        Матрица (n+1) x (n+1): узел 0 - пользователь, далее места в порядке place_ids
+        """
+        n = len(place_ids)
+        matrix = np.zeros((n + 1, n + 1), dtype=np.float64)
+        if n == 0:
+            return matrix
+        from_user = self.from_point(latitude, longitude, place_ids)
+        matrix[0, 1:] = from_user
+        matrix[1:, 0] = from_user
+        matrix[1:, 1:] = self.between(place_ids)
+        return matrix
+
+    def stats(self) -> dict:
+        return {
+            "places": len(self.ids),
+            "cached_matrices": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def route_distances(
+    latitude: float,
+    longitude: float,
+    coordinates: List[dict],
+) -> Tuple[List[float], List[Optional[float]]]:
+    """
+    Длины участков маршрута и расстояния от пользователя по координатам
+
+    Точки без координат (0, 0) пропускаются: участок идёт от предыдущей
+    известной точки к следующей, расстояние от пользователя - None.
+
+    Returns:
+        Tuple: (длины участков в км, расстояние от пользователя для каждой точки)
+    """
+    valid = [
+        i for i, point in enumerate(coordinates)
+        if point and (point.get("latitude") or point.get("longitude"))
+    ]
+    from_user: List[Optional[float]] = [None] * len(coordinates)
+    if not valid:
+        return [], from_user
+
+    lats = np.array([latitude] + [coordinates[i]["latitude"] for i in valid], dtype=np.float64)
+    lons = np.array([longitude] + [coordinates[i]["longitude"] for i in valid], dtype=np.float64)
+    legs = haversine_km_array(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    distances = haversine_km_array(latitude, longitude, lats[1:], lons[1:])
+
+    for i, distance in zip(valid, distances.tolist()):
+        from_user[i] = distance
+    return legs.tolist(), from_user
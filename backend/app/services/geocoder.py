@@ -0,0 +1,277 @@
+"""
+Geocoder Service - Геокодирование через Яндекс Geocoder API
+
+Общий пул соединений на процесс, ограниченное число параллельных
+запросов и кэш с TTL по нормализованной строке запроса. Ненайденные
+адреса тоже кэшируются (на меньший срок), чтобы повторно не ходить
+за заведомо пустым ответом. Кэш периодически и при остановке
+сохраняется в JSON файл (вне запросов пользователя) и переживает
+перезапуск; перед записью он сливается с файлом на диске, поэтому
+воркеры не затирают записи друг друга.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import GEOCODER_REQUEST_DURATION, GEOCODER_REQUESTS, observe_cache
+
+logger = logging.getLogger(__name__)
+
+YANDEX_GEOCODER_API_URL = "https://geocode-maps.yandex.ru/1.x/"
+
+_PUNCTUATION_RE = re.compile(r"[«»\"'`“”„]")
+_SPACES_RE = re.compile(r"\s+")
+
+
+class GeocoderError(Exception):
+    """Геокодер недоступен или вернул ошибку"""
+
+    def __init__(self, message: str, status_code: int = 503):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+def normalize_query(text: str) -> str:
+    """Ключ кэша: нижний регистр, без кавычек, схлопнутые пробелы"""
+    text = _PUNCTUATION_RE.sub(" ", text.lower().replace("ё", "е"))
+    return _SPACES_RE.sub(" ", text).strip(" ,")
+
+
+class Geocoder:
+    """Клиент геокодера с кэшем"""
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int,
+        timeout_seconds: float,
+        cache_ttl_seconds: int,
+        negative_ttl_seconds: int,
+        cache_path: Optional[str] = None,
+    ):
+        self.api_key = api_key
+        self.timeout_seconds = timeout_seconds
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.cache_path = cache_path
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        # ключ -> (истекает в unix time, результат или None)
+        self._cache: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._dirty = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds, connect=3.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+            )
+        return self._client
+
+    async def geocode(self, query: str) -> Optional[dict]:
+        """
+        Координаты по строке адреса
+
+        Returns:
+            Optional[dict]: latitude, longitude, formatted_address или None, если адрес не найден
+
+        Raises:
+            GeocoderError: при сетевой ошибке или ошибке API (не кэшируется)
+        """
+        key = normalize_query(query)
+        if not key:
+            return None
+
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            self.hits += 1
+            observe_cache("geocoder", True)
+            return entry[1]
+
+        # Одинаковые одновременные запросы ждут один вызов API
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            observe_cache("geocoder", True)
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        observe_cache("geocoder", False)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._request(query)
+        except GeocoderError as e:
+            self.errors += 1
+            future.set_exception(e)
+            future.exception()  # помечаем как полученное, даже если других ожидающих нет
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            ttl = self.cache_ttl_seconds if result is not None else self.negative_ttl_seconds
+            self._cache[key] = (time.time() + ttl, result)
+            self._dirty += 1
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def geocode_many(self, queries: List[str]) -> List[Optional[dict]]:
+        """Параллельно геокодировать список запросов; ошибки превращаются в None"""
+        results = await asyncio.gather(*(self.geocode(query) for query in queries), return_exceptions=True)
+        return [None if isinstance(result, BaseException) else result for result in results]
+
+    async def _request(self, query: str) -> Optional[dict]:
+        params = {
+            "apikey": self.api_key,
+            "format": "json",
+            "geocode": query,
+            "results": 1
+        }
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self._get_client().get(YANDEX_GEOCODER_API_URL, params=params)
+                response.raise_for_status()
+                data = response.json()
+            except httpx.HTTPStatusError as e:
+                GEOCODER_REQUESTS.labels(outcome="http_error").inc()
+                raise GeocoderError(f"Geocoding API error: {e}", status_code=e.response.status_code) from e
+            except (httpx.RequestError, ValueError) as e:
+                GEOCODER_REQUESTS.labels(outcome="error").inc()
+                raise GeocoderError(f"Connection error: {e}") from e
+            finally:
+                GEOCODER_REQUEST_DURATION.observe(time.perf_counter() - started)
+
+        geo_objects = data.get("response", {}).get("GeoObjectCollection", {}).get("featureMember", [])
+        GEOCODER_REQUESTS.labels(outcome="found" if geo_objects else "not_found").inc()
+        if not geo_objects:
+            return None
+        try:
+            geo_object = geo_objects[0]["GeoObject"]
+            lon, lat = map(float, geo_object["Point"]["pos"].split())
+        except (KeyError, IndexError, ValueError):
+            return None
+        return {
+            "latitude": lat,
+            "longitude": lon,
+            "formatted_address": geo_object.get("metaDataProperty", {}).get("GeocoderMetaData", {}).get("text", "")
+        }
+
+    def load_cache(self) -> None:
+        """Загрузить кэш с диска, отбросив просроченные записи"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось прочитать кэш геокодера: %s", e)
+            return
+        now = time.time()
+        self._cache = {key: (expires, result) for key, (expires, result) in raw.items() if expires > now}
+
+    def _cache_for_disk(self) -> dict:
+        now = time.time()
+        self._dirty = 0
+        return {key: [expires, result] for key, (expires, result) in self._cache.items() if expires > now}
+
+    def _write_cache(self, data: dict) -> dict:
+        """
+        Слить кэш с файлом на диске и атомарно записать (временный файл и os.replace)
+
+        Из двух записей по одному ключу остаётся более свежая, поэтому
+        кэш, сохранённый другим воркером, не теряется.
+
+        Returns:
+            dict: записанный кэш
+        """
+        now = time.time()
+        merged = {}
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                merged = {key: entry for key, entry in json.load(f).items() if entry[0] > now}
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.warning("Кэш геокодера на диске повреждён и будет перезаписан: %s", e)
+        for key, entry in data.items():
+            if key not in merged or entry[0] >= merged[key][0]:
+                merged[key] = entry
+
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        return merged
+
+    def _absorb(self, merged: dict) -> None:
+        """Взять из записанного файла записи других воркеров"""
+        for key, (expires, result) in merged.items():
+            entry = self._cache.get(key)
+            if entry is None or entry[0] < expires:
+                self._cache[key] = (expires, result)
+
+    async def persist(self) -> None:
+        """Сохранить кэш на диск в фоновом потоке"""
+        if not self.cache_path or not self._dirty:
+            return
+        try:
+            merged = await asyncio.to_thread(self._write_cache, self._cache_for_disk())
+        except OSError as e:
+            logger.warning("Не удалось сохранить кэш геокодера: %s", e)
+            return
+        self._absorb(merged)
+
+    async def autosave(self, interval_seconds: float) -> None:
+        """Фоновое периодическое сохранение кэша"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await self.persist()
+
+    def save_cache(self) -> None:
+        """Сохранить кэш на диск (при остановке приложения)"""
+        if not self.cache_path or not self._dirty:
+            return
+        try:
+            self._write_cache(self._cache_for_disk())
+        except OSError as e:
+            logger.warning("Не удалось сохранить кэш геокодера: %s", e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+geocoder = Geocoder(
+    api_key=settings.YANDEX_GEOCODER_API_KEY,
+    max_concurrency=settings.GEOCODER_MAX_CONCURRENCY,
+    timeout_seconds=settings.GEOCODER_TIMEOUT_SECONDS,
+    cache_ttl_seconds=settings.GEOCODER_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=settings.GEOCODER_NEGATIVE_TTL_SECONDS,
+    cache_path=settings.GEOCODER_CACHE_PATH or None,
+)
@@ -0,0 +1,65 @@
+"""
+Heavy Hitters - Скетч Space-Saving для самых частых значений
+
+Хранит не больше capacity счётчиков. Новое значение при заполненном
+скетче вытесняет минимальный счётчик и наследует его значение как
+погрешность. Скетчи сливаются (складываем счётчики, оставляем
+capacity крупнейших), поэтому их можно хранить в часовых/дневных
+корзинах и объединять по произвольному окну.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+
+class SpaceSaving:
+    """Скетч частых значений: значение -> [счётчик, погрешность]"""
+
+    def __init__(self, capacity: int = 50, counters: Dict[str, List[int]] = None):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = {}
+        if counters:
+            for item, (count, error) in counters.items():
+                self.counters[item] = [int(count), int(error)]
+            self._trim()
+
+    def update(self, item: str, count: int = 1) -> None:
+        if item is None:
+            return
+        entry = self.counters.get(item)
+        if entry is not None:
+            entry[0] += count
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+            return
+        victim = min(self.counters, key=lambda key: self.counters[key][0])
+        floor = self.counters.pop(victim)[0]
+        self.counters[item] = [floor + count, floor]
+
+    def update_many(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.update(item)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Слить другой скетч в текущий"""
+        for item, (count, error) in other.counters.items():
+            entry = self.counters.get(item)
+            if entry is None:
+                self.counters[item] = [count, error]
+            else:
+                entry[0] += count
+                entry[1] += error
+        self._trim()
+        return self
+
+    def _trim(self) -> None:
+        if len(self.counters) <= self.capacity:
+            return
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        self.counters = dict(ranked[:self.capacity])
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[1][1], kv[0]))
+        return [(item, count) for item, (count, _) in ranked[:n]]
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        return {item: [count, error] for item, (count, error) in self.counters.items()}
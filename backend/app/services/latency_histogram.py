@@ -0,0 +1,153 @@
+"""
+Latency Histogram - Сливаемые гистограммы задержек
+
+Логарифмические корзины с фиксированной относительной точностью
+(как в DDSketch): значение v попадает в корзину ceil(log_gamma(v)),
+а оценка любого перцентиля отличается от точного значения не больше
+чем на RELATIVE_ACCURACY. Гистограммы разных воркеров и разных
+часовых/дневных корзин складываются почленно, поэтому перцентили
+считаются по произвольному окну без хранения сырых значений.
+"""
+import math
+from typing import Dict, Iterable, Optional
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+# Значения меньше порога (мс) считаются равными ему
+MIN_VALUE_MS = 0.01
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def bin_index(value: float) -> int:
+    """Номер корзины для значения в миллисекундах"""
+    return math.ceil(math.log(max(value, MIN_VALUE_MS)) / _LOG_GAMMA)
+
+
+def bin_value(index: int) -> float:
+    """Представитель корзины: середина (gamma^(i-1), gamma^i] по относительной ошибке"""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек одной стадии"""
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value_ms: float) -> None:
+        if value_ms is None:
+            return
+        index = bin_index(value_ms)
+        self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.sum += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля q из [0, 1]"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(bin_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self, percentiles: Iterable[int] = PERCENTILES) -> dict:
+        result = {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count, 1) if self.count else None,
+            "min_ms": round(self.min, 1) if self.min is not None else None,
+            "max_ms": round(self.max, 1) if self.max is not None else None,
+        }
+        for p in percentiles:
+            value = self.quantile(p / 100)
+            result[f"p{p}_ms"] = round(value, 1) if value is not None else None
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "bins": {str(index): count for index, count in self.bins.items()},
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "LatencyHistogram":
+        histogram = cls()
+        if not data:
+            return histogram
+        histogram.bins = {int(index): int(count) for index, count in (data.get("bins") or {}).items()}
+        histogram.count = int(data.get("count") or sum(histogram.bins.values()))
+        histogram.sum = float(data.get("sum") or 0.0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        return histogram
+
+
+def merge_stage_histograms(
+    target: Dict[str, LatencyHistogram],
+    other: Dict[str, LatencyHistogram],
+) -> Dict[str, LatencyHistogram]:
+    """Слить словари "стадия -> гистограмма" """
+    for stage, histogram in other.items():
+        target.setdefault(stage, LatencyHistogram()).merge(histogram)
+    return target
+
+
+def record_latencies(target: Dict[str, LatencyHistogram], record: dict) -> None:
+    """
+    Добавить задержки записи user_requests
+
+    Общее время запроса идёт в стадию "total", время отдельных стадий
+    пайплайна (если записаны) - под своими именами.
+    """
+    total = record.get("execution_time_ms")
+    if total is not None:
+        target.setdefault("total", LatencyHistogram()).record(total)
+    for stage, value in (record.get("stage_timings") or {}).items():
+        if value is not None:
+            target.setdefault(stage, LatencyHistogram()).record(value)
+
+
+class LatencyRecorder:
+    """Гистограммы задержек текущего воркера с момента старта"""
+
+    def __init__(self):
+        self.stages: Dict[str, LatencyHistogram] = {}
+
+    def record(self, record: dict) -> None:
+        record_latencies(self.stages, record)
+
+    def summary(self, stage: Optional[str] = None) -> Dict[str, dict]:
+        return {
+            name: histogram.summary()
+            for name, histogram in sorted(self.stages.items())
+            if stage is None or name == stage
+        }
+
+
+latency_recorder = LatencyRecorder()
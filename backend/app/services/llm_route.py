@@ -0,0 +1,199 @@
+"""
+LLM Route Service - Prompt маршрута и разбор ответа LLM
+
+Два формата prompt: verbose (кандидаты фразами, LLM возвращает
+объекты мест с названиями и адресами) и compact (кандидаты строками
+"id|название|категория|мин|км" в пределах бюджета токенов, LLM
+возвращает только id). Ответ в любом формате собирает RouteCollector -
+целиком или по кускам потока - и сразу проставляет координаты из
+каталога; геокодер нужен только для мест verbose-ответа, не найденных
+в каталоге. Ответ целиком проверяется схемой из app.ai.structured.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from app.config import settings
+from app.ai.json_stream import JSONArrayStreamParser
+from app.ai.parsers import assemble_parsed_route, parse_route_place
+from app.ai.prompt_budget import estimate_tokens, fit_rows
+from app.ai.prompts import (
+    build_compact_route_prompt,
+    build_route_prompt,
+    build_single_shot_prompt,
+    format_candidate_row,
+    format_category_row,
+)
+from app.ai.structured import ROUTE_IDS_ANSWER, ROUTE_PLACES_ANSWER, AnswerSchema
+from app.schemas.route import LLMRoutePlace
+from app.services.catalog import CatalogSnapshot
+from app.services.coordinates import geocode_places, resolve_from_catalog
+from app.services.route_planner import route_place_from_catalog
+
+# Столько кандидатов остаётся в prompt, даже если бюджет превышен
+MIN_PROMPT_CANDIDATES = 3
+
+
+@dataclass
+class RoutePrompt:
+    """Prompt маршрута и кандидаты, которые в него попали"""
+    text: str
+    places: List[dict]
+    pipeline: str
+    prompt_format: str
+    estimated_tokens: int
+
+    @property
+    def answer_schema(self) -> AnswerSchema:
+        return ROUTE_IDS_ANSWER if self.prompt_format == "compact" else ROUTE_PLACES_ANSWER
+
+
+def build_route_llm_prompt(
+    snapshot: CatalogSnapshot,
+    places: List[dict],
+    user_interests: str,
+    available_time_hours: int,
+    latitude: float,
+    longitude: float,
+    pipeline: str = "two_step",
+    prompt_format: Optional[str] = None,
+    token_budget: Optional[int] = None,
+) -> RoutePrompt:
+    """
+    Построить prompt маршрута
+
+    В формате compact кандидаты (уже ранжированные) обрезаются с конца,
+    пока оценка prompt не уложится в token_budget.
+    """
+    prompt_format = prompt_format or settings.ROUTE_PROMPT_FORMAT
+    token_budget = settings.PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    user_location = {"latitude": latitude, "longitude": longitude}
+
+    if prompt_format == "compact":
+        category_rows = None
+        if pipeline == "single_shot":
+            category_rows = [
+                format_category_row(cat_id, cat_name, snapshot.category_times.get(cat_id, 30))
+                for cat_id, cat_name in snapshot.category_names.items()
+            ]
+        rows = [format_candidate_row(place) for place in places]
+        fixed = build_compact_route_prompt([], available_time_hours, user_location, user_interests, category_rows)
+        kept = fit_rows(fixed, rows, token_budget, MIN_PROMPT_CANDIDATES)
+        places = places[:kept]
+        text = build_compact_route_prompt(rows[:kept], available_time_hours, user_location, user_interests, category_rows)
+    elif pipeline == "single_shot":
+        text = build_single_shot_prompt(
+            user_interests, snapshot.category_names, snapshot.category_times, places, available_time_hours, user_location
+        )
+    else:
+        text = build_route_prompt(places, available_time_hours, user_location)
+
+    return RoutePrompt(
+        text=text,
+        places=places,
+        pipeline=pipeline,
+        prompt_format=prompt_format,
+        estimated_tokens=estimate_tokens(text),
+    )
+
+
+class RouteCollector:
+    """Места маршрута из ответа LLM на RoutePrompt"""
+
+    def __init__(self, prompt: RoutePrompt, snapshot: CatalogSnapshot):
+        self.prompt = prompt
+        self.snapshot = snapshot
+        self.candidates: Dict[int, dict] = {place["id"]: place for place in prompt.places}
+        self.places: List[dict] = []
+        self.unresolved: List[dict] = []
+        self.sources = {"catalog": 0, "fuzzy": 0, "geocoder": 0, "llm": 0}
+        self.category_ids: List[int] = []
+        self.repaired = False
+        self._parser = JSONArrayStreamParser(prompt.answer_schema.list_key)
+        self._chunks: List[str] = []
+        self._seen_ids = set()
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Кусок ответа; возвращает места, завершённые в нём"""
+        self._chunks.append(chunk)
+        return self._accept_all(self._parser.feed(chunk))
+
+    def finish(self) -> List[dict]:
+        """
+        Конец ответа: проверка по схеме, категории single_shot и места,
+        если поток не удалось разобрать по частям
+
+        Raises:
+            ValueError: ответ не соответствует схеме и мест из него не получено,
+                или в нём нет ни одного подходящего места
+        """
+        text = "".join(self._chunks)
+        try:
+            answer, self.repaired = self.prompt.answer_schema.parse(text)
+        except ValueError:
+            if not self.places:
+                raise
+            # Места из потока уже проверены по одному, испорчен только хвост ответа
+            self.repaired = True
+            return []
+        if self.prompt.pipeline == "single_shot":
+            self.category_ids = answer.category_ids or []
+        if self.places:
+            return []
+        accepted = self._accept_all([
+            item.model_dump(exclude_none=True) if isinstance(item, BaseModel) else item
+            for item in answer.route
+        ])
+        if not accepted:
+            raise ValueError("в ответе нет подходящих мест из списка кандидатов")
+        return accepted
+
+    def restart(self) -> None:
+        """Забыть текст ответа перед повторным запросом"""
+        self._parser = JSONArrayStreamParser(self.prompt.answer_schema.list_key)
+        self._chunks = []
+
+    async def resolve_remaining(self) -> Dict[str, int]:
+        """Геокодировать места, не найденные в каталоге; источники координат"""
+        self.sources.update(await geocode_places(self.unresolved))
+        self.unresolved = []
+        return self.sources
+
+    def parsed_response(self) -> dict:
+        return assemble_parsed_route(self.places)
+
+    def _accept_all(self, items: list) -> List[dict]:
+        accepted = []
+        for item in items:
+            place = self._accept(item)
+            if place is not None:
+                self.places.append(place)
+                accepted.append(place)
+        return accepted
+
+    def _accept(self, item) -> Optional[dict]:
+        if self.prompt.prompt_format == "compact":
+            place_id = item.get("id") if isinstance(item, dict) else item
+            # Только кандидаты из prompt и без повторов
+            if isinstance(place_id, bool) or place_id not in self.candidates or place_id in self._seen_ids:
+                return None
+            self._seen_ids.add(place_id)
+            candidate = self.candidates[place_id]
+            self.sources["catalog"] += 1
+            return route_place_from_catalog(candidate, candidate.get("distance_km", 0.0))
+
+        try:
+            item = LLMRoutePlace.model_validate(item).model_dump(exclude_none=True)
+        except ValidationError:
+            return None
+        place = parse_route_place(item, self.snapshot.category_map, self.snapshot.title_index)
+        if self.prompt.pipeline == "single_shot" and item.get("id") in self.candidates:
+            place["id"] = item["id"]
+        # Координаты из каталога проставляются сразу; геокодер - после ответа
+        source = resolve_from_catalog(place, self.snapshot)
+        if source is not None:
+            self.sources[source] += 1
+        else:
+            self.unresolved.append(place)
+        return place
@@ -1,54 +1,78 @@
 """
 Logging Service - Сервис для логирования запросов
 """
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.user_request import UserRequest
+import time
+from datetime import datetime, timezone
 from app.schemas.route import RouteRequest, RouteResponse
-from typing import Optional
+from app.services.analytics_sink import analytics_sink
+from app.services.latency_histogram import latency_recorder
+from app.services.metrics import observe_stage_timings
+from typing import Dict, Optional
 
 
-async def log_route_request(
-    db: AsyncSession,
+def build_request_record(
     request_data: RouteRequest,
-    response_data: dict,
+    response_data: RouteResponse,
     request_id: str,
     execution_time_ms: int,
     ip_address: Optional[str] = None,
-    user_agent: Optional[str] = None
-) -> UserRequest:
+    user_agent: Optional[str] = None,
+    stage_timings: Optional[Dict[str, float]] = None
+) -> dict:
+    """Компактная запись для таблицы user_requests"""
+    return {
+        "user_interests": request_data.user_interests,
+        "available_time_hours": request_data.available_time_hours,
+        "user_address": request_data.user_location.address,
+        "user_latitude": request_data.user_location.latitude,
+        "user_longitude": request_data.user_location.longitude,
+        "total_places": response_data.route.total_places if response_data.route else 0,
+        "total_distance_km": response_data.route.total_distance_km if response_data.route else 0.0,
+        "total_time_minutes": response_data.route.total_time_minutes if response_data.route else 0,
+        "selected_categories": response_data.metadata.selected_categories if response_data.metadata else [],
+        "request_id": request_id,
+        "execution_time_ms": execution_time_ms,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "stage_timings": stage_timings,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def log_route_request(
+    request_data: RouteRequest,
+    response_data: RouteResponse,
+    request_id: str,
+    execution_time_ms: int,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    stage_timings: Optional[Dict[str, float]] = None
+) -> bool:
     """
-    Сохранить запрос пользователя в БД
+    Поставить запрос пользователя в очередь на запись в БД
+    
+    Запись выполняется фоновым писателем пачками, ответ пользователю
+    не ждёт транзакции. Задержка сразу учитывается в гистограммах воркера.
     
     Args:
-        db: Сессия базы данных
         request_data: Данные запроса
         response_data: Данные ответа
         request_id: Уникальный ID запроса
         execution_time_ms: Время выполнения в миллисекундах
         ip_address: IP адрес пользователя
         user_agent: User Agent браузера
+        stage_timings: Время стадий обработки в миллисекундах; дополняется стадией logging
         
     Returns:
-        UserRequest: Сохраненный объект запроса
+        bool: False, если очередь переполнена и запись отброшена
     """
-    user_request = UserRequest(
-        user_interests=request_data.user_interests,
-        available_time_hours=request_data.available_time_hours,
-        user_address=request_data.user_location.address,
-        user_latitude=request_data.user_location.latitude,
-        user_longitude=request_data.user_location.longitude,
-        total_places = response_data.route.total_places if response_data.route else 0,
-        total_distance_km = response_data.route.total_distance_km if response_data.route else 0.0,
-        total_time_minutes = response_data.route.total_time_minutes if response_data.route else 0,
-        selected_categories = response_data.metadata.selected_categories if response_data.metadata else [],
-        request_id=request_id,
-        execution_time_ms=execution_time_ms,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
-    
-    db.add(user_request)
-    await db.commit()
-    await db.refresh(user_request)
-    
-    return user_request
+    started = time.perf_counter()
+    record = build_request_record(request_data, response_data, request_id, execution_time_ms, ip_address, user_agent, stage_timings)
+    accepted = analytics_sink.enqueue(record)
+    if stage_timings is not None:
+        # Запись в очереди ссылается на тот же словарь, поэтому стадия logging попадёт и в БД
+        stage_timings["logging"] = round((time.perf_counter() - started) * 1000, 1)
+    latency_recorder.record(record)
+    if stage_timings:
+        observe_stage_timings(stage_timings)
+    return accepted
@@ -0,0 +1,151 @@
+"""
+Metrics Service - Метрики приложения в формате Prometheus
+
+Счётчики, гистограммы и gauge регистрируются один раз при импорте и
+обновляются из сервисов. При нескольких воркерах uvicorn нужно задать
+переменную окружения PROMETHEUS_MULTIPROC_DIR (пустой каталог) до
+запуска: каждый воркер пишет значения в свои mmap-файлы, а /metrics
+собирает их в один ответ через MultiProcessCollector.
+"""
+import os
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Границы гистограмм в секундах
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60)
+GEOCODER_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP запросы", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP запроса", ["method", "route"], buckets=HTTP_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP запросы в обработке", multiprocess_mode="livesum"
+)
+
+ROUTE_STAGE_DURATION = Histogram(
+    "route_stage_duration_seconds", "Время стадий генерации маршрута", ["stage"], buckets=HTTP_BUCKETS
+)
+
+ROUTE_TIME_TO_FIRST_PLACE = Histogram(
+    "route_time_to_first_place_seconds", "Время до первого места в потоковой генерации маршрута", ["planner"],
+    buckets=HTTP_BUCKETS
+)
+
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "Вызовы LLM API", ["outcome"]
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Время вызова LLM API", buckets=LLM_BUCKETS
+)
+LLM_PROMPT_TOKENS_ESTIMATED = Histogram(
+    "llm_prompt_tokens_estimated", "Оценка размера prompt маршрута в токенах", ["prompt_format", "pipeline"],
+    buckets=(250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000)
+)
+LLM_STRUCTURED_OUTPUT = Counter(
+    "llm_structured_output_total", "Разбор JSON ответов LLM: valid, repaired (починен локально), retried, failed",
+    ["prompt", "result"]
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Токены LLM по данным API", ["kind"]
+)
+
+GEOCODER_REQUESTS = Counter(
+    "geocoder_requests_total", "Обращения к API геокодера", ["outcome"]
+)
+GEOCODER_REQUEST_DURATION = Histogram(
+    "geocoder_request_duration_seconds", "Время обращения к API геокодера", buckets=GEOCODER_BUCKETS
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Обращения к кэшам", ["cache", "result"]
+)
+
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Размер пула соединений с БД", multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Соединения с БД, выданные из пула", multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Выдачи соединений из пула"
+)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Сессии только для чтения по базе: replica или primary", ["target"]
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Отставание реплики для чтения при последней проверке", multiprocess_mode="max"
+)
+
+ANALYTICS_DROPPED = Counter(
+    "analytics_records_dropped_total", "Записи user_requests, отброшенные при переполнении очереди"
+)
+
+
+def observe_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def observe_stage_timings(stage_timings: Dict[str, float]) -> None:
+    """Время стадий запроса (мс) из таймера app.utils.timing"""
+    for stage, value_ms in stage_timings.items():
+        ROUTE_STAGE_DURATION.labels(stage=stage).observe(value_ms / 1000)
+
+
+def observe_llm_usage(usage: Optional[dict]) -> None:
+    """Токены из поля usage ответа OpenRouter"""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind)
+        if isinstance(value, int) and value > 0:
+            LLM_TOKENS.labels(kind=kind.replace("_tokens", "")).inc(value)
+
+
+def instrument_pool(engine) -> None:
+    """Подписаться на события пула соединений SQLAlchemy"""
+    from sqlalchemy import event
+
+    pool = engine.sync_engine.pool
+    size = getattr(pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.set(size())
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+        DB_POOL_CHECKOUTS.inc()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Текст метрик для ответа /metrics и его Content-Type"""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Убрать live-gauge остановленного воркера из общей картины"""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(os.getpid())
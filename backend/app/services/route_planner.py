@@ -0,0 +1,231 @@
+"""
+Route Planner - Локальное построение маршрута без LLM
+
+Задача ориентирования с бюджетом времени: из кандидатов выбрать и
+упорядочить места так, чтобы дорога пешком от пользователя через все
+точки плюс время посещения уложились в доступное время, а маршрут
+включал как можно больше мест разных категорий. Эвристика: жадная
+вставка по отношению "ценность / добавленное время", затем 2-opt и
+or-opt для сокращения пути и повторная попытка вставки в
+освободившееся время.
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.distance_matrix import DistanceMatrixService
+from app.utils.geo import haversine_km_matrix
+
+# Бонус за категорию, которой ещё нет в маршруте
+NEW_CATEGORY_BONUS = 0.5
+MAX_IMPROVEMENT_ROUNDS = 10
+
+
+@dataclass
+class RoutePlan:
+    """Результат планирования"""
+    places: List[dict]
+    legs_km: List[float] = field(default_factory=list)
+    distances_from_user_km: List[float] = field(default_factory=list)
+    total_distance_km: float = 0.0
+    walking_time_minutes: int = 0
+    visit_time_minutes: int = 0
+
+    @property
+    def total_time_minutes(self) -> int:
+        return self.walking_time_minutes + self.visit_time_minutes
+
+
+class _Planner:
+    """Состояние одной задачи; узел 0 - пользователь, 1..n - кандидаты"""
+
+    def __init__(self, candidates, matrix, budget_minutes, speed_kmh, max_places):
+        self.candidates = candidates
+        self.minutes = matrix / speed_kmh * 60
+        self.visit = [0] + [c["avg_visit_duration"] for c in candidates]
+        self.category = [None] + [c.get("category_id") for c in candidates]
+        self.budget = budget_minutes
+        self.max_places = max_places
+
+    def walk_minutes(self, path: List[int]) -> float:
+        prev = 0
+        walk = 0.0
+        for node in path:
+            walk += self.minutes[prev, node]
+            prev = node
+        return walk
+
+    def path_minutes(self, path: List[int]) -> float:
+        return self.walk_minutes(path) + sum(self.visit[node] for node in path)
+
+    def best_insertion(self, path: List[int], node: int):
+        """Минимальное добавленное время при вставке узла и позиция"""
+        best_delta, best_pos = None, None
+        for pos in range(len(path) + 1):
+            prev = path[pos - 1] if pos > 0 else 0
+            if pos < len(path):
+                nxt = path[pos]
+                delta = self.minutes[prev, node] + self.minutes[node, nxt] - self.minutes[prev, nxt]
+            else:
+                delta = self.minutes[prev, node]
+            if best_delta is None or delta < best_delta:
+                best_delta, best_pos = delta, pos
+        return best_delta + self.visit[node], best_pos
+
+    def insert_greedy(self, path: List[int]) -> List[int]:
+        used = self.path_minutes(path)
+        while len(path) < self.max_places:
+            categories = {self.category[node] for node in path}
+            best = None
+            for node in range(1, len(self.visit)):
+                if node in path:
+                    continue
+                added, pos = self.best_insertion(path, node)
+                if used + added > self.budget:
+                    continue
+                prize = 1.0 + (NEW_CATEGORY_BONUS if self.category[node] not in categories else 0.0)
+                ratio = prize / max(added, 1e-6)
+                if best is None or ratio > best[0]:
+                    best = (ratio, node, pos, added)
+            if best is None:
+                break
+            _, node, pos, added = best
+            path.insert(pos, node)
+            used += added
+        return path
+
+    def two_opt(self, path: List[int]) -> bool:
+        """Разворот отрезков пути (стартовая точка фиксирована, конец открыт)"""
+        improved = False
+        best_walk = self.walk_minutes(path)
+        for i in range(len(path) - 1):
+            for j in range(i + 1, len(path)):
+                candidate = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+                walk = self.walk_minutes(candidate)
+                if walk + 1e-9 < best_walk:
+                    path[:] = candidate
+                    best_walk = walk
+                    improved = True
+        return improved
+
+    def or_opt(self, path: List[int]) -> bool:
+        """Перенос одного места на другую позицию"""
+        improved = False
+        best_walk = self.walk_minutes(path)
+        for i in range(len(path)):
+            node = path[i]
+            rest = path[:i] + path[i + 1:]
+            for pos in range(len(rest) + 1):
+                if pos == i:
+                    continue
+                candidate = rest[:pos] + [node] + rest[pos:]
+                walk = self.walk_minutes(candidate)
+                if walk + 1e-9 < best_walk:
+                    path[:] = candidate
+                    best_walk = walk
+                    improved = True
+                    break
+        return improved
+
+    def solve(self) -> List[int]:
+        path = self.insert_greedy([])
+        for _ in range(MAX_IMPROVEMENT_ROUNDS):
+            improved = self.two_opt(path)
+            improved = self.or_opt(path) or improved
+            size = len(path)
+            path = self.insert_greedy(path)
+            if not improved and len(path) == size:
+                break
+        return path
+
+
+def plan_route(
+    candidates: List[dict],
+    latitude: float,
+    longitude: float,
+    available_time_hours: int,
+    max_places: Optional[int] = None,
+    speed_kmh: Optional[float] = None,
+    distances: Optional[DistanceMatrixService] = None,
+) -> RoutePlan:
+    """
+    Построить маршрут из кандидатов
+
+    Args:
+        candidates: Места с latitude, longitude, avg_visit_duration, category_id
+        latitude, longitude: Точка старта (пользователь)
+        available_time_hours: Бюджет времени
+        max_places: Максимум мест в маршруте (по умолчанию MAX_PLACES_IN_ROUTE)
+        speed_kmh: Скорость пешехода (по умолчанию WALKING_SPEED_KMH)
+        distances: Сервис расстояний каталога; без него матрица считается заново
+
+    Returns:
+        RoutePlan: Упорядоченные места и итоги маршрута
+    """
+    max_places = settings.MAX_PLACES_IN_ROUTE if max_places is None else max_places
+    speed_kmh = settings.WALKING_SPEED_KMH if speed_kmh is None else speed_kmh
+    if not candidates:
+        return RoutePlan(places=[])
+
+    if distances is not None:
+        matrix = distances.route_matrix(latitude, longitude, [c["id"] for c in candidates])
+    else:
+        latitudes = np.array([latitude] + [c["latitude"] for c in candidates], dtype=np.float64)
+        longitudes = np.array([longitude] + [c["longitude"] for c in candidates], dtype=np.float64)
+        matrix = haversine_km_matrix(latitudes, longitudes, latitudes, longitudes)
+
+    planner = _Planner(candidates, matrix, available_time_hours * 60, speed_kmh, max_places)
+    path = planner.solve()
+
+    legs = []
+    prev = 0
+    for node in path:
+        legs.append(float(matrix[prev, node]))
+        prev = node
+    total_distance = sum(legs)
+
+    return RoutePlan(
+        places=[candidates[node - 1] for node in path],
+        legs_km=legs,
+        distances_from_user_km=[float(matrix[0, node]) for node in path],
+        total_distance_km=total_distance,
+        walking_time_minutes=int(round(planner.walk_minutes(path))),
+        visit_time_minutes=sum(planner.visit[node] for node in path),
+    )
+
+
+def route_place_from_catalog(place: dict, distance_km: float) -> dict:
+    """Место каталога в структуре места маршрута"""
+    return {
+        "id": place["id"],
+        "title": place["title"],
+        "address": place["address"],
+        "coordinates": {"latitude": place["latitude"], "longitude": place["longitude"]},
+        "category": {"id": place.get("category_id") or 0, "name": place.get("category") or "Другое"},
+        "description": place.get("description_clean") or "",
+        "visit_duration": place["avg_visit_duration"],
+        "distance_from_user": round(distance_km, 2),
+        "reasoning": None
+    }
+
+
+def plan_to_parsed_response(plan: RoutePlan) -> dict:
+    """Привести план к структуре разобранного ответа LLM (как assemble_parsed_route)"""
+    places = [
+        route_place_from_catalog(place, distance)
+        for place, distance in zip(plan.places, plan.distances_from_user_km)
+    ]
+
+    return {
+        "route": {
+            "places": places,
+            "route_order": [p["id"] for p in places],
+            "total_places": len(places),
+            "total_time_minutes": plan.total_time_minutes,
+            "total_distance_km": round(plan.total_distance_km, 2),
+            "walking_time_minutes": plan.walking_time_minutes,
+            "visit_time_minutes": plan.visit_time_minutes,
+        }
+    }
@@ -0,0 +1,178 @@
+"""
+Spatial Index - Пространственный индекс мест в памяти
+
+Точки раскладываются по сетке ячеек фиксированного размера (в км).
+Ключ ячейки - row * ROW_STRIDE + col, точки отсортированы по ключу,
+поэтому ячейки одной строки сетки образуют непрерывный отрезок массива
+и запрос по прямоугольнику ячеек сводится к одному searchsorted на
+строку. Точные расстояния считаются векторно только для точек из
+попавших ячеек.
+"""
+from math import cos, radians
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.geo import haversine_km_array
+
+KM_PER_DEGREE_LAT = 111.32
+ROW_STRIDE = 1 << 32
+
+
+class SpatialIndex:
+    """Сеточный индекс по координатам с фильтром по категориям"""
+
+    def __init__(
+        self,
+        ids: Iterable[int],
+        latitudes: Iterable[float],
+        longitudes: Iterable[float],
+        category_ids: Iterable[Optional[int]],
+        cell_size_km: float = 1.0,
+    ):
+        ids = np.asarray(list(ids), dtype=np.int64)
+        lats = np.asarray(list(latitudes), dtype=np.float64)
+        lons = np.asarray(list(longitudes), dtype=np.float64)
+        cats = np.asarray([-1 if c is None else c for c in category_ids], dtype=np.int32)
+
+        self.cell_size_km = cell_size_km
+        self.cell_lat = cell_size_km / KM_PER_DEGREE_LAT
+        # Долготный шаг считается по максимальной широте, чтобы ячейка
+        # нигде не была уже cell_size_km
+        max_abs_lat = float(np.abs(lats).max()) if len(lats) else 0.0
+        self.cell_lon = cell_size_km / (KM_PER_DEGREE_LAT * max(cos(radians(min(max_abs_lat, 89.0))), 0.01))
+
+        rows = np.floor(lats / self.cell_lat).astype(np.int64)
+        cols = np.floor(lons / self.cell_lon).astype(np.int64)
+        keys = rows * ROW_STRIDE + cols
+        order = np.argsort(keys, kind="stable")
+
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.latitudes = lats[order]
+        self.longitudes = lons[order]
+        self.category_ids = cats[order]
+
+        if len(self.ids):
+            self._extent_km = float(haversine_km_array(
+                lats.min(), lons.min(), np.array([lats.max()]), np.array([lons.max()])
+            )[0]) + cell_size_km
+        else:
+            self._extent_km = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions_in_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """Позиции точек из ячеек, пересекающих прямоугольник"""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64)
+        row_lo = int(np.floor(min_lat / self.cell_lat))
+        row_hi = int(np.floor(max_lat / self.cell_lat))
+        col_lo = int(np.floor(min_lon / self.cell_lon))
+        col_hi = int(np.floor(max_lon / self.cell_lon))
+
+        rows = np.arange(row_lo, row_hi + 1, dtype=np.int64) * ROW_STRIDE
+        starts = np.searchsorted(self.keys, rows + col_lo, side="left")
+        ends = np.searchsorted(self.keys, rows + col_hi, side="right")
+        spans = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(spans)
+
+    def _filter_categories(self, positions: np.ndarray, category_ids: Optional[Iterable[int]]) -> np.ndarray:
+        if category_ids is None:
+            return positions
+        wanted = np.fromiter(category_ids, dtype=np.int32)
+        return positions[np.isin(self.category_ids[positions], wanted)]
+
+    def radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        category_ids: Optional[Iterable[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Все места в радиусе от точки
+
+        Returns:
+            List[Tuple[int, float]]: (id места, расстояние в км), по возрастанию расстояния
+        """
+        positions, distances = self._radius(latitude, longitude, radius_km, category_ids)
+        order = np.argsort(distances, kind="stable")
+        return list(zip(self.ids[positions[order]].tolist(), distances[order].tolist()))
+
+    def _radius(self, latitude, longitude, radius_km, category_ids):
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlon = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(min(abs(latitude) + dlat, 89.0))), 0.01))
+        positions = self._positions_in_box(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+        positions = self._filter_categories(positions, category_ids)
+        distances = haversine_km_array(latitude, longitude, self.latitudes[positions], self.longitudes[positions])
+        mask = distances <= radius_km
+        return positions[mask], distances[mask]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        category_ids: Optional[Iterable[int]] = None,
+        max_radius_km: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        k ближайших мест
+
+        Радиус поиска удваивается, пока в круг не попадёт k точек:
+        точный ответ по радиусу гарантирует, что k ближайших среди них.
+        """
+        if k <= 0 or not len(self.ids):
+            return []
+        category_ids = None if category_ids is None else list(category_ids)
+        limit = max_radius_km if max_radius_km is not None else None
+        radius_km = self.cell_size_km
+        while True:
+            if limit is not None:
+                radius_km = min(radius_km, limit)
+            positions, distances = self._radius(latitude, longitude, radius_km, category_ids)
+            exhausted = (limit is not None and radius_km >= limit) or radius_km >= self._max_distance_from(latitude, longitude)
+            if len(positions) >= k or exhausted:
+                break
+            radius_km *= 2
+
+        order = np.argsort(distances, kind="stable")[:k]
+        return list(zip(self.ids[positions[order]].tolist(), distances[order].tolist()))
+
+    def _max_distance_from(self, latitude: float, longitude: float) -> float:
+        """Верхняя оценка расстояния от точки до любой точки индекса"""
+        to_corner = haversine_km_array(
+            latitude, longitude, self.latitudes[:1], self.longitudes[:1]
+        )[0]
+        return float(to_corner) + self._extent_km
+
+    def bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        category_ids: Optional[Iterable[int]] = None,
+    ) -> List[int]:
+        """id мест внутри прямоугольника координат"""
+        positions = self._positions_in_box(min_lat, min_lon, max_lat, max_lon)
+        positions = self._filter_categories(positions, category_ids)
+        lats = self.latitudes[positions]
+        lons = self.longitudes[positions]
+        mask = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+        return self.ids[positions[mask]].tolist()
+
+
+def build_spatial_index(places: List[dict], cell_size_km: float = 1.0) -> SpatialIndex:
+    """Построить индекс по словарям мест из снимка каталога"""
+    return SpatialIndex(
+        ids=(place["id"] for place in places),
+        latitudes=(place["latitude"] for place in places),
+        longitudes=(place["longitude"] for place in places),
+        category_ids=(place.get("category_id") for place in places),
+        cell_size_km=cell_size_km,
+    )
@@ -0,0 +1,206 @@
+"""
+Stats Rollup - Часовые и дневные агрегаты запросов
+
+Каждая пачка user_requests, записываемая analytics_sink, сворачивается
+в дельты по корзинам (час и день), которые прибавляются к строкам
+request_stats_buckets в той же транзакции. Окно [from, to) собирается
+из дневных корзин для целых дней и часовых для неполных краёв окна.
+Вместе со средними в корзине хранятся гистограммы задержек по стадиям.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, and_, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.request_stats_bucket import RequestStatsBucket
+from app.services.heavy_hitters import SpaceSaving
+from app.services.latency_histogram import (
+    LatencyHistogram,
+    merge_stage_histograms,
+    record_latencies,
+)
+
+GRANULARITIES = ("hour", "day")
+
+# Поле записи -> префикс колонок суммы и количества
+METRICS = {
+    "total_places": "places",
+    "total_distance_km": "distance",
+    "total_time_minutes": "time",
+    "execution_time_ms": "execution",
+}
+
+BucketKey = Tuple[str, datetime]
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Время без зоны считается UTC"""
+    return moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Начало корзины в UTC"""
+    moment = as_utc(moment)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class BucketAggregate:
+    """Агрегат корзины (дельта пачки или накопленное значение)"""
+    requests_count: int = 0
+    sums: Dict[str, float] = field(default_factory=lambda: {name: 0.0 for name in METRICS.values()})
+    counts: Dict[str, int] = field(default_factory=lambda: {name: 0 for name in METRICS.values()})
+    interests: SpaceSaving = field(default_factory=lambda: SpaceSaving(settings.STATS_TOP_CAPACITY))
+    locations: SpaceSaving = field(default_factory=lambda: SpaceSaving(settings.STATS_TOP_CAPACITY))
+    latency: Dict[str, LatencyHistogram] = field(default_factory=dict)
+
+    def add_record(self, record: dict) -> None:
+        self.requests_count += 1
+        for column, name in METRICS.items():
+            value = record.get(column)
+            if value is not None:
+                self.sums[name] += value
+                self.counts[name] += 1
+        self.interests.update(record.get("user_interests"))
+        self.locations.update(record.get("user_address"))
+        record_latencies(self.latency, record)
+
+    def merge(self, other: "BucketAggregate") -> "BucketAggregate":
+        self.requests_count += other.requests_count
+        for name in METRICS.values():
+            self.sums[name] += other.sums[name]
+            self.counts[name] += other.counts[name]
+        self.interests.merge(other.interests)
+        self.locations.merge(other.locations)
+        merge_stage_histograms(self.latency, other.latency)
+        return self
+
+    @classmethod
+    def from_row(cls, row: RequestStatsBucket) -> "BucketAggregate":
+        aggregate = cls(requests_count=row.requests_count or 0)
+        for name in METRICS.values():
+            aggregate.sums[name] = getattr(row, f"{name}_sum") or 0.0
+            aggregate.counts[name] = getattr(row, f"{name}_count") or 0
+        aggregate.interests = SpaceSaving(settings.STATS_TOP_CAPACITY, row.top_interests)
+        aggregate.locations = SpaceSaving(settings.STATS_TOP_CAPACITY, row.top_locations)
+        aggregate.latency = {
+            stage: LatencyHistogram.from_dict(data)
+            for stage, data in (row.latency_histograms or {}).items()
+        }
+        return aggregate
+
+    def to_values(self) -> dict:
+        values = {"requests_count": self.requests_count}
+        for name in METRICS.values():
+            values[f"{name}_sum"] = self.sums[name]
+            values[f"{name}_count"] = self.counts[name]
+        values["top_interests"] = self.interests.to_dict()
+        values["top_locations"] = self.locations.to_dict()
+        values["latency_histograms"] = {stage: histogram.to_dict() for stage, histogram in self.latency.items()}
+        return values
+
+    def average(self, name: str) -> Optional[float]:
+        return self.sums[name] / self.counts[name] if self.counts[name] else None
+
+
+def aggregate_batch(batch: List[dict]) -> Dict[BucketKey, BucketAggregate]:
+    """Свернуть пачку записей в дельты по часовым и дневным корзинам"""
+    deltas: Dict[BucketKey, BucketAggregate] = {}
+    for record in batch:
+        created_at = record.get("created_at") or datetime.now(timezone.utc)
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(created_at, granularity))
+            deltas.setdefault(key, BucketAggregate()).add_record(record)
+    return deltas
+
+
+async def apply_batch(session: AsyncSession, batch: List[dict]) -> None:
+    """
+    Прибавить пачку к корзинам
+
+    Строки корзин создаются через ON CONFLICT DO NOTHING и блокируются
+    SELECT ... FOR UPDATE, поэтому несколько воркеров могут писать
+    в одну корзину одновременно.
+    """
+    deltas = aggregate_batch(batch)
+    if not deltas:
+        return
+
+    await session.execute(
+        pg_insert(RequestStatsBucket)
+        .values([{"granularity": granularity, "bucket_start": start, **BucketAggregate().to_values()}
+                 for granularity, start in deltas])
+        .on_conflict_do_nothing(index_elements=["granularity", "bucket_start"])
+    )
+    result = await session.execute(
+        select(RequestStatsBucket)
+        .where(tuple_(RequestStatsBucket.granularity, RequestStatsBucket.bucket_start).in_(list(deltas)))
+        .with_for_update()
+    )
+    for row in result.scalars().all():
+        merged = BucketAggregate.from_row(row).merge(deltas[(row.granularity, row.bucket_start)])
+        for column, value in merged.to_values().items():
+            setattr(row, column, value)
+    await session.flush()
+
+
+def _window_condition(date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Условие выбора корзин: дни целиком внутри окна, часы по краям"""
+    if date_from is None and date_to is None:
+        return RequestStatsBucket.granularity == "day"
+
+    hour_from = bucket_start(date_from, "hour") if date_from else None
+    hour_to = as_utc(date_to) if date_to else None
+    day_from = bucket_start(date_from, "day") if date_from else None
+    if day_from is not None and day_from < hour_from:
+        day_from += timedelta(days=1)
+    day_to = bucket_start(date_to, "day") if date_to else None
+
+    if day_from is not None and day_to is not None and day_from >= day_to:
+        # Окно короче суток - только часовые корзины
+        return and_(
+            RequestStatsBucket.granularity == "hour",
+            RequestStatsBucket.bucket_start >= hour_from,
+            RequestStatsBucket.bucket_start < hour_to,
+        )
+
+    days = [RequestStatsBucket.granularity == "day"]
+    if day_from is not None:
+        days.append(RequestStatsBucket.bucket_start >= day_from)
+    if day_to is not None:
+        days.append(RequestStatsBucket.bucket_start < day_to)
+    parts = [and_(*days)]
+    if hour_from is not None:
+        parts.append(and_(
+            RequestStatsBucket.granularity == "hour",
+            RequestStatsBucket.bucket_start >= hour_from,
+            RequestStatsBucket.bucket_start < day_from,
+        ))
+    if day_to is not None:
+        parts.append(and_(
+            RequestStatsBucket.granularity == "hour",
+            RequestStatsBucket.bucket_start >= day_to,
+            RequestStatsBucket.bucket_start < hour_to,
+        ))
+    return or_(*parts)
+
+
+async def read_window(
+    session: AsyncSession,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> BucketAggregate:
+    """Сумма корзин за окно [date_from, date_to) с точностью до часа"""
+    result = await session.execute(
+        select(RequestStatsBucket).where(_window_condition(date_from, date_to))
+    )
+    total = BucketAggregate()
+    for row in result.scalars().all():
+        total.merge(BucketAggregate.from_row(row))
+    return total
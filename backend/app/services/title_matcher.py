@@ -0,0 +1,113 @@
+"""
+Title Matcher - Нечёткое сопоставление названий мест с каталогом
+
+LLM возвращает названия мест с другими кавычками, сокращениями и
+порядком слов, поэтому точный поиск по title.lower() часто промахивается.
+Индекс строится один раз вместе со снимком каталога: для каждого места
+хранится множество символьных триграмм нормализованного названия и
+адреса, а posting-списки "триграмма -> места" позволяют считать
+сходство только с местами, у которых есть общие триграммы.
+"""
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# Вес сходства адресов при наличии адреса в запросе
+ADDRESS_WEIGHT = 0.2
+DEFAULT_THRESHOLD = 0.45
+
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр, ё -> е, без пунктуации и кавычек, слова по алфавиту"""
+    words = _NON_WORD_RE.sub(" ", (text or "").lower().replace("ё", "е")).split()
+    return " ".join(sorted(words))
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Множество символьных триграмм нормализованной строки"""
+    normalized = normalize_text(text)
+    if not normalized:
+        return frozenset()
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Коэффициент Жаккара двух множеств триграмм"""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class TitleMatcher:
+    """Триграммный индекс по названиям и адресам мест"""
+
+    def __init__(self, places: List[dict], threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.ids: List[int] = []
+        self.title_grams: List[FrozenSet[str]] = []
+        self.address_grams: List[FrozenSet[str]] = []
+        self.exact: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = defaultdict(list)
+
+        for doc, place in enumerate(places):
+            grams = trigrams(place["title"])
+            self.ids.append(place["id"])
+            self.title_grams.append(grams)
+            self.address_grams.append(trigrams(place.get("address", "")))
+            self.exact.setdefault(normalize_text(place["title"]), doc)
+            for gram in grams:
+                postings[gram].append(doc)
+
+        self.postings: Dict[str, Tuple[int, ...]] = {gram: tuple(docs) for gram, docs in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def match(self, title: str, address: Optional[str] = None) -> Optional[Tuple[int, float]]:
+        """
+        Лучшее совпадение для названия (и адреса, если известен)
+
+        Returns:
+            Optional[Tuple[int, float]]: (id места, сходство) или None ниже порога
+        """
+        query = trigrams(title)
+        if not query:
+            return None
+        address_query = trigrams(address) if address else frozenset()
+
+        # Число общих триграмм с каждым кандидатом по posting-спискам
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in query:
+            for doc in self.postings.get(gram, ()):
+                shared[doc] += 1
+        if not shared:
+            return None
+
+        query_size = len(query)
+        best_doc, best_score = None, 0.0
+        for doc, count in shared.items():
+            doc_size = len(self.title_grams[doc])
+            title_score = count / (query_size + doc_size - count)
+            if title_score < self.threshold:
+                continue
+            score = title_score
+            if address_query and self.address_grams[doc]:
+                score = (1 - ADDRESS_WEIGHT) * title_score + ADDRESS_WEIGHT * similarity(address_query, self.address_grams[doc])
+            if score > best_score:
+                best_doc, best_score = doc, score
+
+        if best_doc is None:
+            return None
+        return self.ids[best_doc], best_score
+
+    def match_id(self, title: str, address: Optional[str] = None) -> int:
+        """id лучшего совпадения или 0, если совпадения нет"""
+        exact = self.exact.get(normalize_text(title))
+        if exact is not None and not address:
+            return self.ids[exact]
+        result = self.match(title, address)
+        return result[0] if result else 0
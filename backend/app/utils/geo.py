@@ -0,0 +1,37 @@
+"""
+Геометрия на сфере: расстояния между координатами
+"""
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по большому кругу между двумя точками в километрах"""
+    phi1, phi2 = radians(lat1), radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = radians(lon2 - lon1)
+    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+def walking_minutes(distance_km: float, speed_kmh: float) -> float:
+    """Время пешком в минутах"""
+    return distance_km / speed_kmh * 60 if speed_kmh > 0 else 0.0
+
+
+def haversine_km_array(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Расстояния от одной точки до массива точек в километрах (векторно)"""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lons - lon)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def haversine_km_matrix(lats_a: np.ndarray, lons_a: np.ndarray, lats_b: np.ndarray, lons_b: np.ndarray) -> np.ndarray:
+    """Матрица расстояний между двумя наборами точек (len(a) x len(b)) в километрах"""
+    return haversine_km_array(lats_a[:, None], lons_a[:, None], lats_b[None, :], lons_b[None, :])
@@ -0,0 +1,64 @@
+"""
+Timing - Замер времени стадий обработки запроса
+
+Таймер запроса хранится в contextvar, поэтому span() можно вызывать
+из любой функции, вызванной внутри обработчика, не пробрасывая его
+аргументами. Вне запроса span() ничего не делает. Повторные span с
+тем же именем суммируются (например, несколько обращений к LLM).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+_current: ContextVar[Optional["RequestTimer"]] = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Время стадий одного запроса в миллисекундах"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def mark(self, name: str) -> float:
+        """Записать момент от начала запроса (например, первое место в потоке)"""
+        elapsed = self.elapsed_ms()
+        self.stages.setdefault(name, elapsed)
+        return elapsed
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self, precision: int = 1) -> Dict[str, float]:
+        return {name: round(value, precision) for name, value in self.stages.items()}
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing, включая общее время total"""
+        parts = [f"{name};dur={value:.1f}" for name, value in self.stages.items()]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+def start_request_timer() -> RequestTimer:
+    """Создать таймер и сделать его текущим для контекста запроса"""
+    timer = RequestTimer()
+    _current.set(timer)
+    return timer
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Замерить стадию и добавить её время к таймеру текущего запроса"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, (time.perf_counter() - started) * 1000)
@@ -0,0 +1,123 @@
+"""
+Бенчмарк режимов LLM-пайплайна: two_step против single_shot
+
+Один и тот же набор запросов прогоняется через /api/route/generate
+(planner=llm) в обоих режимах. Кэш выбора категорий очищается перед
+каждым запросом, чтобы two_step честно делал два вызова LLM.
+Сравниваются задержка (p50/p90), число мест, доля мест, найденных в
+каталоге, соблюдение бюджета времени и совпадение маршрутов между
+режимами. Нужны DATABASE_URL и AI_API_KEY - вызовы LLM настоящие.
+
+Запуск: python bench_pipeline.py [повторов на запрос]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from app.ai.category_cache import category_cache
+from app.main import app
+from app.services.catalog import catalog
+
+MODES = ("two_step", "single_shot")
+
+SCENARIOS = [
+    ("история, музеи", "Площадь Минина и Пожарского", 56.3287, 44.0020, 3),
+    ("парки и прогулки у воды", "Нижне-Волжская набережная", 56.3321, 43.9972, 2),
+    ("архитектура, храмы", "Большая Покровская улица, 1", 56.3260, 44.0060, 4),
+    ("современное искусство, театры", "Рождественская улица, 20", 56.3290, 43.9930, 3),
+    ("памятники и скульптуры", "Площадь Горького", 56.3147, 43.9930, 2),
+    ("с детьми, интерактивные музеи", "Нижегородский кремль", 56.3280, 44.0030, 5),
+]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+async def run_one(client, mode, scenario):
+    interests, address, lat, lon, hours = scenario
+    category_cache.clear()
+    payload = {
+        "user_interests": interests,
+        "available_time_hours": hours,
+        "user_location": {"address": address, "latitude": lat, "longitude": lon},
+        "planner": "llm",
+        "pipeline": mode,
+    }
+    start = time.perf_counter()
+    response = await client.post("/api/route/generate", json=payload)
+    latency_ms = (time.perf_counter() - start) * 1000
+    if response.status_code != 200:
+        return {"ok": False, "latency_ms": latency_ms, "status": response.status_code}
+
+    data = response.json()
+    route, metadata = data["route"], data["metadata"]
+    sources = metadata.get("coordinate_sources") or {}
+    timings = metadata.get("timings") or {}
+    return {
+        "ok": True,
+        "latency_ms": latency_ms,
+        "llm_calls": sum(1 for stage in ("categories_llm", "route_llm") if stage in timings),
+        "places": route["total_places"],
+        "catalog_share": (sources.get("catalog", 0) + sources.get("fuzzy", 0)) / route["total_places"] if route["total_places"] else 0.0,
+        "within_budget": route["total_time_minutes"] <= hours * 60,
+        "place_ids": [place["id"] for place in route["places"] if place["id"]],
+        "categories": metadata["selected_categories"],
+    }
+
+
+def report(mode, results):
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency_ms"] for r in ok]
+    print(f"\n{mode}")
+    print(f"  успешно            {len(ok)}/{len(results)}")
+    if not ok:
+        return
+    print(f"  задержка p50/p90   {percentile(latencies, 0.5):8.0f} / {percentile(latencies, 0.9):.0f} мс")
+    print(f"  задержка средняя   {statistics.mean(latencies):8.0f} мс")
+    print(f"  вызовов LLM        {statistics.mean(r['llm_calls'] for r in ok):8.2f}")
+    print(f"  мест в маршруте    {statistics.mean(r['places'] for r in ok):8.2f}")
+    print(f"  мест из каталога   {statistics.mean(r['catalog_share'] for r in ok):8.1%}")
+    print(f"  в бюджете времени  {sum(r['within_budget'] for r in ok) / len(ok):8.1%}")
+
+
+async def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    await catalog.reload()
+    print(f"📊 Запросов: {len(SCENARIOS)} x {runs} повторов на режим")
+
+    results = {mode: [] for mode in MODES}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for _ in range(runs):
+            for scenario in SCENARIOS:
+                # Режимы по очереди, чтобы дрейф задержек API не влиял на сравнение
+                for mode in MODES:
+                    results[mode].append(await run_one(client, mode, scenario))
+
+    for mode in MODES:
+        report(mode, results[mode])
+
+    pairs = [(a, b) for a, b in zip(results["two_step"], results["single_shot"]) if a["ok"] and b["ok"]]
+    if pairs:
+        print("\nсовпадение single_shot с two_step")
+        print(f"  места (Жаккар)     {statistics.mean(jaccard(a['place_ids'], b['place_ids']) for a, b in pairs):8.2f}")
+        print(f"  категории (Жаккар) {statistics.mean(jaccard(a['categories'], b['categories']) for a, b in pairs):8.2f}")
+        two_step = statistics.median(a["latency_ms"] for a, _ in pairs)
+        single_shot = statistics.median(b["latency_ms"] for _, b in pairs)
+        print(f"  медиана задержки   {single_shot / two_step:8.2f} от two_step")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
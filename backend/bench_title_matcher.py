@@ -0,0 +1,82 @@
+"""
+Бенчмарк сопоставления названий мест: триграммный индекс против difflib
+
+Названия из cultural_objects_mnn.xlsx искажаются так, как их обычно
+возвращает LLM (другие кавычки, порядок слов, сокращения, опечатки),
+и ищутся в полном каталоге. Запуск: python bench_title_matcher.py [file.xlsx]
+"""
+import random
+import re
+import sys
+import time
+from difflib import get_close_matches
+
+import pandas as pd
+
+from app.services.title_matcher import TitleMatcher
+
+
+def load_places(path):
+    df = pd.read_excel(path)
+    return [
+        {"id": int(row.id), "title": str(row.title), "address": str(row.address) if pd.notna(row.address) else ""}
+        for row in df.itertuples()
+    ]
+
+
+def perturb(title, rng):
+    """Исказить название одним из типичных для LLM способов"""
+    variants = [
+        lambda t: t.replace("«", '"').replace("»", '"'),
+        lambda t: re.sub(r"[«»\"]", "", t),
+        lambda t: " ".join(reversed(t.split())),
+        lambda t: t.lower(),
+        lambda t: t.replace("Памятник", "Памятник-").replace("имени", "им."),
+        lambda t: t[:-1] if len(t) > 8 else t,
+        lambda t: t + " (Нижний Новгород)",
+    ]
+    return rng.choice(variants)(title)
+
+
+def bench(name, fn, queries):
+    start = time.perf_counter()
+    results = [fn(query) for query, _ in queries]
+    elapsed = time.perf_counter() - start
+    correct = sum(1 for result, (_, expected) in zip(results, queries) if result == expected)
+    print(
+        f"{name:<12} точность {correct / len(queries):6.1%}  "
+        f"{elapsed / len(queries) * 1e6:9.1f} мкс/запрос"
+    )
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "cultural_objects_mnn.xlsx"
+    places = load_places(path)
+    rng = random.Random(42)
+    queries = [(perturb(place["title"], rng), place["title"]) for place in places for _ in range(4)]
+    print(f"📊 Мест в каталоге: {len(places)}, запросов: {len(queries)}")
+
+    start = time.perf_counter()
+    matcher = TitleMatcher(places)
+    print(f"🔨 Построение индекса: {(time.perf_counter() - start) * 1000:.1f} мс")
+    title_by_id = {place["id"]: place["title"] for place in places}
+
+    lower_titles = {place["title"].lower(): place["title"] for place in places}
+
+    def trigram_match(query):
+        return title_by_id.get(matcher.match_id(query))
+
+    def difflib_match(query):
+        matches = get_close_matches(query.lower(), lower_titles.keys(), n=1, cutoff=0.6)
+        return lower_titles[matches[0]] if matches else None
+
+    def exact_match(query):
+        return lower_titles.get(query.lower())
+
+    bench("exact", exact_match, queries)
+    bench("difflib", difflib_match, queries)
+    bench("trigram", trigram_match, queries)
+
+
+if __name__ == "__main__":
+    main()
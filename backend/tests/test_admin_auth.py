@@ -0,0 +1,40 @@
+"""
+Тесты доступа к admin API
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.api.admin import require_admin
+from app.config import settings
+
+
+@pytest.fixture
+def admin_settings(monkeypatch):
+    def configure(token="", open_access=False, environment="development"):
+        monkeypatch.setattr(settings, "ADMIN_API_TOKEN", token)
+        monkeypatch.setattr(settings, "ADMIN_API_OPEN", open_access)
+        monkeypatch.setattr(settings, "ENVIRONMENT", environment)
+    return configure
+
+
+@pytest.mark.asyncio
+async def test_closed_without_token_even_in_development(admin_settings):
+    admin_settings()
+    with pytest.raises(HTTPException) as error:
+        await require_admin(None)
+    assert error.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_explicit_open_flag_allows_access_without_token(admin_settings):
+    admin_settings(open_access=True)
+    await require_admin(None)
+
+
+@pytest.mark.asyncio
+async def test_token_is_required_when_configured(admin_settings):
+    admin_settings(token="secret", open_access=True)
+    await require_admin("secret")
+    for wrong in (None, "", "secret2"):
+        with pytest.raises(HTTPException):
+            await require_admin(wrong)
@@ -0,0 +1,62 @@
+"""
+Тесты фоновой записи аналитики
+"""
+import pytest
+
+from app.services import analytics_sink as sink_module
+from app.services.analytics_sink import MAX_BATCH_SIZE, AnalyticsSink
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    monkeypatch.setattr(sink_module, "async_session", FakeSession)
+    monkeypatch.setattr(sink_module, "RETRY_DELAY_SECONDS", 0)
+    return AnalyticsSink(max_queue_size=10, batch_size=5, flush_interval_seconds=0.1)
+
+
+def test_batch_size_is_clamped_to_parameter_limit():
+    sink = AnalyticsSink(max_queue_size=10, batch_size=100000, flush_interval_seconds=1)
+    assert sink.batch_size == MAX_BATCH_SIZE
+    assert MAX_BATCH_SIZE * len(sink_module.UserRequest.__table__.columns) <= sink_module.MAX_BIND_PARAMETERS
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_once(sink, monkeypatch):
+    attempts = []
+
+    async def write_batch(session, batch):
+        attempts.append(len(batch))
+        if len(attempts) == 1:
+            raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(sink, "write_batch", write_batch)
+    await sink.flush([{}, {}])
+    assert attempts == [2, 2]
+    assert (sink.written, sink.failed, sink.retried) == (2, 0, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_is_lost_after_second_failure(sink, monkeypatch):
+    async def write_batch(session, batch):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(sink, "write_batch", write_batch)
+    await sink.flush([{}, {}, {}])
+    assert (sink.written, sink.failed, sink.retried) == (0, 3, 1)
+
+
+def test_queue_overflow_drops_records():
+    sink = AnalyticsSink(max_queue_size=2, batch_size=5, flush_interval_seconds=1)
+    assert [sink.enqueue({}) for _ in range(3)] == [True, True, False]
+    assert sink.dropped == 1
@@ -0,0 +1,57 @@
+"""
+Тесты загрузки снимка каталога при холодном старте
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.services import catalog as catalog_module
+from app.services.catalog import Catalog, CatalogChangeSet, assemble_snapshot
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Счётчик полных чтений каталога; чтение занимает время, чтобы запросы успели встать в очередь"""
+    calls = []
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    async def build_snapshot(session):
+        calls.append(session)
+        await asyncio.sleep(0.02)
+        return assemble_snapshot({}, {1: "Музеи"}, {1: 30}, {}, (0, None, 1, None))
+
+    monkeypatch.setattr(catalog_module, "read_session", session)
+    monkeypatch.setattr(catalog_module, "async_session", session)
+    monkeypatch.setattr(catalog_module, "build_snapshot", build_snapshot)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_cold_start_reads_catalog_once(loads):
+    catalog = Catalog()
+    snapshots = await asyncio.gather(*(catalog.get() for _ in range(20)))
+    assert len(loads) == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert await catalog.get() is snapshots[0]
+
+
+@pytest.mark.asyncio
+async def test_apply_changes_on_cold_start_shares_the_load(loads):
+    catalog = Catalog()
+    changes = CatalogChangeSet(updated=[1])
+    # apply_changes без снимка читает каталог целиком под той же блокировкой, что и get()
+    await asyncio.gather(catalog.apply_changes(changes), *(catalog.get() for _ in range(5)))
+    assert len(loads) == 1
+    assert catalog.snapshot is not None
+
+
+@pytest.mark.asyncio
+async def test_reload_always_reads(loads):
+    catalog = Catalog()
+    await catalog.get()
+    await catalog.reload()
+    assert len(loads) == 2
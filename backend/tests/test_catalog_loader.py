@@ -0,0 +1,97 @@
+"""
+Тесты подготовки датасета и синхронизации каталога кусками
+"""
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.catalog_loader import (
+    MAX_BIND_PARAMETERS,
+    MAX_PLACES_PER_INSERT,
+    frame_to_rows,
+    places_upsert,
+    prepare_places,
+    sync_catalog,
+)
+
+
+def source_row(place_id, title="Музей", category_id=1, coordinate="POINT (44.0 56.3)", description="<p>Старый  дом</p>"):
+    return {
+        "id": place_id, "title": title, "address": "ул. 1", "coordinate": coordinate,
+        "description": description, "category_id": category_id, "url": None,
+    }
+
+
+def test_prepare_places_parses_and_skips_bad_rows():
+    df = pd.DataFrame([
+        source_row(1),
+        source_row(None),
+        source_row(3, coordinate="нет"),
+        source_row(4, category_id=999),
+        source_row(5, title="Первый"),
+        source_row(5, title="Второй"),
+    ])
+    places, skipped = prepare_places(df)
+
+    assert places["id"].tolist() == [1, 5]
+    assert skipped == {"нет id": 1, "нет координат": 1, "неизвестная категория": 1, "повтор id": 1}
+    first = places.iloc[0]
+    assert (first["latitude"], first["longitude"]) == (56.3, 44.0)
+    assert first["description_clean"] == "Старый дом"
+    # Повтор id: побеждает первая строка файла
+    assert places.iloc[1]["title"] == "Первый"
+
+
+def test_prepare_places_hash_depends_on_content():
+    places, _ = prepare_places(pd.DataFrame([source_row(1), source_row(2), source_row(3, title="Другой")]))
+    hashes = places["source_hash"].tolist()
+    assert hashes[0] == hashes[1]
+    assert hashes[0] != hashes[2]
+
+
+def test_prepare_places_tolerates_missing_columns():
+    places, _ = prepare_places(pd.DataFrame([{"id": 1, "coordinate": "POINT (44 56)", "category_id": 1}]))
+    assert places["title"].tolist() == [""]
+    assert places["url"].tolist() == [None]
+
+
+def test_insert_batch_stays_under_parameter_limit():
+    places, _ = prepare_places(pd.DataFrame([source_row(1)]))
+    rows = frame_to_rows(places) * MAX_PLACES_PER_INSERT
+    params = places_upsert(rows).compile(dialect=postgresql.dialect()).params
+    assert len(params) <= MAX_BIND_PARAMETERS
+
+
+class FakeSession:
+    """Сессия без БД: в каталоге нет мест, каждое место из INSERT считается новым"""
+
+    def __init__(self):
+        self.committed = False
+
+    async def execute(self, stmt):
+        if type(stmt).__name__ == "Select":
+            return SimpleNamespace(all=lambda: [])
+        params = stmt.compile().params
+        returned = [SimpleNamespace(id=value, inserted=True) for key, value in params.items() if key.startswith("id_m")]
+        return SimpleNamespace(all=lambda: returned)
+
+    async def commit(self):
+        self.committed = True
+
+
+@pytest.mark.asyncio
+async def test_sync_deduplicates_ids_across_chunks():
+    chunks = [
+        pd.DataFrame([source_row(1), source_row(2)]),
+        pd.DataFrame([source_row(2, title="Повтор"), source_row(3)]),
+    ]
+    session = FakeSession()
+    stats, changes = await sync_catalog(session, iter(chunks), batch_size=10)
+
+    assert changes.inserted == [1, 2, 3]
+    assert changes.updated == []
+    assert (stats.read, stats.inserted, stats.updated) == (4, 3, 0)
+    assert stats.skipped == {"повтор id": 1}
+    assert session.committed
@@ -0,0 +1,111 @@
+"""
+Тесты чтения файлов датасета кусками
+"""
+import io
+import json
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app.services.catalog_sources import CatalogSource, feature_to_row, iter_geojson_features
+
+
+def feature(number, **properties):
+    return {
+        "type": "Feature",
+        "id": number,
+        "geometry": {"type": "Point", "coordinates": [44.0 + number / 1000, 56.3]},
+        "properties": {"title": f"Место {number}", **properties},
+    }
+
+
+def collection(features, **extra):
+    return json.dumps({"type": "FeatureCollection", **extra, "features": features}, ensure_ascii=False)
+
+
+def read_features(text, block_size):
+    return list(iter_geojson_features(io.BytesIO(text.encode("utf-8")), block_size=block_size))
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 64, 1 << 20])
+def test_features_split_across_blocks(block_size):
+    features = [feature(number) for number in range(1, 6)]
+    # Кириллица: блоки режут и объекты, и многобайтовые символы UTF-8
+    assert read_features(collection(features, name="Нижний Новгород"), block_size) == features
+
+
+@pytest.mark.parametrize("block_size", [1, 5, 1 << 20])
+def test_braces_and_quotes_inside_strings(block_size):
+    features = [
+        feature(1, title='Кафе "{Скобки}"', note="]}, {\"features\": ["),
+        feature(2, title="Бар [ ] \\ обратный слэш"),
+    ]
+    assert read_features(collection(features), block_size) == features
+
+
+def test_bom_and_features_before_other_keys():
+    text = '\ufeff{"features": [' + json.dumps(feature(1)) + '], "type": "FeatureCollection"}'
+    assert read_features(text, 3) == [feature(1)]
+
+
+def test_empty_features_array():
+    assert read_features(collection([]), 4) == []
+
+
+@pytest.mark.parametrize("block_size", [3, 1 << 20])
+def test_truncated_file(block_size):
+    text = collection([feature(1), feature(2)])
+    with pytest.raises(ValueError, match="оборван"):
+        read_features(text[:text.rindex("Место 2")], block_size)
+    with pytest.raises(ValueError, match="оборван"):
+        read_features(text[:-2], block_size)
+
+
+def test_no_features_array():
+    with pytest.raises(ValueError, match="нет массива features"):
+        read_features(json.dumps({"type": "Feature", "properties": {}}), 5)
+
+
+def test_feature_to_row():
+    assert feature_to_row(feature(3, id=7)) == {"title": "Место 3", "id": 7, "coordinate": "POINT (44.003 56.3)"}
+    assert feature_to_row({"id": 1, "geometry": None}) == {"id": 1}
+
+
+ROWS = [{"id": number, "title": f"Место {number}", "category": "Музеи"} for number in range(1, 21)]
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows).to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def write_xlsx(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(list(rows[0]))
+    for row in rows:
+        sheet.append(list(row.values()))
+    workbook.save(path)
+
+
+def write_geojson(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(collection([{"type": "Feature", "id": row["id"], "properties": row, "geometry": None} for row in rows]))
+
+
+@pytest.mark.parametrize("suffix, writer", [(".csv", write_csv), (".xlsx", write_xlsx), (".geojson", write_geojson)])
+@pytest.mark.parametrize("chunk_size, sizes", [(10, [10, 10]), (5, [5, 5, 5, 5]), (7, [7, 7, 6]), (50, [20])])
+def test_chunk_sizes(tmp_path, suffix, writer, chunk_size, sizes):
+    path = tmp_path / f"places{suffix}"
+    writer(path, ROWS)
+    source = CatalogSource(str(path), chunk_size)
+
+    chunks = list(source.chunks())
+    assert [len(chunk) for chunk in chunks] == sizes
+    assert pd.concat(chunks)["id"].tolist() == [row["id"] for row in ROWS]
+    assert source.progress() == 1.0
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError, match="Неподдерживаемый формат"):
+        CatalogSource("places.txt")
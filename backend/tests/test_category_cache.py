@@ -0,0 +1,50 @@
+"""
+Тесты нормализации интересов и кэша выбора категорий
+"""
+from app.ai.category_cache import CategorySelectionCache, normalize_interests
+
+CATEGORY_NAMES = {1: "Музеи", 2: "Парки"}
+CATEGORY_TIMES = {1: 60, 2: 40}
+
+
+def test_normalize_ignores_order_case_and_stop_words():
+    assert normalize_interests("Музеи, парки и ИСТОРИЯ!") == normalize_interests("история парки музеи")
+
+
+def test_normalize_keeps_negation_with_next_word():
+    assert normalize_interests("Люблю музеи, но не парки") == "музеи не_парки"
+    assert normalize_interests("без музеев") == "без_музеев"
+
+
+def test_opposite_requests_get_different_keys():
+    pairs = [
+        ("Люблю музеи, но не парки", "Люблю парки, но не музеи"),
+        ("только не музеи", "только музеи"),
+        ("парки без музеев", "парки и музеи"),
+    ]
+    for first, second in pairs:
+        assert normalize_interests(first) != normalize_interests(second)
+        assert (
+            CategorySelectionCache.make_key(first, CATEGORY_NAMES, CATEGORY_TIMES)
+            != CategorySelectionCache.make_key(second, CATEGORY_NAMES, CATEGORY_TIMES)
+        )
+
+
+def test_cache_key_depends_on_categories():
+    key = CategorySelectionCache.make_key("музеи", CATEGORY_NAMES, CATEGORY_TIMES)
+    changed = CategorySelectionCache.make_key("музеи", {**CATEGORY_NAMES, 3: "Храмы"}, CATEGORY_TIMES)
+    assert key != changed
+
+
+def test_cache_lru_eviction_and_ttl():
+    cache = CategorySelectionCache(max_size=2, ttl_seconds=60)
+    cache.set(("a", "f"), [1])
+    cache.set(("b", "f"), [2])
+    assert cache.get(("a", "f")) == [1]
+    cache.set(("c", "f"), [3])
+    assert cache.get(("b", "f")) is None
+    assert cache.evictions == 1
+
+    expired = CategorySelectionCache(max_size=2, ttl_seconds=-1)
+    expired.set(("a", "f"), [1])
+    assert expired.get(("a", "f")) is None
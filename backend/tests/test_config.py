@@ -0,0 +1,23 @@
+"""
+Тесты проверки настроек при старте
+"""
+import pytest
+from pydantic import ValidationError
+
+from app.config import Settings
+
+
+def test_route_planner_is_validated(monkeypatch):
+    monkeypatch.setenv("ROUTE_PLANNER", "local")
+    assert Settings().ROUTE_PLANNER == "local"
+    monkeypatch.setenv("ROUTE_PLANNER", "lokal")
+    with pytest.raises(ValidationError, match="ROUTE_PLANNER"):
+        Settings()
+
+
+def test_route_pipeline_is_validated(monkeypatch):
+    monkeypatch.setenv("ROUTE_PIPELINE", "single_shot")
+    assert Settings().ROUTE_PIPELINE == "single_shot"
+    monkeypatch.setenv("ROUTE_PIPELINE", "classic")
+    with pytest.raises(ValidationError, match="ROUTE_PIPELINE"):
+        Settings()
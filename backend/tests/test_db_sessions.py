@@ -0,0 +1,145 @@
+"""
+Стресс-тест сессий БД: параллельные /api/stats, /api/stats/latency и /api/route/generate
+
+Приложение работает в том же процессе (httpx.ASGITransport) с пулом
+соединений build_engine к файлу SQLite. Проверяется, что каждый запрос
+статистики получает свою AsyncSession и возвращает соединение в пул,
+соединений одновременно выдаётся не больше DB_POOL_SIZE + DB_MAX_OVERFLOW
+даже при большем числе одновременных запросов, а генерация маршрута
+(снимок каталога в памяти, аналитика в фоне) соединений не берёт вовсе.
+"""
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import app.database as database
+from app.ai.category_cache import category_cache
+from app.api import stats as stats_api
+from app.config import settings
+from app.main import app
+from app.models.request_stats_bucket import RequestStatsBucket
+from app.services.catalog import assemble_snapshot, catalog
+
+CONCURRENT_REQUESTS = 45
+POOL_SIZE = 3
+MAX_OVERFLOW = 2
+
+CATEGORY_NAMES = {1: "Музеи", 2: "Парки"}
+CATEGORY_TIMES = {1: 30, 2: 30}
+ROUTE_BODY = {
+    "user_interests": "музеи",
+    "available_time_hours": 2,
+    "user_location": {"address": "Площадь Минина", "latitude": 56.328, "longitude": 44.002},
+    "planner": "local",
+}
+
+
+class SessionTracker:
+    """Сессии, созданные фабрикой, и соединения, выданные пулом"""
+
+    def __init__(self, engine):
+        self.factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.sessions = []  # ссылки держатся до конца теста, чтобы id() не переиспользовались
+        self.checked_out = 0
+        self.peak_connections = 0
+
+        @event.listens_for(engine.sync_engine.pool, "checkout")
+        def on_checkout(*args):
+            self.checked_out += 1
+            self.peak_connections = max(self.peak_connections, self.checked_out)
+
+        @event.listens_for(engine.sync_engine.pool, "checkin")
+        def on_checkin(*args):
+            self.checked_out -= 1
+
+    def __call__(self):
+        session = self.factory()
+        self.sessions.append(session)
+        return session
+
+
+@pytest_asyncio.fixture
+async def tracker(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", POOL_SIZE)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", MAX_OVERFLOW)
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT_SECONDS", 10.0)
+    # Для SQLite пул по умолчанию NullPool; нужен тот же QueuePool, что и для PostgreSQL
+    engine = database.build_engine(f"sqlite+aiosqlite:///{tmp_path / 'stress.db'}", poolclass=AsyncAdaptedQueuePool)
+    async with engine.begin() as connection:
+        await connection.run_sync(RequestStatsBucket.__table__.create)
+
+    tracker = SessionTracker(engine)
+    monkeypatch.setattr(database, "async_session", tracker)
+    monkeypatch.setattr(database, "replica_engine", None)
+
+    # Запрос держит соединение дольше, чтобы одновременных запросов было больше пула
+    read_window = stats_api.read_window
+
+    async def slow_read_window(session, *args):
+        window = await read_window(session, *args)
+        await asyncio.sleep(0.02)
+        return window
+
+    monkeypatch.setattr(stats_api, "read_window", slow_read_window)
+    yield tracker
+    await engine.dispose()
+
+
+@pytest.fixture
+def route_catalog(monkeypatch):
+    places = {
+        place_id: {
+            "id": place_id, "title": f"Место {place_id}", "address": "", "category_id": 1 + place_id % 2,
+            "category": CATEGORY_NAMES[1 + place_id % 2], "avg_visit_duration": 30,
+            "description": "", "description_clean": "", "url": None,
+            "latitude": 56.328 + place_id * 0.001, "longitude": 44.002 + place_id * 0.001,
+        }
+        for place_id in range(1, 11)
+    }
+    snapshot = assemble_snapshot(places, CATEGORY_NAMES, CATEGORY_TIMES, {}, (len(places), None, 2, None))
+    monkeypatch.setattr(catalog, "_snapshot", snapshot)
+    # Категории из кэша: маршрут строится без LLM
+    category_cache.set(category_cache.make_key(ROUTE_BODY["user_interests"], CATEGORY_NAMES, CATEGORY_TIMES), [1, 2])
+    yield
+    category_cache.clear()
+
+
+def send(client, number):
+    if number % 3 == 0:
+        return client.get("/api/stats")
+    if number % 3 == 1:
+        return client.get("/api/stats/latency")
+    return client.post("/api/route/generate", json=ROUTE_BODY)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_use_own_sessions_within_pool(tracker, route_catalog):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(send(client, number) for number in range(CONCURRENT_REQUESTS)))
+
+    assert [response.status_code for response in responses] == [200] * CONCURRENT_REQUESTS
+    db_requests = CONCURRENT_REQUESTS * 2 // 3
+    assert len(tracker.sessions) == db_requests
+    assert len({id(session) for session in tracker.sessions}) == db_requests
+    assert 1 < tracker.peak_connections <= POOL_SIZE + MAX_OVERFLOW
+    # Все соединения вернулись в пул после ответов
+    assert tracker.checked_out == 0
+
+
+@pytest.mark.asyncio
+async def test_route_generation_does_not_use_db(tracker, route_catalog):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/route/generate", json=ROUTE_BODY) for _ in range(10)
+        ))
+
+    assert [response.status_code for response in responses] == [200] * 10
+    assert tracker.sessions == []
+    assert tracker.peak_connections == 0
@@ -0,0 +1,128 @@
+"""
+Тесты кэша геокодера
+
+API Яндекса подменяется httpx.MockTransport, обработчик считает запросы.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services import geocoder as geocoder_module
+from app.services.geocoder import Geocoder, GeocoderError
+
+FOUND = {
+    "response": {"GeoObjectCollection": {"featureMember": [{"GeoObject": {
+        "Point": {"pos": "44.002 56.328"},
+        "metaDataProperty": {"GeocoderMetaData": {"text": "Россия, Нижний Новгород, площадь Минина"}},
+    }}]}}
+}
+NOT_FOUND = {"response": {"GeoObjectCollection": {"featureMember": []}}}
+
+
+class FakeApi:
+    """Ответы геокодера по строке запроса и счётчик обращений"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request):
+        query = request.url.params["geocode"]
+        self.requests.append(query)
+        await asyncio.sleep(self.delay)
+        if "ошибка" in query:
+            return httpx.Response(500)
+        return httpx.Response(200, json=FOUND if "минина" in query.lower() else NOT_FOUND)
+
+
+def make_geocoder(api, cache_path=None, negative_ttl_seconds=3600):
+    geocoder = Geocoder(
+        api_key="key", max_concurrency=4, timeout_seconds=1.0,
+        cache_ttl_seconds=86400, negative_ttl_seconds=negative_ttl_seconds, cache_path=cache_path,
+    )
+    geocoder._client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    return geocoder
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_by_normalized_query():
+    api = FakeApi()
+    geocoder = make_geocoder(api)
+    first = await geocoder.geocode("Площадь Минина")
+    second = await geocoder.geocode("  «площадь   минина» ")
+    assert first == second == {
+        "latitude": 56.328, "longitude": 44.002, "formatted_address": "Россия, Нижний Новгород, площадь Минина",
+    }
+    assert len(api.requests) == 1
+    assert (geocoder.hits, geocoder.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_and_its_ttl(monkeypatch):
+    api = FakeApi()
+    geocoder = make_geocoder(api, negative_ttl_seconds=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(geocoder_module.time, "time", lambda: now)
+
+    assert await geocoder.geocode("Несуществующая улица") is None
+    assert await geocoder.geocode("несуществующая улица") is None
+    assert len(api.requests) == 1
+
+    now += 61
+    assert await geocoder.geocode("Несуществующая улица") is None
+    assert len(api.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    api = FakeApi()
+    geocoder = make_geocoder(api)
+    for _ in range(2):
+        with pytest.raises(GeocoderError) as error:
+            await geocoder.geocode("ошибка")
+        assert error.value.status_code == 500
+    assert len(api.requests) == 2
+    assert geocoder.errors == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_same_queries_share_one_request():
+    api = FakeApi(delay=0.05)
+    geocoder = make_geocoder(api)
+    results = await geocoder.geocode_many(["Площадь Минина"] * 5 + ["площадь минина", "ошибка", "Нет такого"])
+    assert results[:6] == [results[0]] * 6
+    assert results[0]["latitude"] == 56.328
+    assert results[6:] == [None, None]
+    assert sorted(api.requests) == ["Нет такого", "Площадь Минина", "ошибка"]
+
+
+@pytest.mark.asyncio
+async def test_requests_do_not_write_cache_file(tmp_path):
+    path = tmp_path / "cache.json"
+    geocoder = make_geocoder(FakeApi(), cache_path=str(path))
+    for number in range(100):
+        await geocoder.geocode(f"Улица {number}")
+    assert not path.exists()
+    await geocoder.persist()
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == 100
+
+
+@pytest.mark.asyncio
+async def test_persist_merges_with_other_worker(tmp_path):
+    path = str(tmp_path / "cache.json")
+    first, second = make_geocoder(FakeApi(), path), make_geocoder(FakeApi(), path)
+    await first.geocode("Площадь Минина")
+    await second.geocode("Нет такого")
+
+    await first.persist()
+    await second.persist()
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"площадь минина", "нет такого"}
+    assert "площадь минина" in second._cache
+
+    restored = make_geocoder(FakeApi(), path)
+    restored.load_cache()
+    assert await restored.geocode("площадь Минина") is not None
+    assert restored.hits == 1
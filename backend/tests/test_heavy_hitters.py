@@ -0,0 +1,60 @@
+"""
+Тесты скетча частых значений Space-Saving
+"""
+import random
+from collections import Counter
+
+from app.services.heavy_hitters import SpaceSaving
+
+
+def zipf_stream(size, seed=5):
+    rng = random.Random(seed)
+    items = [f"item{i}" for i in range(200)]
+    weights = [1 / (rank + 1) for rank in range(len(items))]
+    return rng.choices(items, weights=weights, k=size)
+
+
+def test_exact_while_under_capacity():
+    sketch = SpaceSaving(capacity=10)
+    sketch.update_many(["музеи", "парки", "музеи", None, "театры", "музеи"])
+    assert sketch.top(2) == [("музеи", 3), ("парки", 1)]
+    assert all(error == 0 for _, error in sketch.counters.values())
+
+
+def test_error_bounds_hold_on_skewed_stream():
+    stream = zipf_stream(5000)
+    exact = Counter(stream)
+    sketch = SpaceSaving(capacity=20)
+    sketch.update_many(stream)
+
+    assert len(sketch.counters) == 20
+    for item, (count, error) in sketch.counters.items():
+        # Space-Saving переоценивает не больше чем на погрешность
+        assert count - error <= exact[item] <= count
+    top_exact = [item for item, _ in exact.most_common(3)]
+    assert [item for item, _ in sketch.top(3)] == top_exact
+
+
+def test_merge_matches_single_sketch():
+    stream = zipf_stream(4000, seed=9)
+    left, right = SpaceSaving(capacity=30), SpaceSaving(capacity=30)
+    left.update_many(stream[:2000])
+    right.update_many(stream[2000:])
+    whole = SpaceSaving(capacity=30)
+    whole.update_many(stream)
+
+    merged = left.merge(right)
+    assert len(merged.counters) <= 30
+    assert [item for item, _ in merged.top(3)] == [item for item, _ in whole.top(3)]
+    exact = Counter(stream)
+    for item, (count, error) in merged.counters.items():
+        # Без счётчика из второго скетча гарантирована только нижняя оценка
+        assert count - error <= exact[item]
+
+
+def test_roundtrip_and_trim():
+    sketch = SpaceSaving(capacity=3)
+    sketch.update_many(["a", "a", "b", "c"])
+    restored = SpaceSaving(capacity=2, counters=sketch.to_dict())
+    assert restored.to_dict() == {"a": [2, 0], restored.top(2)[1][0]: [1, 0]}
+    assert len(restored.counters) == 2
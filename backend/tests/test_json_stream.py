@@ -0,0 +1,69 @@
+"""
+Тесты потокового разбора массива из ответа LLM
+"""
+from app.ai.json_stream import JSONArrayStreamParser
+from app.services.llm_route import RouteCollector, RoutePrompt
+
+
+def feed_by_chars(parser, text, size=3):
+    items = []
+    for start in range(0, len(text), size):
+        items += parser.feed(text[start:start + size])
+    return items
+
+
+def test_items_are_emitted_as_soon_as_they_complete():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('```json\n[{"id": 1, "title": "a, [b]"}, ') == [{"id": 1, "title": "a, [b]"}]
+    assert parser.feed('{"id": 2}') == [{"id": 2}]
+    assert parser.feed("]") == []
+    assert parser.finished
+
+
+def test_scalar_ids_and_broken_items():
+    parser = JSONArrayStreamParser()
+    assert feed_by_chars(parser, '[12, 7, {"id": }, 3]') == [12, 7, 3]
+    assert parser.errors == 1
+
+
+def test_key_array_found_after_other_keys():
+    parser = JSONArrayStreamParser("route")
+    text = '{"category_ids": [1, 3], "route": [5, 8]}'
+    assert feed_by_chars(parser, text) == [5, 8]
+
+
+def test_key_array_found_before_other_keys():
+    parser = JSONArrayStreamParser("route")
+    text = 'Ответ: {"route": [{"id": 5}], "category_ids": [1, 3]}'
+    assert feed_by_chars(parser, text) == [{"id": 5}]
+
+
+def test_key_ignores_nested_and_string_values():
+    parser = JSONArrayStreamParser("route")
+    text = '{"note": "route: [1]", "meta": {"route": [2]}, "route": [3]}'
+    assert feed_by_chars(parser, text, size=1) == [3]
+
+
+def test_bare_array_is_accepted_with_key():
+    parser = JSONArrayStreamParser("route")
+    assert feed_by_chars(parser, "[4, 6]") == [4, 6]
+
+
+def candidate(place_id):
+    return {
+        "id": place_id, "title": f"Место {place_id}", "address": "", "latitude": 56.0, "longitude": 44.0,
+        "category_id": 1, "category": "Музеи", "avg_visit_duration": 30, "distance_km": 1.0,
+    }
+
+
+def test_single_shot_collector_does_not_take_category_ids_as_places():
+    # id 1 и 3 есть и среди категорий, и среди кандидатов
+    places = [candidate(place_id) for place_id in (1, 3, 5, 8)]
+    prompt = RoutePrompt(text="", places=places, pipeline="single_shot", prompt_format="compact", estimated_tokens=0)
+    collector = RouteCollector(prompt, snapshot=None)
+
+    streamed = feed_by_chars(collector, '{"category_ids": [1, 3], "route": [5, 8]}')
+    assert [place["id"] for place in streamed] == [5, 8]
+    collector.finish()
+    assert collector.category_ids == [1, 3]
+    assert [place["id"] for place in collector.places] == [5, 8]
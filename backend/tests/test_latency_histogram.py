@@ -0,0 +1,75 @@
+"""
+Тесты сливаемых гистограмм задержек
+"""
+import math
+import random
+
+import pytest
+
+from app.services.latency_histogram import (
+    RELATIVE_ACCURACY,
+    LatencyHistogram,
+    LatencyRecorder,
+    bin_index,
+    bin_value,
+)
+
+
+def latencies(size, seed=1):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(5, 1.2) for _ in range(size)]
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[math.floor(q * (len(ordered) - 1))]
+
+
+def histogram_of(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+@pytest.mark.parametrize("value", [0.5, 1, 37.2, 1000, 123456])
+def test_bin_value_is_within_relative_accuracy(value):
+    assert abs(bin_value(bin_index(value)) - value) <= RELATIVE_ACCURACY * value * 1.0001
+
+
+@pytest.mark.parametrize("q", [0.0, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_quantiles_within_relative_accuracy(q):
+    values = latencies(5000)
+    estimate = histogram_of(values).quantile(q)
+    expected = exact_quantile(values, q)
+    assert abs(estimate - expected) <= RELATIVE_ACCURACY * expected * 1.0001
+
+
+def test_merge_equals_single_histogram():
+    values = latencies(3000, seed=7)
+    merged = histogram_of(values[:1000]).merge(histogram_of(values[1000:]))
+    whole = histogram_of(values)
+    assert merged.bins == whole.bins
+    assert merged.count == whole.count
+    assert merged.sum == pytest.approx(whole.sum)
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+
+
+def test_roundtrip_and_empty():
+    histogram = histogram_of(latencies(100))
+    restored = LatencyHistogram.from_dict(histogram.to_dict())
+    assert restored.summary() == histogram.summary()
+    empty = LatencyHistogram.from_dict(None)
+    assert empty.quantile(0.5) is None
+    assert empty.summary()["p99_ms"] is None
+
+
+def test_recorder_splits_stages():
+    recorder = LatencyRecorder()
+    recorder.record({"execution_time_ms": 120, "stage_timings": {"llm": 100, "geocode": None}})
+    recorder.record({"execution_time_ms": None, "stage_timings": {"llm": 80}})
+    summary = recorder.summary()
+    assert set(summary) == {"llm", "total"}
+    assert summary["total"]["count"] == 1
+    assert summary["llm"]["count"] == 2
+    assert recorder.summary("llm").keys() == {"llm"}
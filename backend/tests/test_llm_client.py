@@ -0,0 +1,177 @@
+"""
+Тесты асинхронного клиента LLM
+
+OpenRouter подменяется httpx.MockTransport: проверяются дедлайн вызова
+(включая ожидание слота семафора и куски потока) и типы ошибок.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.ai.llm_client import LLMClient, LLMError, LLMHTTPError, LLMResponseError, LLMTimeoutError
+
+
+def make_client(handler, max_concurrency=4, timeout_seconds=1.0):
+    client = LLMClient("https://llm.test/chat", "model", max_concurrency, timeout_seconds, max_connections=4)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def sse_lines(*contents):
+    lines = [": OPENROUTER PROCESSING", ""]
+    for content in contents:
+        lines += [f"data: {json.dumps({'choices': [{'delta': {'content': content}}]})}", ""]
+    return lines + ["data: [DONE]", ""]
+
+
+def stream_response(lines, delay=0.0):
+    async def body():
+        for line in lines:
+            await asyncio.sleep(delay)
+            yield (line + "\n").encode("utf-8")
+
+    return httpx.Response(200, content=body(), headers={"Content-Type": "text/event-stream"})
+
+
+async def collect(client, **kwargs):
+    return [chunk async for chunk in client.stream_chat("prompt", "key", **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_content_and_sends_payload():
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        return completion("[1, 3]")
+
+    client = make_client(handler)
+    assert await client.chat("prompt", "key", response_format={"type": "json_object"}) == "[1, 3]"
+    payload = json.loads(requests[0].content)
+    assert payload["messages"] == [{"role": "user", "content": "prompt"}]
+    assert payload["response_format"] == {"type": "json_object"}
+    assert requests[0].headers["Authorization"] == "Bearer key"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_code", [429, 500, 503])
+async def test_http_errors_are_typed(status_code):
+    async def handler(request):
+        return httpx.Response(status_code, text="rate limited" if status_code == 429 else "upstream error")
+
+    client = make_client(handler)
+    with pytest.raises(LLMHTTPError) as error:
+        await client.chat("prompt", "key")
+    assert error.value.status_code == status_code
+
+    with pytest.raises(LLMHTTPError) as error:
+        await collect(client)
+    assert error.value.status_code == status_code
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("response", [
+    httpx.Response(200, text="<html>not json</html>"),
+    httpx.Response(200, json={"choices": []}),
+    httpx.Response(200, json={"error": "no choices"}),
+])
+async def test_malformed_chat_response(response):
+    async def handler(request):
+        return response
+
+    with pytest.raises(LLMResponseError):
+        await make_client(handler).chat("prompt", "key")
+
+
+@pytest.mark.asyncio
+async def test_malformed_stream_chunk():
+    async def handler(request):
+        return stream_response(sse_lines("[1")[:-2] + ["data: {oops", ""])
+
+    with pytest.raises(LLMResponseError):
+        await collect(make_client(handler))
+
+
+@pytest.mark.asyncio
+async def test_connection_error():
+    async def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = make_client(handler)
+    with pytest.raises(LLMError) as error:
+        await client.chat("prompt", "key")
+    assert type(error.value) is LLMError
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_deltas():
+    async def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return stream_response(sse_lines('{"route": [', "5, 8", "]}"))
+
+    assert await collect(make_client(handler)) == ['{"route": [', "5, 8", "]}"]
+
+
+@pytest.mark.asyncio
+async def test_slow_chat_hits_deadline():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return completion("late")
+
+    started = time.perf_counter()
+    with pytest.raises(LLMTimeoutError):
+        await make_client(handler).chat("prompt", "key", timeout=0.1)
+    assert time.perf_counter() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_slow_stream_hits_overall_deadline():
+    # Каждый кусок приходит быстрее дедлайна, но весь ответ - нет
+    async def handler(request):
+        return stream_response(sse_lines(*["x"] * 20), delay=0.02)
+
+    received = []
+    started = time.perf_counter()
+    with pytest.raises(LLMTimeoutError):
+        async for chunk in make_client(handler).stream_chat("prompt", "key", timeout=0.2):
+            received.append(chunk)
+    assert time.perf_counter() - started < 0.5
+    assert 0 < len(received) < 20
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_waiting_for_slot_counts_against_deadline(streaming):
+    release = asyncio.Event()
+
+    async def handler(request):
+        if json.loads(request.content)["messages"][0]["content"] == "busy":
+            await release.wait()
+            return completion("ok")
+        return stream_response(sse_lines("ok")) if streaming else completion("ok")
+
+    client = make_client(handler, max_concurrency=1)
+    busy = asyncio.create_task(client.chat("busy", "key", timeout=5))
+    await asyncio.sleep(0.01)
+
+    # Сервер ответил бы сразу, но единственный слот занят дольше дедлайна
+    with pytest.raises(LLMTimeoutError):
+        if streaming:
+            await collect(client, timeout=0.1)
+        else:
+            await client.chat("prompt", "key", timeout=0.1)
+
+    release.set()
+    assert await busy == "ok"
+    # Слот освобождён: следующий вызов проходит
+    if streaming:
+        assert await collect(client, timeout=1) == ["ok"]
+    else:
+        assert await client.chat("prompt", "key", timeout=1) == "ok"
@@ -0,0 +1,39 @@
+"""
+Тесты сборки маршрута из разобранного ответа LLM
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai.parsers import assemble_parsed_route, build_route_response_from_parsed, parse_route_place
+
+CATEGORY_MAP = {"музеи": {"id": 1, "name": "Музеи"}}
+
+
+def route_request(latitude=56.0, longitude=44.0):
+    return SimpleNamespace(user_location=SimpleNamespace(latitude=latitude, longitude=longitude))
+
+
+def test_parse_route_place_matches_catalog_title_and_category():
+    place = parse_route_place(
+        {"title": "Кремль", "category": {"name": "Музеи"}, "visit_duration": 45},
+        CATEGORY_MAP,
+        {"кремль": 7},
+    )
+    assert place["id"] == 7
+    assert place["category"] == {"id": 1, "name": "Музеи"}
+    assert place["visit_duration"] == 45
+
+
+def test_totals_come_from_coordinates_not_llm_distances():
+    places = [
+        {"id": 1, "visit_duration": 30, "distance_from_user": 100.0, "coordinates": {"latitude": 56.01, "longitude": 44.0}},
+        {"id": 2, "visit_duration": 20, "distance_from_user": 100.0, "coordinates": {"latitude": 56.02, "longitude": 44.0}},
+    ]
+    response = build_route_response_from_parsed(assemble_parsed_route(places), route_request(), "req", 10)
+    route = response["route"]
+    # 0.01 градуса широты ~ 1.11 км, два участка
+    assert route["total_distance_km"] == pytest.approx(2.22, abs=0.02)
+    assert route["places"][0]["distance_from_user"] == pytest.approx(1.11, abs=0.01)
+    assert route["visit_time_minutes"] == 50
+    assert route["route_order"] == [1, 2]
@@ -0,0 +1,33 @@
+"""
+Тесты оценки размера prompt
+"""
+from app.ai.prompt_budget import estimate_tokens, fit_rows
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("музей") == 2
+    assert estimate_tokens("id=1 музей") == 4  # 5 / 4 + 5 / 2.5, вверх
+
+
+def test_all_rows_fit():
+    rows = ["1|Музей", "2|Парк", "3|Театр"]
+    assert fit_rows("инструкция", rows, 1000) == 3
+    assert fit_rows("инструкция", [], 1000) == 0
+
+
+def test_rows_cut_at_budget():
+    fixed = "x" * 40  # 10 токенов
+    rows = ["y" * 36] * 10  # 9 токенов + перевод строки
+    assert fit_rows(fixed, rows, 10 + 10 * 3) == 3
+    assert fit_rows(fixed, rows, 10 + 10 * 3 - 1) == 2
+    kept = fit_rows(fixed, rows, 55)
+    assert estimate_tokens(fixed) + kept * 10 <= 55 < estimate_tokens(fixed) + (kept + 1) * 10
+
+
+def test_min_rows_kept_over_budget():
+    rows = ["y" * 400] * 5
+    assert fit_rows("x" * 400, rows, 50) == 1
+    assert fit_rows("x" * 400, rows, 50, min_rows=3) == 3
+    assert fit_rows("x" * 400, rows, 50, min_rows=0) == 0
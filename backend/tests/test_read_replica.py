@@ -0,0 +1,107 @@
+"""
+Тесты выбора реплики для чтения (app.database.read_session)
+"""
+import asyncio
+import contextlib
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import app.database as database
+from app.config import settings
+
+
+class FakeSession:
+    def __init__(self, target):
+        self.target = target
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeReplicaEngine:
+    def __init__(self, lag=0.0, connect_delay=0.0, error=None):
+        self.lag = lag
+        self.connect_delay = connect_delay
+        self.error = error
+
+    @contextlib.asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(self.connect_delay)
+        if self.error is not None:
+            raise self.error
+        engine = self
+
+        class Connection:
+            async def execute(self, query):
+                class Result:
+                    def scalar(self):
+                        return engine.lag
+                return Result()
+
+        yield Connection()
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Подменить реплику и основную БД фиктивными фабриками сессий"""
+    def install(engine):
+        monkeypatch.setattr(database, "replica_engine", engine)
+        monkeypatch.setattr(database, "replica_session", lambda: FakeSession("replica"))
+        monkeypatch.setattr(database, "async_session", lambda: FakeSession("primary"))
+        monkeypatch.setattr(database, "replica_health", database.ReplicaHealth())
+        return database.replica_health
+    monkeypatch.setattr(settings, "DB_REPLICA_CHECK_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 30.0)
+    return install
+
+
+async def read_target():
+    async with database.read_session() as session:
+        return session.target
+
+
+@pytest.mark.asyncio
+async def test_healthy_replica_serves_reads(replica):
+    replica(FakeReplicaEngine(lag=1.0))
+    assert await read_target() == "replica"
+
+
+@pytest.mark.asyncio
+async def test_lagging_or_failing_replica_falls_back_to_primary(replica):
+    replica(FakeReplicaEngine(lag=120.0))
+    assert await read_target() == "primary"
+
+    replica(FakeReplicaEngine(error=OSError("connection refused")))
+    assert await read_target() == "primary"
+
+
+@pytest.mark.asyncio
+async def test_hanging_connect_is_bounded_by_check_timeout(replica, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_CHECK_TIMEOUT_SECONDS", 0.05)
+    replica(FakeReplicaEngine(connect_delay=10))
+
+    started = time.perf_counter()
+    targets = await asyncio.gather(*(read_target() for _ in range(5)))
+    assert targets == ["primary"] * 5
+    assert time.perf_counter() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_connection_error_in_request_switches_to_primary(replica):
+    health = replica(FakeReplicaEngine())
+    with pytest.raises(OperationalError):
+        async with database.read_session():
+            raise OperationalError("SELECT 1", {}, Exception("connection lost"))
+    assert not health.healthy
+    assert await read_target() == "primary"
+
+
+@pytest.mark.asyncio
+async def test_no_replica_configured_uses_primary(replica):
+    replica(None)
+    assert await read_target() == "primary"
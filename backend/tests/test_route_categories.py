@@ -0,0 +1,58 @@
+"""
+Тесты выбора категорий маршрута через LLM и кэш
+"""
+import pytest
+
+from app.ai.category_cache import category_cache
+from app.api import routes
+from app.schemas.route import CategoriesAnswer, RouteRequest
+from app.services.catalog import assemble_snapshot
+
+CATEGORY_NAMES = {1: "Музеи", 2: "Парки"}
+CATEGORY_TIMES = {1: 60, 2: 40}
+
+
+@pytest.fixture
+def snapshot():
+    category_cache.clear()
+    yield assemble_snapshot({}, CATEGORY_NAMES, CATEGORY_TIMES, {}, (0, None, 2, None))
+    category_cache.clear()
+
+
+def route_request(interests):
+    return RouteRequest(
+        user_interests=interests,
+        available_time_hours=2,
+        user_location={"address": "Площадь Минина", "latitude": 56.328, "longitude": 44.002},
+    )
+
+
+def answer_with(monkeypatch, category_ids):
+    calls = []
+
+    async def ask_structured(prompt, schema, stage):
+        calls.append(stage)
+        return CategoriesAnswer(category_ids=category_ids)
+
+    monkeypatch.setattr(routes, "ask_structured", ask_structured)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_unknown_category_ids_are_not_cached(snapshot, monkeypatch):
+    calls = answer_with(monkeypatch, [1, 99])
+    request = route_request("музеи")
+
+    assert await routes.select_route_categories(request, snapshot) == [1]
+    assert await routes.select_route_categories(request, snapshot) == [1]
+    assert calls == ["categories_llm"]
+    assert category_cache.get(routes.category_cache_key(request, snapshot)) == [1]
+
+
+@pytest.mark.asyncio
+async def test_only_unknown_ids_fall_back_to_all_categories(snapshot, monkeypatch):
+    answer_with(monkeypatch, [77])
+    request = route_request("что-нибудь")
+
+    assert await routes.select_route_categories(request, snapshot) == [1, 2]
+    assert category_cache.get(routes.category_cache_key(request, snapshot)) is None
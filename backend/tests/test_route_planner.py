@@ -0,0 +1,80 @@
+"""
+Тесты локального планировщика маршрута
+"""
+import itertools
+import random
+
+import pytest
+
+from app.services.distance_matrix import DistanceMatrixService
+from app.services.route_planner import plan_route, plan_to_parsed_response
+from app.utils.geo import haversine_km
+
+START = (56.3269, 44.0059)
+
+
+def place(place_id, dlat, dlon, category_id=1, visit=30):
+    return {
+        "id": place_id, "title": f"Место {place_id}", "address": "", "category_id": category_id,
+        "category": "", "avg_visit_duration": visit, "description_clean": "",
+        "latitude": START[0] + dlat, "longitude": START[1] + dlon,
+    }
+
+
+def random_candidates(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        place(i, rng.uniform(-0.03, 0.03), rng.uniform(-0.05, 0.05), rng.choice([1, 2, 3]), rng.choice([15, 30, 45]))
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.mark.parametrize("hours", [1, 2, 4])
+def test_plan_fits_time_budget_and_place_limit(hours):
+    plan = plan_route(random_candidates(30), *START, hours, max_places=5, speed_kmh=4.5)
+    assert 0 < len(plan.places) <= 5
+    assert plan.total_time_minutes <= hours * 60 + 1
+    assert len({p["id"] for p in plan.places}) == len(plan.places)
+    assert plan.total_distance_km == pytest.approx(sum(plan.legs_km))
+
+
+def test_order_is_no_worse_than_any_permutation():
+    candidates = random_candidates(5, seed=11)
+    plan = plan_route(candidates, *START, 10, max_places=5, speed_kmh=4.5)
+    assert len(plan.places) == 5
+
+    def length(order):
+        points = [START] + [(p["latitude"], p["longitude"]) for p in order]
+        return sum(haversine_km(*a, *b) for a, b in zip(points, points[1:]))
+
+    best = min(length(order) for order in itertools.permutations(candidates))
+    # 2-opt и or-opt не гарантируют оптимум, но на 5 точках должны быть близко
+    assert plan.total_distance_km <= best * 1.1
+
+
+def test_prefers_new_categories():
+    candidates = [place(1, 0.001, 0, 1), place(2, 0.0012, 0, 1), place(3, 0.0014, 0, 2)]
+    plan = plan_route(candidates, *START, 2, max_places=2, speed_kmh=4.5)
+    assert {p["category_id"] for p in plan.places} == {1, 2}
+
+
+def test_nothing_fits_or_no_candidates():
+    far = [place(1, 1.0, 1.0)]
+    assert plan_route(far, *START, 1, max_places=5, speed_kmh=4.5).places == []
+    assert plan_route([], *START, 3).places == []
+
+
+def test_distance_service_gives_same_plan():
+    candidates = random_candidates(20)
+    service = DistanceMatrixService(candidates, 16)
+    direct = plan_route(candidates, *START, 3, max_places=5, speed_kmh=4.5)
+    cached = plan_route(candidates, *START, 3, max_places=5, speed_kmh=4.5, distances=service)
+    assert [p["id"] for p in cached.places] == [p["id"] for p in direct.places]
+
+
+def test_parsed_response_structure():
+    plan = plan_route(random_candidates(10), *START, 2, max_places=3, speed_kmh=4.5)
+    route = plan_to_parsed_response(plan)["route"]
+    assert route["route_order"] == [p["id"] for p in plan.places]
+    assert route["total_time_minutes"] == plan.total_time_minutes
+    assert all(p["coordinates"]["latitude"] for p in route["places"])
@@ -0,0 +1,94 @@
+"""
+Тесты генерации маршрута через API (/api/route/generate и /stream)
+
+LLM подменяется генератором кусков ответа, каталог - снимком в памяти,
+категории берутся из кэша.
+"""
+import json
+
+import httpx
+import pytest
+
+from app.ai.category_cache import category_cache
+from app.api import routes
+from app.main import app
+from app.services import logging_service
+from app.services.catalog import assemble_snapshot, catalog
+
+CATEGORY_NAMES = {1: "Музеи", 2: "Парки"}
+CATEGORY_TIMES = {1: 30, 2: 30}
+ROUTE_BODY = {
+    "user_interests": "музеи",
+    "available_time_hours": 3,
+    "user_location": {"address": "Площадь Минина", "latitude": 56.328, "longitude": 44.002},
+    "planner": "llm",
+    "pipeline": "two_step",
+}
+
+
+@pytest.fixture(autouse=True)
+def route_catalog(monkeypatch):
+    places = {
+        place_id: {
+            "id": place_id, "title": f"Место {place_id}", "address": "", "category_id": 1 + place_id % 2,
+            "category": CATEGORY_NAMES[1 + place_id % 2], "avg_visit_duration": 30,
+            "description": "", "description_clean": "", "url": None,
+            "latitude": 56.328 + place_id * 0.001, "longitude": 44.002 + place_id * 0.001,
+        }
+        for place_id in range(1, 11)
+    }
+    snapshot = assemble_snapshot(places, CATEGORY_NAMES, CATEGORY_TIMES, {}, (len(places), None, 2, None))
+    monkeypatch.setattr(catalog, "_snapshot", snapshot)
+    monkeypatch.setattr(routes.settings, "ROUTE_PROMPT_FORMAT", "compact")
+    category_cache.set(category_cache.make_key(ROUTE_BODY["user_interests"], CATEGORY_NAMES, CATEGORY_TIMES), [1, 2])
+    yield
+    category_cache.clear()
+
+
+def answer_in_chunks(monkeypatch, chunks):
+    async def stream_openrouter(prompt, api_key, **kwargs):
+        for chunk in chunks:
+            yield chunk
+
+    monkeypatch.setattr(routes, "stream_openrouter", stream_openrouter)
+
+
+async def stream_events(body=ROUTE_BODY):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("POST", "/api/route/generate/stream", json=body) as response:
+            text = "".join([chunk async for chunk in response.aiter_text()])
+
+    events = []
+    for block in text.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_places_finished_in_one_chunk_get_own_indexes(monkeypatch):
+    answer_in_chunks(monkeypatch, ['{"route": [3, 5, 7', ", 9]}"])
+    events = await stream_events()
+
+    places = [data for event, data in events if event == "place"]
+    assert [place["index"] for place in places] == [0, 1, 2, 3]
+    assert [place["place"]["id"] for place in places] == [3, 5, 7, 9]
+    assert events[-1][0] == "route"
+    assert events[-1][1]["route"]["route_order"] == [3, 5, 7, 9]
+
+
+@pytest.mark.asyncio
+async def test_logging_stage_is_in_persisted_and_returned_timings(monkeypatch):
+    records = []
+    monkeypatch.setattr(logging_service.analytics_sink, "enqueue", records.append)
+    monkeypatch.setattr(routes.settings, "EXPOSE_TIMINGS", True)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/route/generate", json={**ROUTE_BODY, "planner": "local"})
+
+    assert response.status_code == 200
+    assert {"catalog", "planner", "logging"} <= set(records[0]["stage_timings"])
+    assert "logging" in response.json()["metadata"]["timings"]
+    assert "logging;dur=" in response.headers["server-timing"]
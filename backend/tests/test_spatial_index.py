@@ -0,0 +1,90 @@
+"""
+Тесты сеточного пространственного индекса против полного перебора
+"""
+import random
+
+import numpy as np
+import pytest
+
+from app.services.spatial_index import SpatialIndex, build_spatial_index
+from app.utils.geo import haversine_km_array
+
+CENTER = (56.3269, 44.0059)
+
+
+@pytest.fixture(scope="module")
+def places():
+    rng = random.Random(7)
+    return [
+        {
+            "id": place_id,
+            "latitude": CENTER[0] + rng.uniform(-0.15, 0.15),
+            "longitude": CENTER[1] + rng.uniform(-0.25, 0.25),
+            "category_id": rng.choice([1, 2, 3, None]),
+        }
+        for place_id in range(1, 801)
+    ]
+
+
+@pytest.fixture(scope="module")
+def index(places):
+    return build_spatial_index(places, cell_size_km=0.7)
+
+
+def brute_distances(places, latitude, longitude):
+    distances = haversine_km_array(
+        latitude, longitude,
+        np.array([place["latitude"] for place in places]),
+        np.array([place["longitude"] for place in places]),
+    )
+    return {place["id"]: float(distance) for place, distance in zip(places, distances)}
+
+
+@pytest.mark.parametrize("radius_km", [0.3, 2.0, 7.5])
+def test_radius_matches_brute_force(places, index, radius_km):
+    distances = brute_distances(places, *CENTER)
+    expected = {place_id for place_id, distance in distances.items() if distance <= radius_km}
+
+    found = index.radius(*CENTER, radius_km)
+    assert {place_id for place_id, _ in found} == expected
+    assert [distance for _, distance in found] == sorted(distance for _, distance in found)
+
+
+def test_radius_filters_categories(places, index):
+    found = index.radius(*CENTER, 5.0, category_ids=[2])
+    by_id = {place["id"]: place for place in places}
+    assert found
+    assert all(by_id[place_id]["category_id"] == 2 for place_id, _ in found)
+
+
+@pytest.mark.parametrize("k", [1, 10, 50])
+def test_nearest_matches_brute_force(places, index, k):
+    point = (CENTER[0] + 0.05, CENTER[1] - 0.1)
+    distances = brute_distances(places, *point)
+    expected = sorted(distances.values())[:k]
+
+    found = index.nearest(*point, k)
+    assert [distance for _, distance in found] == pytest.approx(expected)
+
+
+def test_nearest_outside_the_data_and_with_limit(index):
+    far = index.nearest(CENTER[0] + 1.0, CENTER[1], 3)
+    assert len(far) == 3
+    assert index.nearest(CENTER[0] + 1.0, CENTER[1], 3, max_radius_km=5.0) == []
+
+
+def test_bbox_matches_brute_force(places, index):
+    box = (CENTER[0] - 0.02, CENTER[1] - 0.03, CENTER[0] + 0.04, CENTER[1] + 0.01)
+    expected = {
+        place["id"] for place in places
+        if box[0] <= place["latitude"] <= box[2] and box[1] <= place["longitude"] <= box[3]
+    }
+    assert set(index.bbox(*box)) == expected
+
+
+def test_empty_index():
+    index = SpatialIndex([], [], [], [])
+    assert len(index) == 0
+    assert index.radius(*CENTER, 5.0) == []
+    assert index.nearest(*CENTER, 5) == []
+    assert index.bbox(0, 0, 90, 90) == []
@@ -0,0 +1,108 @@
+"""
+Тесты выбора часовых и дневных корзин для окна статистики
+
+Корзины лежат в SQLite: каждая часовая корзина - один запрос, дневная -
+сумма своих 24 часов. Окно должно покрываться корзинами ровно один раз.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models.request_stats_bucket import RequestStatsBucket
+from app.services.stats_rollup import BucketAggregate, _window_condition, bucket_start, read_window
+
+FIRST_DAY = datetime(2026, 10, 1, tzinfo=timezone.utc)
+DAYS = 4
+
+
+def at(day, hour=0, minute=0):
+    return datetime(2026, 10, day, hour, minute, tzinfo=timezone.utc)
+
+
+def hours(start, end):
+    """Часовые корзины [start, end)"""
+    result = set()
+    while start < end:
+        result.add(("hour", start))
+        start += timedelta(hours=1)
+    return result
+
+
+def days(*numbers):
+    return {("day", at(number)) for number in numbers}
+
+
+def bucket_row(granularity, start, requests_count):
+    aggregate = BucketAggregate(requests_count=requests_count)
+    return {"granularity": granularity, "bucket_start": start, **aggregate.to_values()}
+
+
+@pytest_asyncio.fixture
+async def session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(RequestStatsBucket.__table__.create)
+    rows = []
+    for day in range(DAYS):
+        start = FIRST_DAY + timedelta(days=day)
+        rows.append(bucket_row("day", start, 24))
+        rows += [bucket_row("hour", start + timedelta(hours=hour), 1) for hour in range(24)]
+    async with engine.begin() as connection:
+        await connection.execute(insert(RequestStatsBucket), rows)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def selected(session, date_from, date_to):
+    result = await session.execute(
+        select(RequestStatsBucket.granularity, RequestStatsBucket.bucket_start)
+        .where(_window_condition(date_from, date_to))
+    )
+    return {(granularity, start.replace(tzinfo=timezone.utc)) for granularity, start in result.all()}
+
+
+MSK = timezone(timedelta(hours=3))
+
+WINDOWS = [
+    # неполный первый день, целый день, неполный последний
+    (at(1, 10, 30), at(3, 5), hours(at(1, 10), at(2)) | days(2) | hours(at(3), at(3, 5))),
+    # границы ровно в полночь - только дневные корзины
+    (at(2), at(4), days(2, 3)),
+    # только date_to
+    (None, at(3, 5), days(1, 2) | hours(at(3), at(3, 5))),
+    (None, at(3), days(1, 2)),
+    # только date_from
+    (at(3, 5, 15), None, hours(at(3, 5), at(4)) | days(4)),
+    (at(2), None, days(2, 3, 4)),
+    # окно короче суток, в том числе через полночь
+    (at(2, 3), at(2, 7, 30), hours(at(2, 3), at(2, 8))),
+    (at(1, 22), at(2, 2), hours(at(1, 22), at(2, 2))),
+    # всё время
+    (None, None, days(1, 2, 3, 4)),
+    # время без зоны - UTC, другая зона переводится в UTC
+    (datetime(2026, 10, 1, 12), datetime(2026, 10, 2), hours(at(1, 12), at(2))),
+    (datetime(2026, 10, 2, 3, tzinfo=MSK), datetime(2026, 10, 3, 3, tzinfo=MSK), days(2)),
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("date_from, date_to, expected", WINDOWS)
+async def test_window_selects_buckets(session, date_from, date_to, expected):
+    assert await selected(session, date_from, date_to) == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("date_from, date_to, expected", WINDOWS)
+async def test_window_counts_each_hour_once(session, date_from, date_to, expected):
+    total = await read_window(session, date_from, date_to)
+    assert total.requests_count == sum(24 if granularity == "day" else 1 for granularity, _ in expected)
+
+
+def test_bucket_start():
+    moment = datetime(2026, 10, 2, 1, 45, tzinfo=MSK)
+    assert bucket_start(moment, "hour") == at(1, 22)
+    assert bucket_start(moment, "day") == at(1)
@@ -0,0 +1,75 @@
+"""
+Тесты разбора и починки JSON ответов LLM
+"""
+import json
+
+import pytest
+
+from app.ai import structured
+from app.ai.llm_client import LLMResponseError
+from app.ai.structured import CATEGORIES_ANSWER, ROUTE_IDS_ANSWER, ask_structured, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"route": [1, 2]}\n```', {"route": [1, 2]}),
+    ('Вот маршрут: [3, 4] - приятной прогулки!', [3, 4]),
+    ('{"route": [1, 2,], "category_ids": [5,],}', {"route": [1, 2], "category_ids": [5]}),
+    ('{"note": "скобки ] и } в строке", "route": [7]}', {"note": "скобки ] и } в строке", "route": [7]}),
+])
+def test_repair_json(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"route": [1, 2, 3', {"route": [1, 2, 3]}),
+    ('[{"title": "Кремль"}, {"title": "Музей', [{"title": "Кремль"}, {"title": "Музей"}]),
+    ('[{"title": "Кремль"}, {"title": "Музей", "visit', [{"title": "Кремль"}, {"title": "Музей"}]),
+])
+def test_repair_truncated(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_repair_without_json():
+    with pytest.raises(ValueError, match="нет JSON"):
+        repair_json("Не могу составить маршрут")
+
+
+def test_parse_valid_and_bare_list():
+    answer, repaired = CATEGORIES_ANSWER.parse("[1, 3]")
+    assert answer.category_ids == [1, 3]
+    assert repaired is False
+
+    answer, repaired = ROUTE_IDS_ANSWER.parse('```json\n{"route": [5, 8], "category_ids": [1]}\n```')
+    assert (answer.route, answer.category_ids) == ([5, 8], [1])
+    assert repaired is True
+
+
+def test_parse_schema_mismatch():
+    with pytest.raises(ValueError, match="categories: category_ids.0"):
+        CATEGORIES_ANSWER.parse('{"category_ids": ["музеи"]}')
+
+
+@pytest.mark.asyncio
+async def test_ask_structured_retries_once(monkeypatch):
+    answers = iter(["не JSON", '{"category_ids": [2]}'])
+    prompts = []
+
+    async def ask_openrouter(prompt, api_key, response_format=None):
+        prompts.append(prompt)
+        return next(answers)
+
+    monkeypatch.setattr(structured, "ask_openrouter", ask_openrouter)
+    answer = await ask_structured("prompt", CATEGORIES_ANSWER, "categories")
+    assert answer.category_ids == [2]
+    assert len(prompts) == 2
+    assert "could not be used" in prompts[1]
+
+
+@pytest.mark.asyncio
+async def test_ask_structured_fails_after_retry(monkeypatch):
+    async def ask_openrouter(prompt, api_key, response_format=None):
+        return "всё ещё не JSON"
+
+    monkeypatch.setattr(structured, "ask_openrouter", ask_openrouter)
+    with pytest.raises(LLMResponseError):
+        await ask_structured("prompt", CATEGORIES_ANSWER, "categories")
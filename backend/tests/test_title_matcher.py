@@ -0,0 +1,63 @@
+"""
+Тесты нечёткого сопоставления названий мест
+"""
+import pytest
+
+from app.services.title_matcher import TitleMatcher, normalize_text, similarity, trigrams
+
+PLACES = [
+    {"id": 1, "title": "Нижегородский кремль", "address": "Кремль, 1"},
+    {"id": 2, "title": "Музей «Усадьба Рукавишниковых»", "address": "Верхне-Волжская наб., 7"},
+    {"id": 3, "title": "Чкаловская лестница", "address": "Верхне-Волжская наб."},
+    {"id": 4, "title": "Театр оперы и балета", "address": "ул. Белинского, 59"},
+    {"id": 5, "title": "Театр кукол", "address": "ул. Большая Покровская, 39"},
+    {"id": 6, "title": "Театр кукол", "address": "ул. Горького, 145"},
+]
+
+
+@pytest.fixture
+def matcher():
+    return TitleMatcher(PLACES)
+
+
+def test_normalize_text():
+    assert normalize_text("«Ёлки-Палки»,  Парк!") == "елки палки парк"
+    assert normalize_text("кремль Нижегородский") == normalize_text("Нижегородский кремль")
+    assert normalize_text(None) == ""
+
+
+def test_similarity():
+    grams = trigrams("Театр кукол")
+    assert similarity(grams, grams) == 1.0
+    assert similarity(grams, frozenset()) == 0.0
+    assert 0 < similarity(grams, trigrams("Театр оперы")) < 1
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Нижегородский кремль", 1),
+    ("Кремль Нижегородский", 1),
+    ('Музей "Усадьба Рукавишниковых"', 2),
+    ("Усадьба Рукавишниковых", 2),
+    ("Чкаловская лесница", 3),
+    ("театр оперы и балета", 4),
+])
+def test_match_id_finds_variants(matcher, title, expected):
+    assert matcher.match_id(title) == expected
+
+
+def test_unknown_title_is_not_matched(matcher):
+    assert matcher.match("Планетарий") is None
+    assert matcher.match_id("Планетарий") == 0
+    assert matcher.match_id("") == 0
+
+
+def test_address_breaks_ties(matcher):
+    assert matcher.match_id("Театр кукол", "Большая Покровская 39") == 5
+    assert matcher.match_id("Театр кукол", "Горького 145") == 6
+
+
+def test_score_is_bounded(matcher):
+    place_id, score = matcher.match("Нижегородский кремль")
+    assert place_id == 1
+    assert score == pytest.approx(1.0)
+    assert len(matcher) == len(PLACES)